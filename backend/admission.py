@@ -0,0 +1,256 @@
+# blockchain_roulette/backend/admission.py
+# Контроль допуска запросов: адаптивный лимит параллельности по задержке, очередь с приоритетом и быстрый отказ
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class AdmissionRejected(Exception):
+    """Запрос не допущен; retry_after - через сколько секунд имеет смысл повторить"""
+
+    def __init__(self, route: str, reason: str, retry_after: int):
+        super().__init__(f"{route}: {reason}")
+        self.route = route
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class GradientLimit:
+    """
+    Лимит параллельности по градиенту задержки: среднее время обслуживания
+    за последнее окно (short) сравнивается с долгим сглаженным (long).
+    Пока short не выше long * tolerance, лимит растёт на sqrt(limit) за
+    окно; при росте задержки умножается на long * tolerance / short (не
+    меньше чем вдвое). Если в окне не было упора в лимит, он не растёт,
+    а если занято меньше половины - не меняется вовсе.
+    """
+    __slots__ = ("limit", "min_limit", "max_limit", "tolerance", "smoothing", "long_factor",
+                 "long_latency", "_window_sum", "_window_count", "_window_peak")
+
+    def __init__(self, initial: int = 32, min_limit: int = 4, max_limit: int = 512,
+                 tolerance: float = 1.5, smoothing: float = 0.2, long_window: int = 100):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.long_factor = 1.0 / long_window
+        self.long_latency: Optional[float] = None
+        self._window_sum = 0.0
+        self._window_count = 0
+        self._window_peak = 0
+
+    @property
+    def value(self) -> int:
+        return int(self.limit)
+
+    def on_sample(self, latency: float, inflight: int):
+        self._window_sum += latency
+        self._window_count += 1
+        if inflight > self._window_peak:
+            self._window_peak = inflight
+        # Окно - не меньше 10 запросов и не меньше текущего лимита
+        if self._window_count < max(10, int(self.limit)):
+            return
+        short = self._window_sum / self._window_count
+        peak = self._window_peak
+        self._window_sum, self._window_count, self._window_peak = 0.0, 0, 0
+
+        long = self.long_latency
+        if long is None:
+            self.long_latency = short
+            return
+        # Долгое среднее догоняет снижение задержки сразу, а рост - медленно
+        self.long_latency = short if short < long else long + (short - long) * self.long_factor
+
+        if peak * 2 < self.limit:
+            # Нагрузка далеко от лимита: рост задержки вызван не параллельностью
+            return
+        gradient = max(0.5, min(1.0, long * self.tolerance / short))
+        target = self.limit * gradient
+        if gradient == 1.0 and peak + 1 >= self.limit:
+            target += math.sqrt(self.limit)
+        limit = self.limit + (target - self.limit) * self.smoothing
+        self.limit = max(float(self.min_limit), min(float(self.max_limit), limit))
+
+
+class AdmissionTicket:
+    """Допуск к обработке; release (или выход из async with) освобождает место"""
+    __slots__ = ("route", "started", "released")
+
+    def __init__(self, route: Optional["RouteAdmission"], started: float):
+        self.route = route
+        self.started = started
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            if self.route is not None:
+                self.route._release(self.started)
+
+    async def __aenter__(self) -> "AdmissionTicket":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+
+class RouteAdmission:
+    """
+    Допуск на один маршрут. Пока занято меньше limit мест и очередь пуста,
+    запрос проходит сразу. Иначе он ждёт в ограниченной очереди не дольше
+    max_wait; приоритетные (игроки с сессией) обслуживаются первыми и при
+    полной очереди вытесняют последнего обычного. Если по текущей задержке
+    место не освободится до истечения max_wait, отказ даётся сразу, не
+    дожидаясь таймаута.
+    """
+
+    def __init__(self, name: str, limit: Optional[GradientLimit] = None, max_queue: int = 256,
+                 max_wait: float = 0.5, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.limit = limit or GradientLimit()
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.clock = clock
+        self.inflight = 0
+        self.queued = 0
+        # Ожидающие - future, которые получают результат при передаче места;
+        # завершённые (истёкшие, отменённые) пропускаются при выборке
+        self._priority: "deque[asyncio.Future]" = deque()
+        self._normal: "deque[asyncio.Future]" = deque()
+        # Сглаженное время обслуживания для оценки ожидания в очереди
+        self.latency = 0.0
+        self.stats = {
+            "admitted": 0,
+            "queued": 0,
+            "rejected_queue_full": 0,
+            "rejected_deadline": 0,
+            "expired": 0,
+            "shed": 0,
+        }
+
+    def retry_after(self) -> int:
+        """Оценка времени до освобождения места для всей текущей очереди, с"""
+        wait = (self.queued + 1) * self.latency / max(1, self.limit.value)
+        return max(1, min(30, math.ceil(wait)))
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        self.stats[f"rejected_{reason}"] += 1
+        return AdmissionRejected(self.name, reason, self.retry_after())
+
+    def _admit(self) -> AdmissionTicket:
+        self.stats["admitted"] += 1
+        return AdmissionTicket(self, self.clock())
+
+    async def acquire(self, priority: Optional[Callable[[], Awaitable[bool]]] = None) -> AdmissionTicket:
+        """
+        Ждёт места. priority вызывается, только если запрос не проходит
+        сразу (проверка сессии не нужна на быстром пути)
+        """
+        if self.inflight < self.limit.value and not self.queued:
+            self.inflight += 1
+            return self._admit()
+
+        high = bool(await priority()) if priority is not None else False
+        if self.inflight < self.limit.value and not self.queued:
+            # Место освободилось, пока проверялся приоритет
+            self.inflight += 1
+            return self._admit()
+        ahead = len(self._priority) if high else self.queued
+        if (ahead + 1) * self.latency / max(1, self.limit.value) > self.max_wait:
+            raise self._reject("deadline")
+        if self.queued >= self.max_queue:
+            if not (high and self._shed_normal()):
+                raise self._reject("queue_full")
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        (self._priority if high else self._normal).append(waiter)
+        self.queued += 1
+        self.stats["queued"] += 1
+        timer = loop.call_later(self.max_wait, self._expire, waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.cancelled():
+                # Клиент ушёл, пока ждал
+                self._dequeued()
+            elif waiter.exception() is None:
+                # Место уже передано, но запрос отменён: вернуть его
+                self._release_slot()
+            raise
+        finally:
+            timer.cancel()
+        return self._admit()
+
+    def _dequeued(self):
+        self.queued -= 1
+        if not self.queued:
+            # В очередях остались только завершённые ожидающие
+            self._priority.clear()
+            self._normal.clear()
+
+    def _expire(self, waiter: asyncio.Future):
+        if not waiter.done():
+            self._dequeued()
+            self.stats["expired"] += 1
+            waiter.set_exception(AdmissionRejected(self.name, "deadline", self.retry_after()))
+
+    def _shed_normal(self) -> bool:
+        """Снимает с очереди последнего живого обычного ожидающего"""
+        normal = self._normal
+        while normal:
+            waiter = normal.pop()
+            if not waiter.done():
+                self._dequeued()
+                self.stats["shed"] += 1
+                waiter.set_exception(AdmissionRejected(self.name, "shed", self.retry_after()))
+                return True
+        return False
+
+    def _release(self, started: float):
+        latency = self.clock() - started
+        self.latency = latency if not self.latency else self.latency * 0.9 + latency * 0.1
+        self.limit.on_sample(latency, self.inflight)
+        self._release_slot()
+
+    def _release_slot(self):
+        self.inflight -= 1
+        # Место передаётся ожидающему сразу, чтобы новый запрос не обогнал очередь
+        while self.queued and self.inflight < self.limit.value:
+            queue = self._priority if self._priority else self._normal
+            waiter = queue.popleft()
+            if waiter.done():
+                continue
+            self.inflight += 1
+            self._dequeued()
+            waiter.set_result(None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "limit": self.limit.value,
+            "inflight": self.inflight,
+            "waiting": self.queued,
+            "latency_ms": self.latency * 1000,
+        }
+
+
+class AdmissionController:
+    """Допуск по маршрутам; enabled=False пропускает всё без учёта"""
+
+    def __init__(self, routes: Dict[str, RouteAdmission], enabled: bool = True):
+        self.routes = routes
+        self.enabled = enabled
+
+    async def acquire(self, route: str, priority: Optional[Callable[[], Awaitable[bool]]] = None) -> AdmissionTicket:
+        if not self.enabled:
+            return AdmissionTicket(None, 0.0)
+        return await self.routes[route].acquire(priority)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, **{name: route.get_stats() for name, route in self.routes.items()}}
@@ -1,118 +1,858 @@
 # blockchain_roulette/backend/bayesian_analyzer.py
 # Байесовский анализатор для детекции махинаций в рулетке
 
+import bisect
+import sys
+import time
 import numpy as np
-from scipy.stats import beta
-from typing import Dict, List, Any, Optional
-from datetime import datetime, timedelta
-from dataclasses import dataclass
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from datetime import datetime
+
+from event_store import SuspiciousEventStore
+from risk_engine import RiskModel
+
+
+# Квантили для 95% и 99% доверительных интервалов
+_CI_QUANTILES = np.array([0.025, 0.975, 0.005, 0.995])
+
+# Границы уровней риска игрока: LOW < 0.3 <= MEDIUM < 0.6 <= HIGH
+RISK_LEVEL_BOUNDS = (0.3, 0.6)
+RISK_LEVELS = ("LOW", "MEDIUM", "HIGH")
+# Окно "свежих" подозрительных событий для аналитики, с
+SUSPICIOUS_WINDOW = 24 * 3600
+
+# Квантили распределения прибыли/убытка в отчёте
+_PROFIT_QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+def risk_level_index(risk_score):
+    """Номер уровня риска в RISK_LEVELS для массива оценок"""
+    return np.searchsorted(RISK_LEVEL_BOUNDS, risk_score, side='right')
+
+
+def _risk_level(risk_score: float) -> int:
+    """Номер уровня риска для одной оценки (без накладных расходов numpy)"""
+    return bisect.bisect_right(RISK_LEVEL_BOUNDS, risk_score)
+
+
+def _unix_time(value) -> float:
+    """datetime или число секунд -> unix time"""
+    return value.timestamp() if isinstance(value, datetime) else float(value)
 
 
-@dataclass
 class SuspiciousEvent:
-    player_address: str
-    event_type: str
-    severity: float
-    description: str
-    probability_score: float
-    timestamp: datetime
+    """
+    Подозрительное событие. Время хранится числом unix time (unix_time),
+    timestamp собирает datetime при обращении; адрес и тип интернированы.
+    """
+
+    __slots__ = ("player_address", "event_type", "severity", "description", "probability_score", "unix_time")
+
+    def __init__(self, player_address: str, event_type: str, severity: float, description: str,
+                 probability_score: float, timestamp):
+        self.player_address = sys.intern(player_address)
+        self.event_type = sys.intern(event_type)
+        self.severity = severity
+        self.description = description
+        self.probability_score = probability_score
+        self.unix_time = _unix_time(timestamp)
+
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self.unix_time)
+
+    def __reduce__(self):
+        return (SuspiciousEvent, (self.player_address, self.event_type, self.severity, self.description,
+                                  self.probability_score, self.unix_time))
+
+    def __setstate__(self, state: Dict[str, Any]):
+        # События, сохранённые до перехода на __slots__ (состояние - словарь полей)
+        self.__init__(**state)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, SuspiciousEvent):
+            return NotImplemented
+        return self.__reduce__()[1] == other.__reduce__()[1]
+
+    def __repr__(self) -> str:
+        return "SuspiciousEvent(" + ", ".join(
+            f"{name}={getattr(self, name)!r}" for name in self.__slots__
+        ) + ")"
 
 
-@dataclass 
 class PlayerProfile:
-    address: str
-    total_bets: int
-    wins: int
-    total_amount: float
-    profit_loss: float
-    risk_score: float
-    win_rate: float
-    is_blacklisted: bool
-    last_activity: datetime
-    bet_patterns: Dict[str, Any]
+    """
+    Снимок строки PlayerProfileStore. Время последней активности хранится
+    числом (last_activity_unix), last_activity собирает datetime при обращении.
+    """
+
+    __slots__ = ("address", "total_bets", "wins", "total_amount", "profit_loss", "risk_score",
+                 "win_rate", "is_blacklisted", "last_activity_unix", "bet_patterns")
+
+    def __init__(self, address: str, total_bets: int, wins: int, total_amount: float, profit_loss: float,
+                 risk_score: float, win_rate: float, is_blacklisted: bool, last_activity,
+                 bet_patterns: Dict[str, Any]):
+        self.address = address
+        self.total_bets = total_bets
+        self.wins = wins
+        self.total_amount = total_amount
+        self.profit_loss = profit_loss
+        self.risk_score = risk_score
+        self.win_rate = win_rate
+        self.is_blacklisted = is_blacklisted
+        self.last_activity_unix = _unix_time(last_activity)
+        self.bet_patterns = bet_patterns
+
+    @property
+    def last_activity(self) -> datetime:
+        return datetime.fromtimestamp(self.last_activity_unix)
+
+    def __reduce__(self):
+        return (PlayerProfile, tuple(getattr(self, name) for name in self.__slots__))
+
+    def __setstate__(self, state: Dict[str, Any]):
+        # Профили из записей WAL, сделанных до перехода на __slots__
+        self.__init__(**state)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, PlayerProfile):
+            return NotImplemented
+        return self.__reduce__()[1] == other.__reduce__()[1]
+
+    def __repr__(self) -> str:
+        return "PlayerProfile(" + ", ".join(
+            f"{name}={getattr(self, name)!r}" for name in self.__slots__
+        ) + ")"
+
+
+class FrozenProfiles:
+    """
+    Замороженное представление PlayerProfileStore для снапшота: ссылки на
+    колонки и списки без копирования. Пока оно активно, хранилище перед
+    каждой записью в его строки кладёт прежние значения в undo, а словарь
+    шаблонов при первом изменении заменяет копией. export (в потоке
+    снапшота) копирует колонки и возвращает строкам значения на момент
+    заморозки.
+    """
+    __slots__ = ("size", "base_addresses", "addresses", "address_count", "columns", "dirty",
+                 "patterns", "risk_model", "undo")
+
+    def __init__(self, store: "PlayerProfileStore"):
+        self.size = store._size
+        self.base_addresses = store._base_addresses
+        self.addresses = store._addresses
+        self.address_count = len(store._addresses)
+        self.columns = dict(store._data)
+        self.dirty = store._dirty
+        self.patterns = store._patterns
+        self.risk_model = store.risk_model
+        self.undo: List[Tuple[str, np.ndarray, np.ndarray]] = []
+
+    def export(self) -> Dict[str, Any]:
+        """Копия состояния на момент заморозки; оценки риска помеченных строк досчитываются в копии"""
+        size = self.size
+        columns = {name: column[:size].copy() for name, column in self.columns.items()}
+        dirty = self.dirty[:size].copy()
+        # Записи, сделанные во время копирования, уже лежат в undo (они добавляются до записи);
+        # по строке берётся самое раннее значение, поэтому undo применяется с конца
+        for name, rows, values in reversed(self.undo[:]):
+            (dirty if name == '_dirty' else columns[name])[rows] = values
+        rows = np.flatnonzero(dirty)
+        if len(rows):
+            columns['risk_score'][rows] = self.risk_model.score(columns['wins'][rows], columns['total_bets'][rows])
+        return {
+            'base_addresses': self.base_addresses,
+            'addresses': self.addresses[:self.address_count],
+            'columns': columns,
+            'patterns': dict(self.patterns)
+        }
+
+
+class PlayerProfileStore:
+    """
+    Колоночное хранилище профилей игроков: по массиву NumPy на поле
+    и индекс адрес -> строка. Массивы растут удвоением ёмкости.
+    Для совместимости ведёт себя как словарь адрес -> PlayerProfile,
+    но get/[] возвращают снимок строки: изменять профиль нужно через
+    update/update_batch/set_blacklisted.
+
+    Строки, загруженные из снапшота (базовые), не попадают в словарь
+    индекса при старте: их адреса лежат в отсортированном массиве байтовых
+    строк и ищутся через searchsorted, а найденные запоминаются в словаре.
+
+    Итоги (суммы ставок и прибыли, число игроков по уровням риска, число
+    заблокированных) ведутся инкрементально при каждом изменении; после
+    загрузки из снапшота они считаются один раз при первом обращении.
+    version растёт с каждым изменением. risk_listeners получают
+    (адрес, прежний уровень, новый уровень) при смене уровня риска игрока.
+
+    Ставки не пересчитывают риск сразу, а помечают строку: оценки по
+    risk_model считаются пакетом в rescore_dirty (его вызывает RiskEngine),
+    а чтения - risk_score, профиль, итоги - досчитывают помеченные строки.
+
+    Снапшот берёт freeze() - представление без копирования, - копирует его
+    в потоке и отпускает через thaw(); все записи в строки идут через _save.
+    """
+    
+    _COLUMNS = {
+        'total_bets': np.int64,
+        'wins': np.int64,
+        'total_amount': np.float64,
+        'profit_loss': np.float64,
+        'risk_score': np.float64,
+        'is_blacklisted': np.bool_,
+        'last_activity': np.float64,  # unix time
+    }
+    # Колонки и маска оценки, которые сохраняет undo замороженного представления
+    _UNDO_ALL = tuple(_COLUMNS) + ('_dirty',)
+    
+    def __init__(self, capacity: int = 1024):
+        self._capacity = max(1, capacity)
+        self._size = 0
+        self._index: Dict[str, int] = {}
+        self._addresses: List[str] = []  # адреса строк после базовых
+        self._data: Dict[str, np.ndarray] = {
+            name: np.zeros(self._capacity, dtype=dtype) for name, dtype in self._COLUMNS.items()
+        }
+        # Базовые строки из снапшота: адреса по строкам и отсортированный индекс
+        self._base_size = 0
+        self._base_addresses = np.empty(0, dtype='S1')
+        self._base_sorted = self._base_addresses
+        self._base_order = np.empty(0, dtype=np.int64)
+        # Шаблоны ставок хранятся только для строк, где они есть
+        self._patterns: Dict[int, Dict[str, Any]] = {}
+        # Журнал изменений (WAL), подключается модулем persistence
+        self.journal = None
+        self.version = 0
+        self._totals: Optional[Dict[str, Any]] = self._empty_totals()
+        self.risk_listeners: List[Callable[[str, str, str], Any]] = []
+        self.risk_model = RiskModel()
+        # Строки, изменённые после последней оценки риска: маска и список для пакетного пересчёта
+        self._dirty = np.zeros(self._capacity, dtype=bool)
+        self._dirty_rows: List[int] = []
+        self._frozen: Optional[FrozenProfiles] = None
+    
+    @staticmethod
+    def _empty_totals() -> Dict[str, Any]:
+        return {
+            'total_bets': 0,
+            'total_amount': 0.0,
+            'profit_loss': 0.0,
+            'risk_levels': np.zeros(len(RISK_LEVELS), dtype=np.int64),
+            'blacklisted': 0,
+        }
+    
+    @classmethod
+    def from_columns(cls, addresses: np.ndarray, sorted_addresses: np.ndarray, order: np.ndarray,
+                     columns: Dict[str, np.ndarray],
+                     patterns: Optional[Dict[int, Dict[str, Any]]] = None) -> "PlayerProfileStore":
+        """
+        Хранилище поверх готовых колонок (например, отображённых в память
+        из снапшота). addresses - байтовые адреса по строкам, sorted_addresses
+        и order - те же адреса по возрастанию и номера их строк. Колонки
+        должны быть доступны для записи: при np.load(mmap_mode='c')
+        страницы копируются только при изменении.
+        """
+        store = cls(capacity=1)
+        size = len(addresses)
+        store._size = store._base_size = size
+        store._capacity = max(1, size)
+        store._base_addresses = addresses
+        store._base_sorted = sorted_addresses
+        store._base_order = order
+        for name in cls._COLUMNS:
+            if name in columns:
+                store._data[name] = columns[name]
+            else:
+                store._data[name] = np.zeros(store._capacity, dtype=cls._COLUMNS[name])
+        store._patterns = dict(patterns or {})
+        store._dirty = np.zeros(store._capacity, dtype=bool)
+        # Итоги по отображённым в память колонкам - лениво, чтобы не читать их при старте
+        store._totals = None
+        return store
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def __contains__(self, address: str) -> bool:
+        return self._lookup(address) is not None
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+    
+    def __getitem__(self, address: str) -> PlayerProfile:
+        row = self._lookup(address)
+        if row is None:
+            raise KeyError(address)
+        return self._view(row)
+    
+    def __setitem__(self, address: str, profile: PlayerProfile):
+        if self.journal is not None:
+            self.journal.profile_put(address, profile)
+        row = self._row(address)
+        self._save(row)
+        if self._frozen is not None and self._patterns is self._frozen.patterns:
+            self._patterns = dict(self._patterns)
+        data = self._data
+        old_level = _risk_level(data['risk_score'][row])
+        new_level = _risk_level(profile.risk_score)
+        totals = self._totals
+        if totals is not None:
+            totals['total_bets'] += profile.total_bets - int(data['total_bets'][row])
+            totals['total_amount'] += profile.total_amount - float(data['total_amount'][row])
+            totals['profit_loss'] += profile.profit_loss - float(data['profit_loss'][row])
+            totals['risk_levels'][old_level] -= 1
+            totals['risk_levels'][new_level] += 1
+            totals['blacklisted'] += int(profile.is_blacklisted) - int(data['is_blacklisted'][row])
+        if old_level != new_level and self.risk_listeners:
+            self._notify_risk(address, old_level, new_level)
+        self.version += 1
+        data['total_bets'][row] = profile.total_bets
+        data['wins'][row] = profile.wins
+        data['total_amount'][row] = profile.total_amount
+        data['profit_loss'][row] = profile.profit_loss
+        data['risk_score'][row] = profile.risk_score
+        self._dirty[row] = False  # оценка задана явно
+        data['is_blacklisted'][row] = profile.is_blacklisted
+        data['last_activity'][row] = profile.last_activity_unix
+        if profile.bet_patterns:
+            self._patterns[row] = profile.bet_patterns
+        else:
+            self._patterns.pop(row, None)
+    
+    def get(self, address: str, default: Optional[PlayerProfile] = None) -> Optional[PlayerProfile]:
+        row = self._lookup(address)
+        return default if row is None else self._view(row)
+    
+    def risk_score(self, address: str) -> float:
+        """Оценка риска без сборки PlayerProfile (для горячего пути): готовая или досчитанная для строки"""
+        row = self._lookup(address)
+        if row is None:
+            return 0.0
+        if self._dirty[row]:
+            self._rescore_row(row)
+        return float(self._data['risk_score'][row])
+    
+    def keys(self) -> List[str]:
+        return [address.decode() for address in self._base_addresses.tolist()] + self._addresses
+    
+    def values(self) -> Iterator[PlayerProfile]:
+        return (self._view(row) for row in range(self._size))
+    
+    def items(self) -> Iterator[Tuple[str, PlayerProfile]]:
+        return ((address, self._view(row)) for row, address in enumerate(self.keys()))
+    
+    def freeze(self) -> FrozenProfiles:
+        """Представление для снапшота за O(1); копию снимает FrozenProfiles.export"""
+        if self._frozen is not None:
+            raise RuntimeError("Хранилище профилей уже заморожено")
+        self._frozen = FrozenProfiles(self)
+        return self._frozen
+    
+    def thaw(self):
+        """Завершает заморозку: undo больше не ведётся"""
+        self._frozen = None
+    
+    def _save(self, rows, names: Sequence[str] = _UNDO_ALL):
+        """Перед записью в строки замороженного представления запоминает их прежние значения"""
+        frozen = self._frozen
+        if frozen is None:
+            return
+        rows = np.atleast_1d(rows)
+        rows = rows[rows < frozen.size]
+        if len(rows):
+            for name in names:
+                column = self._dirty if name == '_dirty' else self._data[name]
+                frozen.undo.append((name, rows, column[rows]))
+    
+    def totals(self) -> Dict[str, Any]:
+        """Итоги по всем игрокам без прохода по колонкам (кроме первого после загрузки)"""
+        self.rescore_dirty()
+        if self._totals is None:
+            risk = self.column('risk_score')
+            self._totals = {
+                'total_bets': int(self.column('total_bets').sum()),
+                'total_amount': float(self.column('total_amount').sum()),
+                'profit_loss': float(self.column('profit_loss').sum()),
+                'risk_levels': np.bincount(risk_level_index(risk), minlength=len(RISK_LEVELS)),
+                'blacklisted': int(np.count_nonzero(self.column('is_blacklisted'))),
+            }
+        totals = self._totals
+        return {
+            'total_players': self._size,
+            'total_bets': totals['total_bets'],
+            'total_amount': totals['total_amount'],
+            'profit_loss': totals['profit_loss'],
+            'risk_levels': dict(zip(RISK_LEVELS, totals['risk_levels'].tolist())),
+            'blacklisted_players': totals['blacklisted'],
+        }
+    
+    def column(self, name: str) -> np.ndarray:
+        """Заполненная часть колонки (представление, без копирования)"""
+        return self._data[name][:self._size]
+    
+    def _address(self, row: int) -> str:
+        if row < self._base_size:
+            return self._base_addresses[row].decode()
+        return self._addresses[row - self._base_size]
+    
+    def _lookup(self, address: str) -> Optional[int]:
+        row = self._index.get(address)
+        if row is None and self._base_size:
+            key = address.encode()
+            position = int(self._base_sorted.searchsorted(key))
+            if position < self._base_size and self._base_sorted[position] == key:
+                row = int(self._base_order[position])
+                self._index[address] = row
+        return row
+    
+    def _view(self, row: int) -> PlayerProfile:
+        if self._dirty[row]:
+            self._rescore_row(row)
+        data = self._data
+        total_bets = int(data['total_bets'][row])
+        wins = int(data['wins'][row])
+        return PlayerProfile(
+            address=self._address(row),
+            total_bets=total_bets,
+            wins=wins,
+            total_amount=float(data['total_amount'][row]),
+            profit_loss=float(data['profit_loss'][row]),
+            risk_score=float(data['risk_score'][row]),
+            win_rate=wins / total_bets if total_bets > 0 else 0.0,
+            is_blacklisted=bool(data['is_blacklisted'][row]),
+            last_activity=float(data['last_activity'][row]),
+            bet_patterns=self._patterns.get(row, {})
+        )
+    
+    def _grow(self, needed: int):
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        for name, column in self._data.items():
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._data[name] = grown
+        grown = np.zeros(capacity, dtype=bool)
+        grown[:self._size] = self._dirty[:self._size]
+        self._dirty = grown
+        self._capacity = capacity
+    
+    def _row(self, address: str) -> int:
+        row = self._lookup(address)
+        if row is None:
+            row = self._size
+            if row >= self._capacity:
+                self._grow(row + 1)
+            address = sys.intern(address)
+            self._index[address] = row
+            self._addresses.append(address)
+            self._data['last_activity'][row] = time.time()
+            self._size += 1
+            self.version += 1
+            if self._totals is not None:
+                self._totals['risk_levels'][0] += 1
+        return row
+    
+    def _lookup_base(self, addresses: List[str]):
+        """Векторный поиск пакета адресов среди базовых строк с запоминанием найденных"""
+        keys = np.array([address.encode() for address in addresses])
+        positions = self._base_sorted.searchsorted(keys)
+        inside = positions < self._base_size
+        found = np.zeros(len(addresses), dtype=bool)
+        found[inside] = self._base_sorted[positions[inside]] == keys[inside]
+        rows = self._base_order[positions[found]].tolist()
+        self._index.update(zip((address for address, hit in zip(addresses, found.tolist()) if hit), rows))
+    
+    def rows(self, addresses: Sequence[str]) -> np.ndarray:
+        """Номера строк адресов; новые адреса получают пустые строки"""
+        index = self._index
+        new = [address for address in dict.fromkeys(addresses) if address not in index]
+        if new and self._base_size:
+            self._lookup_base(new)
+            new = [address for address in new if address not in index]
+        if new:
+            new = [sys.intern(address) for address in new]
+            start = self._size
+            if start + len(new) > self._capacity:
+                self._grow(start + len(new))
+            index.update(zip(new, range(start, start + len(new))))
+            self._addresses.extend(new)
+            self._size += len(new)
+            self._data['last_activity'][start:self._size] = time.time()
+            self.version += 1
+            if self._totals is not None:
+                self._totals['risk_levels'][0] += len(new)
+        return np.fromiter((index[address] for address in addresses), dtype=np.int64, count=len(addresses))
+    
+    def _notify_risk(self, address: str, old_level: int, new_level: int):
+        for listener in self.risk_listeners:
+            listener(address, RISK_LEVELS[old_level], RISK_LEVELS[new_level])
+    
+    def _mark_dirty(self, rows: np.ndarray):
+        dirty = self._dirty
+        rows = rows[~dirty[rows]]
+        dirty[rows] = True
+        self._dirty_rows.extend(rows.tolist())
+    
+    def dirty_count(self) -> int:
+        """Число строк, ожидающих оценки риска"""
+        return int(np.count_nonzero(self._dirty[:self._size]))
+    
+    def _rescore_row(self, row: int):
+        data = self._data
+        score = self.risk_model.score_one(int(data['wins'][row]), int(data['total_bets'][row]))
+        self._save(row, ('risk_score', '_dirty'))
+        self._dirty[row] = False
+        old_level = _risk_level(data['risk_score'][row])
+        new_level = _risk_level(score)
+        if old_level != new_level:
+            self.version += 1
+            if self._totals is not None:
+                self._totals['risk_levels'][old_level] -= 1
+                self._totals['risk_levels'][new_level] += 1
+            if self.risk_listeners:
+                self._notify_risk(self._address(row), old_level, new_level)
+        data['risk_score'][row] = score
+    
+    def rescore_dirty(self) -> int:
+        """Пакетная оценка риска строк, изменённых после прошлой оценки; возвращает их число"""
+        if not self._dirty_rows:
+            return 0
+        rows = np.array(self._dirty_rows, dtype=np.int64)
+        self._dirty_rows = []
+        # Часть строк могла быть досчитана по одной при чтении
+        rows = rows[self._dirty[rows]]
+        self._save(rows, ('_dirty',))
+        self._dirty[rows] = False
+        data = self._data
+        self.set_risk_scores(rows, self.risk_model.score(data['wins'][rows], data['total_bets'][rows]))
+        return len(rows)
+    
+    def set_risk_scores(self, rows: np.ndarray, scores: np.ndarray, notify: bool = True):
+        """
+        Записывает оценки риска строк с учётом счётчиков уровней.
+        notify=False - без risk_listeners (полный пересчёт после смены модели)
+        """
+        data = self._data
+        self._save(rows, ('risk_score',))
+        notify = notify and bool(self.risk_listeners)
+        if self._totals is not None or notify:
+            old_levels = risk_level_index(data['risk_score'][rows])
+            new_levels = risk_level_index(scores)
+            if self._totals is not None:
+                levels = len(RISK_LEVELS)
+                self._totals['risk_levels'] += (
+                    np.bincount(new_levels, minlength=levels) - np.bincount(old_levels, minlength=levels)
+                )
+            if notify:
+                for i in np.flatnonzero(old_levels != new_levels):
+                    self._notify_risk(self._address(int(rows[i])), int(old_levels[i]), int(new_levels[i]))
+        data['risk_score'][rows] = scores
+        self.version += 1
+    
+    def update(self, address: str, amount: float, won: bool, payout: float = 0.0,
+               timestamp: Optional[float] = None):
+        """Учитывает одну ставку игрока"""
+        if timestamp is None:
+            timestamp = time.time()
+        if self.journal is not None:
+            self.journal.profiles([address], [amount], [won], [payout], timestamp)
+        row = self._row(address)
+        self._save(row)
+        data = self._data
+        profit = payout - amount if won else -amount
+        totals = self._totals
+        if totals is not None:
+            totals['total_bets'] += 1
+            totals['total_amount'] += amount
+            totals['profit_loss'] += profit
+        self.version += 1
+        data['total_bets'][row] += 1
+        data['wins'][row] += bool(won)
+        data['total_amount'][row] += amount
+        data['profit_loss'][row] += profit
+        data['last_activity'][row] = timestamp
+        if not self._dirty[row]:
+            self._dirty[row] = True
+            self._dirty_rows.append(row)
+    
+    def update_batch(self, addresses: Sequence[str], amounts: Sequence[float],
+                     won: Sequence[bool], payouts: Sequence[float], timestamps=None):
+        """
+        Учитывает пакет ставок. Повторяющиеся адреса суммируются через
+        bincount по уникальным строкам, строки помечаются для оценки риска.
+        timestamps - одно время на пакет или по времени на ставку.
+        """
+        if len(addresses) == 0:
+            return
+        if timestamps is None:
+            timestamps = time.time()
+        if self.journal is not None:
+            self.journal.profiles(addresses, amounts, won, payouts, timestamps)
+        rows = self.rows(addresses)
+        amounts = np.asarray(amounts, dtype=np.float64)
+        won = np.asarray(won, dtype=bool)
+        payouts = np.asarray(payouts, dtype=np.float64)
+        
+        touched, inverse = np.unique(rows, return_inverse=True)
+        self._save(touched)
+        size = len(touched)
+        data = self._data
+        profit = np.where(won, payouts - amounts, -amounts)
+        data['total_bets'][touched] += np.bincount(inverse, minlength=size)
+        data['wins'][touched] += np.bincount(inverse, weights=won, minlength=size).astype(np.int64)
+        data['total_amount'][touched] += np.bincount(inverse, weights=amounts, minlength=size)
+        data['profit_loss'][touched] += np.bincount(inverse, weights=profit, minlength=size)
+        if self._totals is not None:
+            self._totals['total_bets'] += len(rows)
+            self._totals['total_amount'] += float(amounts.sum())
+            self._totals['profit_loss'] += float(profit.sum())
+        self.version += 1
+        if np.ndim(timestamps):
+            # Время последней ставки каждой строки: первое вхождение в развёрнутом пакете
+            _, last = np.unique(rows[::-1], return_index=True)
+            data['last_activity'][touched] = np.asarray(timestamps, dtype=np.float64)[::-1][last]
+        else:
+            data['last_activity'][touched] = timestamps
+        self._mark_dirty(touched)
+    
+    def set_blacklisted(self, address: str, blacklisted: bool = True):
+        if self.journal is not None:
+            self.journal.blacklist(address, blacklisted)
+        row = self._row(address)
+        self._save(row, ('is_blacklisted',))
+        if self._totals is not None:
+            self._totals['blacklisted'] += int(blacklisted) - int(self._data['is_blacklisted'][row])
+        self.version += 1
+        self._data['is_blacklisted'][row] = blacklisted
+    
+    def summary(self, top_n: int = 10) -> Dict[str, Any]:
+        """Агрегаты по всем игрокам, посчитанные векторно"""
+        size = self._size
+        profit = self.column('profit_loss')
+        totals = self.totals()
+        
+        # Один вызов partition даёт и квантили (по ближайшему рангу),
+        # и порог для top_n победителей
+        top_rows = np.empty(0, dtype=np.int64)
+        quantiles = [0.0] * len(_PROFIT_QUANTILES)
+        if size:
+            top_n = min(top_n, size)
+            ranks = [round(q * (size - 1)) for q in _PROFIT_QUANTILES]
+            partitioned = np.partition(profit, ranks + [size - top_n])
+            quantiles = [float(partitioned[rank]) for rank in ranks]
+            threshold = partitioned[size - top_n]
+            top_rows = np.flatnonzero(profit >= threshold)
+            top_rows = top_rows[np.argsort(profit[top_rows], kind='stable')[::-1][:top_n]]
+        
+        return {
+            'total_players': size,
+            'total_bets': totals['total_bets'],
+            'total_amount': totals['total_amount'],
+            'risk_levels': totals['risk_levels'],
+            'blacklisted_players': totals['blacklisted_players'],
+            'profit_loss': {
+                'total': totals['profit_loss'],
+                'winning_players': int(np.count_nonzero(profit > 0)),
+                'losing_players': int(np.count_nonzero(profit < 0)),
+                'quantiles': {f'p{round(q * 100)}': v for q, v in zip(_PROFIT_QUANTILES, quantiles)},
+            },
+            'top_winners': [
+                {'address': self._address(int(row)), 'profit_loss': float(profit[row])}
+                for row in top_rows
+            ],
+        }
 
 
 class BayesianAnalyzer:
     def __init__(self):
         # Байесовские параметры для каждого числа (0-36)
-        self.alpha_params = {i: 1.0 for i in range(37)}  # Успехи + 1
-        self.beta_params = {i: 36.0 for i in range(37)}  # Неудачи + 36
+        self.alpha_params = np.full(37, 1.0)  # Успехи + 1
+        self.beta_params = np.full(37, 36.0)  # Неудачи + 36
         
-        # Профили игроков
-        self.player_profiles: Dict[str, PlayerProfile] = {}
+        # Кеш доверительных интервалов: (alpha, beta) -> квантили
+        self.interval_cache_size = 4096
+        self._interval_cache: "OrderedDict[Tuple[float, float], np.ndarray]" = OrderedDict()
+        self._intervals = np.empty((37, len(_CI_QUANTILES)))
+        self._stale_intervals = np.ones(37, dtype=bool)
         
-        # Подозрительные события
-        self.suspicious_events: List[SuspiciousEvent] = []
+        # Профили игроков (колоночное хранилище)
+        self.player_profiles = PlayerProfileStore()
+        
+        # Подозрительные события: журнал по времени с индексом по игрокам и ограниченным хранением
+        self.suspicious_events = SuspiciousEventStore()
         
         # Статистика чисел
         self.number_frequencies: Dict[int, int] = {i: 0 for i in range(37)}
+        self.total_spins = 0
+        
+        # Версии состояния для ETag: растут при изменении апостериорных и событий
+        self.posterior_version = 0
+        self.events_version = 0
+        
+        # Обработчики обновлений (например, live-лента): ("spins", counts),
+        # ("posterior", number) и ("event", SuspiciousEvent)
+        self.update_listeners: List[Callable[[str, Any], Any]] = []
         
         # Настройки детекции
         self.suspicious_threshold = 0.8
         self.blacklist_threshold = 0.9
+        
+        # Журнал изменений (WAL), подключается модулем persistence
+        self.journal = None
     
-    def get_bayesian_probability_distribution(self, number: int) -> Dict[str, float]:
-        """Получает байесовское распределение вероятности для числа"""
+    def update_number_posterior(self, number: int, successes: int = 0, failures: int = 0):
+        """Обновляет Beta-параметры числа и сбрасывает его кешированные интервалы"""
         if not 0 <= number <= 36:
             raise ValueError("Number must be between 0 and 36")
         
-        alpha = self.alpha_params[number]
-        beta_param = self.beta_params[number]
+        if successes or failures:
+            self.alpha_params[number] += successes
+            self.beta_params[number] += failures
+            self._stale_intervals[number] = True
+            self.posterior_version += 1
+            self._notify("posterior", number)
+    
+    def record_spins(self, counts: Sequence[int]):
+        """
+        Учитывает пакет результатов вращений: counts[i] - сколько раз
+        выпало число i. Выпадение - успех для своего числа и неудача
+        для остальных 36, поэтому обновление идёт сразу по всем числам.
+        """
+        counts = np.asarray(counts, dtype=np.int64)
+        total = int(counts.sum())
+        if not total:
+            return
+        if self.journal is not None:
+            self.journal.spins(counts)
         
-        # Создаем Beta-распределение
-        distribution = beta(alpha, beta_param)
+        self.alpha_params += counts
+        self.beta_params += total - counts
+        self._stale_intervals[:] = True
+        for number in np.flatnonzero(counts):
+            self.number_frequencies[int(number)] += int(counts[number])
+        self.total_spins += total
+        self.posterior_version += 1
+        self._notify("spins", counts)
+    
+    def _notify(self, kind: str, payload: Any):
+        for listener in self.update_listeners:
+            listener(kind, payload)
+    
+    def add_suspicious_event(self, event: SuspiciousEvent):
+        """Регистрирует подозрительное событие"""
+        self.suspicious_events.append(event)
+        self.events_version += 1
+        self._notify("event", event)
+    
+    def add_suspicious_events(self, events: Sequence[SuspiciousEvent]):
+        """Регистрирует пакет событий (например, из снапшота)"""
+        self.suspicious_events.extend(events)
+        self.events_version += 1
+    
+    def recent_suspicious_events(self) -> int:
+        """Число событий за последние SUSPICIOUS_WINDOW секунд"""
+        return self.suspicious_events.count(since=time.time() - SUSPICIOUS_WINDOW)
+    
+    def _refresh_intervals(self):
+        """
+        Пересчитывает интервалы только для чисел, чьи параметры изменились.
+        Пары (alpha, beta) ищутся в LRU-кеше, а недостающие считаются
+        одним векторизованным вызовом ppf.
+        """
+        stale = np.flatnonzero(self._stale_intervals)
+        if stale.size == 0:
+            return
         
-        mean = distribution.mean()
-        var = distribution.var()
+        cache = self._interval_cache
+        missing: Dict[Tuple[float, float], List[int]] = {}
+        for number in stale:
+            key = (float(self.alpha_params[number]), float(self.beta_params[number]))
+            cached = cache.get(key)
+            if cached is None:
+                missing.setdefault(key, []).append(number)
+            else:
+                cache.move_to_end(key)
+                self._intervals[number] = cached
         
-        # Доверительные интервалы
-        ci_95 = distribution.interval(0.95)
-        ci_99 = distribution.interval(0.99)
+        if missing:
+            # Тяжёлый импорт scipy.stats - только при первом пересчёте интервалов
+            from scipy.stats import beta
+            
+            params = np.array(list(missing.keys()))
+            quantiles = beta.ppf(_CI_QUANTILES, params[:, :1], params[:, 1:])
+            for key, row in zip(missing.keys(), quantiles):
+                cache[key] = row
+                self._intervals[missing[key]] = row
+            while len(cache) > self.interval_cache_size:
+                cache.popitem(last=False)
+        
+        self._stale_intervals[stale] = False
+    
+    def get_posterior_summary(self) -> Dict[str, np.ndarray]:
+        """Байесовские распределения сразу для всех 37 чисел"""
+        self._refresh_intervals()
+        
+        alpha = self.alpha_params.copy()
+        beta_param = self.beta_params.copy()
+        total = alpha + beta_param
         
         return {
-            'mean': mean,
-            'variance': var,
+            'mean': alpha / total,
+            'variance': alpha * beta_param / (total ** 2 * (total + 1)),
             'alpha': alpha,
             'beta': beta_param,
-            'observations': alpha + beta_param - 37,
-            'ci_95_lower': ci_95[0],
-            'ci_95_upper': ci_95[1],
-            'ci_99_lower': ci_99[0],
-            'ci_99_upper': ci_99[1]
+            'observations': total - 37,
+            'ci_95_lower': self._intervals[:, 0].copy(),
+            'ci_95_upper': self._intervals[:, 1].copy(),
+            'ci_99_lower': self._intervals[:, 2].copy(),
+            'ci_99_upper': self._intervals[:, 3].copy()
         }
     
-    def update_player_stats(self, player_address: str, bet_data: Dict[str, Any]):
-        """Обновляет статистику игрока"""
-        if player_address not in self.player_profiles:
-            self.player_profiles[player_address] = PlayerProfile(
-                address=player_address,
-                total_bets=0,
-                wins=0,
-                total_amount=0.0,
-                profit_loss=0.0,
-                risk_score=0.0,
-                win_rate=0.0,
-                is_blacklisted=False,
-                last_activity=datetime.now(),
-                bet_patterns={}
-            )
+    def get_bayesian_probability_distribution(self, number: int) -> Dict[str, float]:
+        """Получает байесовское распределение вероятности для числа"""
+        if not 0 <= number <= 36:
+            raise ValueError("Number must be between 0 and 36")
         
-        profile = self.player_profiles[player_address]
-        profile.total_bets += 1
-        profile.total_amount += bet_data.get('amount', 0)
-        profile.last_activity = datetime.now()
-        
-        # Проверяем выигрыш
-        if bet_data.get('won', False):
-            profile.wins += 1
-            payout = bet_data.get('payout', 0)
-            profile.profit_loss += payout - bet_data.get('amount', 0)
-        else:
-            profile.profit_loss -= bet_data.get('amount', 0)
+        self._refresh_intervals()
         
-        # Обновляем процент побед
-        profile.win_rate = profile.wins / profile.total_bets if profile.total_bets > 0 else 0
-        profile.risk_score = profile.win_rate * 2  # Упрощенный расчет риска
+        alpha = float(self.alpha_params[number])
+        beta_param = float(self.beta_params[number])
+        total = alpha + beta_param
+        ci = self._intervals[number]
+        
+        return {
+            'mean': alpha / total,
+            'variance': alpha * beta_param / (total ** 2 * (total + 1)),
+            'alpha': alpha,
+            'beta': beta_param,
+            'observations': total - 37,
+            'ci_95_lower': float(ci[0]),
+            'ci_95_upper': float(ci[1]),
+            'ci_99_lower': float(ci[2]),
+            'ci_99_upper': float(ci[3])
+        }
+    
+    def update_player_stats(self, player_address: str, bet_data: Dict[str, Any]):
+        """Обновляет статистику игрока"""
+        won = bet_data.get('won', False)
+        self.player_profiles.update(
+            player_address,
+            bet_data.get('amount', 0),
+            won,
+            bet_data.get('payout', 0) if won else 0.0
+        )
+    
+    def update_player_stats_batch(self, bets: Sequence[Tuple[str, Dict[str, Any]]]):
+        """Обновляет статистику по пакету ставок (адрес, bet_data)"""
+        self.player_profiles.update_batch(
+            [address for address, _ in bets],
+            [bet_data.get('amount', 0) for _, bet_data in bets],
+            [bet_data.get('won', False) for _, bet_data in bets],
+            [bet_data.get('payout', 0) for _, bet_data in bets]
+        )
     
     def get_player_risk_assessment(self, player_address: str) -> Dict[str, Any]:
         """Получает оценку риска для игрока"""
@@ -122,10 +862,10 @@ class BayesianAnalyzer:
         profile = self.player_profiles[player_address]
         
         # Определяем уровень риска
-        if profile.risk_score < 0.3:
+        if profile.risk_score < RISK_LEVEL_BOUNDS[0]:
             risk_level = "LOW"
             recommendation = "Игрок не представляет риска"
-        elif profile.risk_score < 0.6:
+        elif profile.risk_score < RISK_LEVEL_BOUNDS[1]:
             risk_level = "MEDIUM"
             recommendation = "Рекомендуется наблюдение"
         else:
@@ -141,18 +881,78 @@ class BayesianAnalyzer:
             },
             "risk_level": risk_level,
             "recommendation": recommendation,
-            "total_suspicious_events": 0,
-            "recent_events": []
+            "total_suspicious_events": self.suspicious_events.player_count(player_address),
+            "recent_events": [
+                {
+                    "event_type": event.event_type,
+                    "severity": event.severity,
+                    "description": event.description,
+                    "probability_score": event.probability_score,
+                    "timestamp": event.timestamp.isoformat()
+                }
+                for event in reversed(self.suspicious_events.for_player(player_address, limit=10))
+            ]
         }
     
+    def analytics_version(self) -> Tuple[int, ...]:
+        """
+        Ключ состояния для analytics_summary: меняется, когда меняется сводка.
+        Число свежих событий входит в ключ, так как оно уменьшается со временем
+        """
+        self.player_profiles.rescore_dirty()
+        return (self.posterior_version, self.events_version, self.player_profiles.version,
+                self.recent_suspicious_events())
+    
+    def analytics_summary(self, top_n: int = 5) -> Dict[str, Any]:
+        """Сводка по инкрементальным итогам, без прохода по игрокам и событиям"""
+        players = self.player_profiles.totals()
+        frequencies = np.fromiter(self.number_frequencies.values(), dtype=np.int64, count=37)
+        top = np.argsort(-frequencies, kind='stable')[:top_n]
+        total_spins = self.total_spins
+        return {
+            "total_players": players['total_players'],
+            "total_spins": total_spins,
+            # Доход казино от суммы ставок: выигрыш игроков - убыток казино
+            "house_edge_actual": -players['profit_loss'] / players['total_amount'] if players['total_amount'] else 0.0,
+            "high_risk_players": players['risk_levels']['HIGH'],
+            "blacklisted_players": players['blacklisted_players'],
+            "recent_suspicious_events": self.recent_suspicious_events(),
+            "top_numbers": [
+                {
+                    "number": int(number),
+                    "frequency": int(frequencies[number]),
+                    "percentage": frequencies[number] / total_spins * 100 if total_spins else 0.0,
+                }
+                for number in top
+            ],
+        }
+    
+    def _hourly_event_counts(self, since: float) -> List[int]:
+        """Число событий по часам окна SUSPICIOUS_WINDOW от since (из агрегатов хранилища событий)"""
+        hours = [0] * (SUSPICIOUS_WINDOW // 3600)
+        for bucket in self.suspicious_events.histogram(since):
+            hour = int((bucket["start"] - since) // 3600)
+            if hour >= 0:
+                hours[min(hour, len(hours) - 1)] += bucket["count"]
+        return hours
+    
     def export_analytics_report(self) -> Dict[str, Any]:
         """Экспортирует аналитический отчет"""
+        players = self.player_profiles.summary()
+        day_ago = time.time() - SUSPICIOUS_WINDOW
         return {
             "summary": {
-                "total_players": len(self.player_profiles),
-                "total_spins": sum(self.number_frequencies.values()),
-                "high_risk_players": 0,
-                "suspicious_events_24h": 0
+                "total_players": players['total_players'],
+                "total_spins": self.total_spins,
+                "high_risk_players": players['risk_levels']['HIGH'],
+                "blacklisted_players": players['blacklisted_players'],
+                "suspicious_events_24h": self.recent_suspicious_events()
+            },
+            "players": players,
+            "suspicious_events": {
+                "stored": len(self.suspicious_events),
+                "by_type_24h": self.suspicious_events.counts_by_type(day_ago),
+                "hourly_24h": self._hourly_event_counts(day_ago)
             }
         }
 
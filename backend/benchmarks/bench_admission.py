@@ -0,0 +1,180 @@
+# blockchain_roulette/backend/benchmarks/bench_admission.py
+# Всплеск нагрузки на /bet/prepare сверх пропускной способности ноды: goodput и p99 с контролем допуска и без
+#
+# Запуск из папки backend:
+#   python benchmarks/bench_admission.py [--quick]
+
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from typing import Dict, List
+
+import httpx
+
+from common import percentiles
+from rpc_stub import RPCStub
+
+import main_v2
+from admission import AdmissionController, GradientLimit, RouteAdmission
+from bench_chain_client import install_stub
+from bench_load import make_bet_payloads
+
+# Клиент ждёт ответа не дольше этого; более поздний ответ бесполезен
+CLIENT_TIMEOUT = 1.0
+# Нода: задержка сети и число запросов в секунду, которое она успевает обработать
+NODE_LATENCY = 0.01
+NODE_CAPACITY = 100.0
+# Перед всплеском - нагрузка в WARMUP_LOAD от пропускной способности ноды
+WARMUP_SECONDS = 2.0
+WARMUP_LOAD = 0.3
+
+
+def make_admission(enabled: bool) -> AdmissionController:
+    """Свежий контроль допуска с настройками приложения"""
+    routes = {
+        name: RouteAdmission(
+            name, GradientLimit(initial=min(32, route.limit.max_limit), max_limit=route.limit.max_limit),
+            max_queue=route.max_queue, max_wait=route.max_wait
+        )
+        for name, route in main_v2.admission.routes.items()
+    }
+    return AdmissionController(routes, enabled=enabled)
+
+
+class SaturatingNode(RPCStub):
+    """
+    Нода с ограниченной пропускной способностью: запросы обрабатываются
+    по очереди, и при перегрузке задержка растёт с длиной очереди. Запрос
+    ушедшего клиента всё равно занимает ноду, как у удалённого провайдера
+    """
+
+    def __init__(self, capacity: float, latency: float):
+        super().__init__()
+        self.capacity = capacity
+        self.network_latency = latency
+        self.busy_until = 0.0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        # Клиент ноды склеивает вызовы в пакеты: время занимает каждый вызов
+        payload = json.loads(body)
+        calls = len(payload) if isinstance(payload, list) else 1
+        now = time.perf_counter()
+        self.busy_until = max(self.busy_until, now) + calls / self.capacity
+        await asyncio.sleep(self.busy_until - now + self.network_latency)
+
+        async def replay():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await super().__call__(scope, replay, send)
+
+
+async def offered_load(client: httpx.AsyncClient, payloads: List[Dict], sessions: set,
+                       rate: float, duration: float, enabled: bool) -> Dict:
+    """
+    Открытый поток: запросы приходят с темпом rate независимо от ответов,
+    каждой новой ставке нужен запрос nonce у ноды.
+    Половина игроков уже аутентифицирована (sessions) и при перегрузке
+    обслуживается первой
+    """
+    samples: List[float] = []
+    statuses: Counter = Counter()
+    served = Counter()
+    offered = Counter()
+
+    async def one(payload: Dict):
+        kind = "session" if payload["player_address"] in sessions else "anonymous"
+        offered[kind] += 1
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(client.post("/bet/prepare", json=payload), CLIENT_TIMEOUT)
+        except asyncio.TimeoutError:
+            statuses["timeout"] += 1
+            return
+        statuses[str(response.status_code)] += 1
+        if response.status_code == 200:
+            samples.append(time.perf_counter() - started)
+            served[kind] += 1
+
+    tasks = []
+    started = time.perf_counter()
+    sent = 0
+    total = int(rate * duration)
+    while sent < total:
+        # Все запросы, чьё время прихода наступило, даже если цикл событий отстаёт
+        due = min(total, int((time.perf_counter() - started) * rate) + 1)
+        for payload in payloads[sent:due]:
+            tasks.append(asyncio.create_task(one(payload)))
+        sent = due
+        await asyncio.sleep(0.001)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "name": "admission_spike" if enabled else "admission_spike_disabled",
+        "offered_rps": rate,
+        "requests": total,
+        # Успешные ответы, пришедшие до таймаута клиента, в секунду
+        "rps": len(samples) / elapsed,
+        "statuses": dict(sorted(statuses.items())),
+        "session_success": served["session"] / max(1, offered["session"]),
+        "anonymous_success": served["anonymous"] / max(1, offered["anonymous"]),
+        **percentiles(samples),
+    }
+
+
+async def run_async(duration: float, overload: float) -> List[Dict]:
+    rate = NODE_CAPACITY * overload
+    transport = httpx.ASGITransport(app=main_v2.app)
+    results = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+        for enabled in (False, True):
+            main_v2.admission = make_admission(enabled)
+            install_stub(SaturatingNode(NODE_CAPACITY, NODE_LATENCY))
+            await main_v2.chain_health.refresh()
+            # Обычная нагрузка: лимит узнаёт задержку ненагруженной ноды
+            await offered_load(client, make_bet_payloads(int(NODE_CAPACITY * WARMUP_SECONDS)), set(),
+                               NODE_CAPACITY * WARMUP_LOAD, WARMUP_SECONDS, enabled)
+            # Каждая ставка - новый адрес: холодный nonce и никакого rate limiting
+            payloads = make_bet_payloads(int(rate * duration) + 1)
+            sessions = {payload["player_address"] for payload in payloads[::2]}
+            for address in sessions:
+                await main_v2.get_player_session(address)
+            result = await offered_load(client, payloads, sessions, rate, duration, enabled)
+            results.append({**result, "node_capacity_rps": NODE_CAPACITY})
+
+    main_v2.signature_verifier.shutdown()
+    return results
+
+
+def run(quick: bool = False) -> List[Dict]:
+    return asyncio.run(run_async(duration=2.0 if quick else 10.0, overload=2.0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк контроля допуска при всплеске нагрузки")
+    parser.add_argument("--quick", action="store_true", help="Всплеск 2 с вместо 10 с")
+    parser.add_argument("--overload", type=float, default=2.0, help="Темп всплеска относительно пропускной способности ноды")
+    parser.add_argument("--output", help="Файл для JSON с результатами")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_async(2.0 if args.quick else 10.0, args.overload))
+    for result in results:
+        print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
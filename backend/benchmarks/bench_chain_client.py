@@ -0,0 +1,99 @@
+# blockchain_roulette/backend/benchmarks/bench_chain_client.py
+# Задержки API при быстрой и медленной ноде (локальная замена JSON-RPC)
+#
+# Запуск из папки backend:
+#   python benchmarks/bench_chain_client.py --latency 0.001 0.5
+
+import argparse
+import asyncio
+import json
+import secrets
+import time
+
+import httpx
+
+from common import CONTRACT_ADDRESS, PLACE_BET_ABI, percentiles
+from rpc_stub import RPCStub
+
+import main_v2
+from chain_client import AsyncChainClient, ChainHealth, ContractABI, GasPriceOracle, NonceManager
+
+
+def install_stub(stub: RPCStub):
+    """Подключает приложение к заглушке ноды вместо реального провайдера"""
+    main_v2.chain_client = AsyncChainClient(
+        "http://rpc-stub/", transport=httpx.ASGITransport(app=stub), timeout=5.0
+    )
+    main_v2.chain_health = ChainHealth(main_v2.chain_client)
+    main_v2.nonce_manager = NonceManager(main_v2.chain_client)
+    main_v2.gas_oracle = GasPriceOracle(main_v2.chain_client)
+    main_v2.contract = ContractABI(CONTRACT_ADDRESS, abi=PLACE_BET_ABI).load()
+    main_v2.rate_limiter.limits["bet"] = main_v2.RateLimit(10**9, 3600)
+
+
+async def timed(client: httpx.AsyncClient, method: str, url: str, samples: list, **kwargs):
+    started = time.perf_counter()
+    response = await getattr(client, method)(url, **kwargs)
+    samples.append(time.perf_counter() - started)
+    return response.status_code
+
+
+async def run(latency: float, bets: int, probes: int) -> dict:
+    stub = RPCStub(latency=latency)
+    install_stub(stub)
+    await main_v2.chain_health.refresh()
+
+    bet_samples, health_samples = [], []
+    transport = httpx.ASGITransport(app=main_v2.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+        async def probe_health():
+            # Health-пробы идут, пока ставки ждут ответа ноды
+            for _ in range(probes):
+                await timed(client, "get", "/health", health_samples)
+                await asyncio.sleep(0.005)
+
+        bet_calls = [
+            timed(client, "post", "/bet/prepare", bet_samples, json={
+                "number": 7, "amount": 0.01, "player_address": "0x" + secrets.token_hex(20)
+            })
+            for _ in range(bets)
+        ]
+        statuses = await asyncio.gather(probe_health(), *bet_calls)
+
+    await main_v2.chain_client.close()
+    return {
+        "node_latency_ms": latency * 1000,
+        "bet_errors": sum(status != 200 for status in statuses[1:]),
+        "rpc_http_requests": stub.http_requests,
+        "bet_prepare": percentiles(bet_samples),
+        "health": percentiles(health_samples),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Задержки API при медленной ноде")
+    parser.add_argument("--latency", type=float, nargs="+", default=[0.001, 0.5])
+    parser.add_argument("--bets", type=int, default=200)
+    parser.add_argument("--probes", type=int, default=100)
+    parser.add_argument("--output", help="Файл для JSON с результатами")
+    args = parser.parse_args()
+
+    results = []
+    for latency in args.latency:
+        result = await run(latency, args.bets, args.probes)
+        print(
+            f"node latency {latency * 1000:.0f} ms: "
+            f"bet p99 {result['bet_prepare']['p99_ms']:.1f} ms, "
+            f"health p99 {result['health']['p99_ms']:.1f} ms, "
+            f"RPC requests {result['rpc_http_requests']} for {args.bets} bets, "
+            f"errors {result['bet_errors']}"
+        )
+        results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,242 @@
+# blockchain_roulette/backend/benchmarks/bench_core.py
+# Микробенчмарки zk_system, bayesian_analyzer и risk_engine на разных объёмах данных
+#
+# Запуск из папки backend:
+#   python benchmarks/bench_core.py [--quick]
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import random
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from common import measure
+
+from bayesian_analyzer import BayesianAnalyzer, PlayerProfileStore
+from risk_engine import RiskEngine
+from zk_system import IncrementalMerkleTree, ZKSystem
+
+PLAYER = "0x1234567890123456789012345678901234567890"
+
+
+def _leaves(size: int) -> List[str]:
+    return [hashlib.sha256(i.to_bytes(8, "big")).hexdigest() for i in range(size)]
+
+
+def _result(name: str, size: int, timing: Dict[str, float]) -> Dict:
+    return {"name": name, "size": size, **timing}
+
+
+def bench_merkle(size: int) -> List[Dict]:
+    leaves = _leaves(size)
+    number = max(1, 10_000 // size)
+
+    incremental = IncrementalMerkleTree(leaves)
+    incremental.root
+
+    def build_incremental():
+        IncrementalMerkleTree(leaves).root
+
+    indices = [random.randrange(size) for _ in range(1000)]
+    proof_index = itertools.cycle(indices)
+
+    return [
+        _result("incremental_merkle_build", size, measure(build_incremental, number, repeat=3)),
+        _result("incremental_merkle_get_proof", size,
+                measure(lambda: incremental.get_proof(next(proof_index)), 1000)),
+    ]
+
+
+def bench_zk(size: int) -> List[Dict]:
+    """Операции ZKSystem при size commitment'ах в хранилище и живой эпохе"""
+    zk = ZKSystem(epoch_duration=10**9)
+    for i in range(size):
+        zk.generate_player_commitment(PLAYER, i % 37)
+
+    commitment = zk.generate_player_commitment(PLAYER, 7)
+    proof = zk.generate_zk_proof(PLAYER, commitment[1], commitment[2])
+
+    def commit_and_prove():
+        _, commitment_hash, secret_key = zk.generate_player_commitment(PLAYER, 7)
+        zk.generate_zk_proof(PLAYER, commitment_hash, secret_key)
+
+    return [
+        _result("generate_player_commitment", size,
+                measure(lambda: zk.generate_player_commitment(PLAYER, 7), 1000)),
+        _result("generate_zk_proof", size,
+                measure(lambda: zk.generate_zk_proof(PLAYER, commitment[1], commitment[2]), 1000)),
+        _result("commit_and_prove", size, measure(commit_and_prove, 1000)),
+        _result("verify_zk_proof", size, measure(lambda: zk.verify_zk_proof(proof, PLAYER), 1000)),
+    ]
+
+
+def _per_item(timing: Dict[str, float], count: int) -> Dict[str, float]:
+    return {
+        "us_per_op": timing["us_per_op"] / count,
+        "best_us_per_op": timing["best_us_per_op"] / count,
+        "ops_per_sec": timing["ops_per_sec"] * count,
+    }
+
+
+def bench_audit(size: int) -> List[Dict]:
+    """Аудит запечатанной эпохи из size commitment'ов: время на одно доказательство"""
+    zk = ZKSystem(epoch_duration=10**9)
+    commitments = zk.generate_player_commitments_batch([(PLAYER, i % 37) for i in range(size)])
+    zk.seal_epoch()
+    proofs = zk.generate_zk_proofs_batch([(PLAYER, c[1], c[2]) for c in commitments])
+    hashes = [c[1] for c in commitments]
+    sample = hashes[::100]
+
+    def verify_each():
+        for proof in proofs:
+            zk.verify_zk_proof(proof, PLAYER, max_age=None)
+
+    def multiproof_all():
+        zk.verify_multiproof(zk.generate_multiproof(hashes))
+
+    multiproof = zk.generate_multiproof(sample)
+    return [
+        _result("verify_zk_proof_each", size, _per_item(measure(verify_each, 1, repeat=3), size)),
+        _result("verify_zk_proofs_batch", size,
+                _per_item(measure(lambda: zk.verify_zk_proofs_batch(proofs, [PLAYER] * len(proofs), max_age=None), 1, repeat=3), size)),
+        _result("multiproof_prove_verify_all", size, _per_item(measure(multiproof_all, 1, repeat=3), size)),
+        {
+            "name": "multiproof_nodes_1pct",
+            "size": size,
+            "us_per_op": measure(lambda: zk.verify_multiproof(multiproof), 5, repeat=3)["us_per_op"],
+            "nodes": len(multiproof.nodes),
+            "separate_path_nodes": sum(len(proofs[i].merkle_proof) for i in range(0, size, 100)),
+        },
+    ]
+
+
+def bench_bayesian(size: int) -> List[Dict]:
+    """size - число игроков с профилями"""
+    analyzer = BayesianAnalyzer()
+    players = ["0x%040x" % i for i in range(size)]
+    analyzer.update_player_stats_batch([(player, {"amount": 0.1, "won": False}) for player in players])
+
+    numbers = itertools.cycle(range(37))
+    player_iter = itertools.cycle(players)
+    bet = {"amount": 0.1, "won": True, "payout": 3.6}
+
+    def distribution_after_update():
+        number = next(numbers)
+        analyzer.update_number_posterior(number, successes=1)
+        analyzer.get_bayesian_probability_distribution(number)
+
+    batch = [(next(player_iter), bet) for _ in range(1000)]
+    
+    return [
+        _result("bayesian_distribution_cached", size,
+                measure(lambda: analyzer.get_bayesian_probability_distribution(next(numbers)), 1000)),
+        _result("bayesian_distribution_updated", size, measure(distribution_after_update, 200)),
+        _result("bayesian_posterior_summary", size, measure(analyzer.get_posterior_summary, 200)),
+        _result("update_player_stats", size,
+                measure(lambda: analyzer.update_player_stats(next(player_iter), bet), 1000)),
+        _result("update_player_stats_batch_1000", size,
+                measure(lambda: analyzer.update_player_stats_batch(batch), 20)),
+        _result("export_analytics_report", size, measure(analyzer.export_analytics_report, 5, repeat=3)),
+    ]
+
+
+def _hex_addresses(size: int) -> np.ndarray:
+    """Адреса "0x%040x" % i для i < size одним массивом S42 (по возрастанию)"""
+    digits = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+    chars = np.full((size, 42), ord("0"), dtype=np.uint8)
+    chars[:, 1] = ord("x")
+    numbers = np.arange(size, dtype=np.uint64)
+    for position in range(16):
+        chars[:, 41 - position] = digits[(numbers >> np.uint64(4 * position)) & np.uint64(15)]
+    return chars.view("S42").ravel()
+
+
+def _synthetic_store(size: int) -> PlayerProfileStore:
+    """Хранилище как после восстановления снапшота: size игроков, у 1% - тысячи ставок"""
+    rng = np.random.default_rng(3)
+    bets = rng.integers(0, 300, size)
+    heavy = rng.choice(size, size // 100, replace=False)
+    bets[heavy] = rng.integers(300, 5000, len(heavy))
+    addresses = _hex_addresses(size)
+    return PlayerProfileStore.from_columns(addresses, addresses, np.arange(size), {
+        "total_bets": bets,
+        "wins": rng.binomial(bets, 1 / 37),
+        "risk_score": np.zeros(size),
+    })
+
+
+def bench_risk(size: int, workers: int = 1) -> List[Dict]:
+    """Полный пересчёт оценок риска size игроков, инкрементальный пересчёт и проверка при ставке"""
+    analyzer = BayesianAnalyzer()
+    store = analyzer.player_profiles = _synthetic_store(size)
+    engine = RiskEngine(analyzer, workers=workers)
+    engine.rescore_all()  # таблица оценок и импорт scipy - вне замера
+
+    started = time.perf_counter()
+    engine.rescore_all()
+    full_seconds = time.perf_counter() - started
+    suffix = f"_w{workers}" if workers > 1 else ""
+    results = [{
+        "name": "risk_full_rescore" + suffix,
+        "size": size,
+        "seconds": full_seconds,
+        "us_per_op": full_seconds / size * 1e6,
+        "players_per_sec": size / full_seconds,
+    }]
+
+    # Пакет ставок 10k игроков и пересчёт только их оценок
+    players = ["0x%040x" % row for row in np.random.default_rng(5).choice(size, 10_000, replace=False)]
+    amounts, won, payouts = [0.1] * len(players), [False] * len(players), [0.0] * len(players)
+
+    def incremental():
+        store.update_batch(players, amounts, won, payouts)
+        engine.rescore_dirty()
+
+    player_iter = itertools.cycle(players)
+    results += [
+        _result("risk_incremental_10k" + suffix, size, measure(incremental, 5, repeat=3)),
+        # Проверка при ставке читает готовую оценку
+        _result("risk_score_check" + suffix, size, measure(lambda: store.risk_score(next(player_iter)), 1000)),
+    ]
+    engine.stop_executor()
+    return results
+
+
+def run(quick: bool = False) -> List[Dict]:
+    sizes = [100, 10_000] if quick else [100, 10_000, 200_000]
+    results = []
+    for size in sizes:
+        results += bench_merkle(size)
+        results += bench_zk(size)
+        results += bench_bayesian(size)
+    for size in [1_000] if quick else [1_000, 65_536]:
+        results += bench_audit(size)
+    for size in [1_000_000] if quick else [1_000_000, 10_000_000]:
+        results += bench_risk(size)
+        if not quick and (os.cpu_count() or 1) > 1:
+            results += bench_risk(size, workers=os.cpu_count())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микробенчмарки zk_system и bayesian_analyzer")
+    parser.add_argument("--quick", action="store_true", help="Только малые объёмы данных")
+    parser.add_argument("--output", help="Файл для JSON с результатами")
+    args = parser.parse_args()
+
+    results = run(args.quick)
+    for result in results:
+        print(f"{result['name']:<32} size={result['size']:<8} {result['us_per_op']:>12.2f} us/op")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
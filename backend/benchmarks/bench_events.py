@@ -0,0 +1,136 @@
+# blockchain_roulette/backend/benchmarks/bench_events.py
+# Хранилище подозрительных событий: запись при высоком темпе, память под нагрузкой и запросы по времени и игроку
+#
+# Запуск из папки backend:
+#   python benchmarks/bench_events.py [--quick]
+
+import argparse
+import itertools
+import json
+import time
+import tracemalloc
+from typing import Dict, List
+
+from common import measure
+
+from bayesian_analyzer import SuspiciousEvent
+from event_store import SuspiciousEventStore
+
+PLAYERS = 10_000
+EVENT_TYPES = ("wheel_bias_cusum", "wheel_bias_chi2", "win_streak", "bet_pattern")
+
+
+class Clock:
+    """Синтетическое время: события идут с темпом rate в секунду"""
+
+    def __init__(self, start: float = 1.7e9):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _event(i: int, when: float) -> SuspiciousEvent:
+    return SuspiciousEvent(f"0x{i * 7919 % PLAYERS:040x}", EVENT_TYPES[i % len(EVENT_TYPES)],
+                           0.7, "bench", 0.95, when)
+
+
+def _stream(total: int, rate: float, max_events: int, traced: bool):
+    clock = Clock()
+    store = SuspiciousEventStore(max_events=max_events, retention=24 * 3600, clock=clock)
+    step = 1.0 / rate
+    checkpoints = []
+    if traced:
+        tracemalloc.start()
+    started = time.perf_counter()
+    for i in range(total):
+        clock.now += step
+        store.append(_event(i, clock.now))
+        if traced and (i + 1) % (total // 10) == 0:
+            checkpoints.append(tracemalloc.get_traced_memory()[0])
+    elapsed = time.perf_counter() - started
+    if traced:
+        tracemalloc.stop()
+    return store, elapsed, checkpoints
+
+
+def bench_sustained(total: int, rate: float, max_events: int) -> Dict:
+    """
+    total событий с темпом rate/с: время записи - без tracemalloc, память
+    Python - отдельным проходом, на каждой десятой части потока
+    """
+    store, elapsed, _ = _stream(total, rate, max_events, traced=False)
+    _, _, checkpoints = _stream(total, rate, max_events, traced=True)
+    # Рост памяти во второй половине потока, когда хранилище уже заполнено
+    settled = checkpoints[len(checkpoints) // 2 - 1]
+    return {
+        "name": "events_sustained",
+        "size": total,
+        "events_per_sec_offered": rate,
+        "stored": len(store),
+        "evicted": store.evicted,
+        "us_per_op": elapsed / total * 1e6,
+        "memory_mb": checkpoints[-1] / 2**20,
+        "memory_growth_second_half": checkpoints[-1] / settled - 1.0,
+    }
+
+
+def bench_queries(size: int) -> List[Dict]:
+    """Запросы к заполненному хранилищу против прохода по списку (прежнее представление)"""
+    clock = Clock()
+    store = SuspiciousEventStore(max_events=size, retention=7 * 24 * 3600, clock=clock)
+    # size событий за 7 дней
+    step = 7 * 24 * 3600 / size
+    events = []
+    for i in range(size):
+        clock.now += step
+        event = _event(i, clock.now)
+        events.append(event)
+        store.append(event)
+
+    day_ago = clock.now - 24 * 3600
+    players = itertools.cycle(f"0x{i:040x}" for i in range(0, PLAYERS, 97))
+
+    def legacy_player():
+        player = next(players)
+        return [event for event in events if event.player_address == player]
+
+    return [
+        {"name": "events_count_24h", "size": size, **measure(lambda: store.count(since=day_ago), 1000)},
+        {"name": "events_count_24h_scan", "size": size,
+         **measure(lambda: sum(1 for event in events if event.unix_time >= day_ago), 3, repeat=3)},
+        {"name": "events_player_query", "size": size,
+         **measure(lambda: store.for_player(next(players), limit=10), 1000)},
+        {"name": "events_player_query_scan", "size": size, **measure(legacy_player, 3, repeat=3)},
+        {"name": "events_range_last_hour", "size": size,
+         **measure(lambda: store.range(since=clock.now - 3600), 100)},
+        {"name": "events_histogram_24h", "size": size, **measure(lambda: store.histogram(day_ago), 100)},
+    ]
+
+
+def run(quick: bool = False) -> List[Dict]:
+    total = 500_000 if quick else 5_000_000
+    sizes = [100_000] if quick else [100_000, 1_000_000]
+    results = [bench_sustained(total, rate=10_000, max_events=100_000)]
+    for size in sizes:
+        results += bench_queries(size)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк хранилища подозрительных событий")
+    parser.add_argument("--quick", action="store_true", help="Меньше событий")
+    parser.add_argument("--output", help="Файл для JSON с результатами")
+    args = parser.parse_args()
+
+    results = run(args.quick)
+    for result in results:
+        print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
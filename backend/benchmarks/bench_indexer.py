@@ -0,0 +1,185 @@
+# blockchain_roulette/backend/benchmarks/bench_indexer.py
+# Индексатор событий контракта: догрузка истории через eth_getLogs и переживание реорганизации
+#
+# Запуск из папки backend:
+#   python benchmarks/bench_indexer.py [--quick] [--latency 0.02]
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from common import CONTRACT_ADDRESS
+from rpc_stub import RPCStub
+
+from bayesian_analyzer import BayesianAnalyzer
+from chain_client import AsyncChainClient
+from event_indexer import BET_PLACED_SIGNATURE, BET_SETTLED_SIGNATURE, EventIndexer, WEI, event_topic
+
+# Блок раз в 12 секунд: год истории - 2.6M блоков
+BLOCKS_PER_DAY = 24 * 3600 // 12
+PLAYERS = 5000
+
+
+class SyntheticBets:
+    """
+    Ставка каждые every блоков, расчёт - через settle_delay блоков.
+    Логи генерируются по запросу, так что история любой длины не хранится в памяти
+    """
+
+    def __init__(self, every: int = 5, settle_delay: int = 2):
+        self.every = every
+        self.settle_delay = settle_delay
+        self.placed_topic = event_topic(BET_PLACED_SIGNATURE)
+        self.settled_topic = event_topic(BET_SETTLED_SIGNATURE)
+
+    @staticmethod
+    def bet(bet_id: int):
+        number = bet_id * 7 % 37
+        result = (bet_id * 31 + 5) % 37
+        amount = 10**16 * (1 + bet_id % 5)
+        return number, result, amount, amount * 36 if number == result else 0
+
+    def _log(self, topic: str, bet_id: int, block: int, data: bytes) -> Dict[str, Any]:
+        return {
+            "address": CONTRACT_ADDRESS,
+            "topics": [topic, "0x%064x" % bet_id, "0x%064x" % (bet_id % PLAYERS + 1)],
+            "data": "0x" + data.hex(),
+            "blockNumber": hex(block),
+            "transactionHash": "0x%064x" % bet_id,
+            "logIndex": "0x0" if topic == self.placed_topic else "0x1",
+            "removed": False,
+        }
+
+    def __call__(self, from_block: int, to_block: int) -> List[Dict[str, Any]]:
+        logs = []
+        first = -(-(from_block - self.settle_delay) // self.every) * self.every
+        for block in range(max(0, first), to_block + 1, self.every):
+            bet_id = block // self.every
+            number, result, amount, payout = self.bet(bet_id)
+            if block >= from_block:
+                logs.append(self._log(self.placed_topic, bet_id, block, b"".join((
+                    number.to_bytes(32, "big"), amount.to_bytes(32, "big"), bet_id.to_bytes(32, "big")
+                ))))
+            settled_at = block + self.settle_delay
+            if from_block <= settled_at <= to_block:
+                logs.append(self._log(self.settled_topic, bet_id, settled_at, b"".join((
+                    result.to_bytes(32, "big"), amount.to_bytes(32, "big"), payout.to_bytes(32, "big")
+                ))))
+        logs.sort(key=lambda log: int(log["blockNumber"], 16))
+        return logs
+
+    def expected(self, last_block: int) -> Dict[str, float]:
+        """Сколько ставок рассчитано к блоку last_block и их сумма"""
+        bets = [bet_id for bet_id in range((last_block - self.settle_delay) // self.every + 1)]
+        return {
+            "bets": len(bets),
+            "amount": sum(self.bet(bet_id)[2] for bet_id in bets) / WEI,
+        }
+
+
+def _indexer(stub: RPCStub, analyzer: BayesianAnalyzer, **kwargs) -> EventIndexer:
+    client = AsyncChainClient("http://rpc-stub/", transport=httpx.ASGITransport(app=stub), timeout=30.0)
+    return EventIndexer(client, analyzer, CONTRACT_ADDRESS, **kwargs)
+
+
+def _totals(analyzer: BayesianAnalyzer) -> Dict[str, float]:
+    return {
+        "bets": int(analyzer.player_profiles.column("total_bets").sum()),
+        "amount": float(analyzer.player_profiles.column("total_amount").sum()),
+    }
+
+
+async def bench_backfill(days: int, latency: float, concurrency: int) -> Dict:
+    """Догрузка days дней истории с нуля; провайдер ограничивает ответ 10k логов"""
+    chain = SyntheticBets()
+    stub = RPCStub(latency=latency)
+    stub.log_source = chain
+    stub.block_number = days * BLOCKS_PER_DAY
+    stub.max_block_range = 100_000
+
+    analyzer = BayesianAnalyzer()
+    indexer = _indexer(stub, analyzer, concurrency=concurrency, confirmations=12)
+    started = time.perf_counter()
+    stats = await indexer.sync()
+    elapsed = time.perf_counter() - started
+    await indexer.client.close()
+
+    blocks = stats["block"] + 1
+    expected = chain.expected(stats["block"])
+    totals = _totals(analyzer)
+    return {
+        "name": f"indexer_backfill_c{concurrency}",
+        "size": days,
+        "node_latency_ms": latency * 1000,
+        "blocks": blocks,
+        "seconds": elapsed,
+        "blocks_per_sec": blocks / elapsed,
+        "logs_per_sec": stats["logs"] / elapsed,
+        "us_per_op": elapsed / blocks * 1e6,
+        "requests": stats["requests"],
+        "splits": stats["splits"],
+        "final_chunk_size": stats["chunk_size"],
+        "consistent": totals["bets"] == expected["bets"] and abs(totals["amount"] - expected["amount"]) < 1e-6,
+    }
+
+
+async def bench_reorg() -> Dict:
+    """Реорганизация глубже confirmations: откат и переиндексация без двойного учёта"""
+    chain = SyntheticBets()
+    stub = RPCStub()
+    stub.log_source = chain
+    stub.block_number = 1000
+
+    analyzer = BayesianAnalyzer()
+    indexer = _indexer(stub, analyzer, confirmations=2, chunk_size=50)
+    await indexer.sync()
+    # Несколько проходов у головы: якоря для поиска общего предка
+    for _ in range(5):
+        stub.block_number += 10
+        await indexer.sync()
+
+    stub.reorg(30)
+    stub.block_number += 5
+    stats = await indexer.sync()
+    await indexer.client.close()
+
+    expected = chain.expected(stats["block"])
+    return {
+        "name": "indexer_reorg",
+        "reorgs": stats["reorgs"],
+        "duplicate_bets": stats["duplicate_bets"],
+        "consistent": _totals(analyzer)["bets"] == expected["bets"],
+    }
+
+
+def run(quick: bool = False, latency: float = 0.02) -> List[Dict]:
+    days = 30 if quick else 365
+    return [
+        asyncio.run(bench_backfill(days, latency, concurrency=1)),
+        asyncio.run(bench_backfill(days, latency, concurrency=8)),
+        asyncio.run(bench_reorg()),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк индексатора событий контракта")
+    parser.add_argument("--quick", action="store_true", help="Месяц истории вместо года")
+    parser.add_argument("--latency", type=float, default=0.02, help="Задержка ответа ноды, с")
+    parser.add_argument("--output", help="Файл для JSON с результатами")
+    args = parser.parse_args()
+
+    results = run(args.quick, args.latency)
+    for result in results:
+        print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
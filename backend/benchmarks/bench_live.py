@@ -0,0 +1,124 @@
+# blockchain_roulette/backend/benchmarks/bench_live.py
+# Live-лента: задержка публикации и доставки кадров при тысячах подписчиков, часть из которых не читает
+#
+# Запуск из папки backend:
+#   python benchmarks/bench_live.py [--quick]
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from common import percentiles
+
+from bayesian_analyzer import BayesianAnalyzer, SuspiciousEvent
+from live_feed import LiveFeed
+
+# Доля подписчиков, которые не читают ленту: их очереди переполняются
+SLOW_FRACTION = 0.1
+
+
+class Samples:
+    """Замена metrics.Histogram: сохраняет сами значения для перцентилей"""
+
+    def __init__(self):
+        self.values: List[float] = []
+
+    def observe(self, value: float):
+        self.values.append(value)
+
+
+async def bench_fanout(clients: int, duration: float, window: float) -> Dict:
+    """Вращения и события поступают непрерывно; кадр раз в window секунд уходит всем подписчикам"""
+    analyzer = BayesianAnalyzer()
+    publish = Samples()
+    feed = LiveFeed(analyzer, coalesce_window=window, max_subscribers=clients, publish_histogram=publish)
+    feed.start()
+
+    # Время раскладки кадра seq и время получения его последним быстрым подписчиком
+    published: Dict[int, float] = {}
+    fanout: List[float] = []
+    flush = feed.flush
+
+    def timed_flush():
+        started = time.perf_counter()
+        flush()
+        finished = time.perf_counter()
+        fanout.append(finished - started)
+        published[feed.seq] = finished
+
+    feed.flush = timed_flush
+    delivered: Dict[int, float] = {}
+
+    async def reader(subscriber):
+        async for frame in subscriber.frames():
+            delivered[frame.seq] = time.perf_counter()
+
+    slow = int(clients * SLOW_FRACTION)
+    subscribers = [feed.subscribe() for _ in range(clients)]
+    readers = [asyncio.create_task(reader(subscriber)) for subscriber in subscribers[slow:]]
+
+    # Приём: пакеты вращений, изредка подозрительное событие и ставки игроков
+    rng = np.random.default_rng(7)
+    ingest: List[float] = []
+    deadline = time.perf_counter() + duration
+    batch = 0
+    while time.perf_counter() < deadline:
+        counts = np.bincount(rng.integers(0, 37, 16), minlength=37)
+        started = time.perf_counter()
+        analyzer.record_spins(counts)
+        analyzer.update_player_stats(f"0x{batch % 500:040x}", {"amount": 0.01, "won": batch % 3 == 0, "payout": 0.36})
+        if batch % 50 == 0:
+            analyzer.add_suspicious_event(SuspiciousEvent("0x0", "wheel_bias_cusum", 0.6, "bench", 0.9, time.time()))
+        ingest.append(time.perf_counter() - started)
+        batch += 1
+        await asyncio.sleep(0.001)
+
+    await asyncio.sleep(window * 2)
+    feed.stop()
+    await asyncio.gather(*readers, return_exceptions=True)
+
+    delivery = [delivered[seq] - at for seq, at in published.items() if seq in delivered]
+    return {
+        "name": "live_fanout",
+        "size": clients,
+        "slow_clients": slow,
+        "frames": feed.stats["frames"],
+        "updates": feed.stats["updates"],
+        "frame_bytes": feed.stats["bytes"] / max(1, feed.stats["frames"]),
+        "dropped_frames": sum(subscriber.dropped for subscriber in subscribers),
+        # Раскладка одного кадра по всем очередям
+        "us_per_op": float(np.median(fanout)) * 1e6 if fanout else 0.0,
+        "publish_p99_ms": float(np.percentile(publish.values, 99)) * 1000 if publish.values else 0.0,
+        "ingest_us_p99": float(np.percentile(ingest, 99)) * 1e6,
+        # Задержка от раскладки до получения кадра быстрыми подписчиками
+        **percentiles(delivery),
+    }
+
+
+def run(quick: bool = False) -> List[Dict]:
+    sizes = [100, 1000] if quick else [100, 1000, 5000]
+    duration = 1.0 if quick else 3.0
+    return [asyncio.run(bench_fanout(clients, duration, window=0.02)) for clients in sizes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк live-ленты")
+    parser.add_argument("--quick", action="store_true", help="До 1000 подписчиков и 1 с нагрузки")
+    parser.add_argument("--output", help="Файл для JSON с результатами")
+    args = parser.parse_args()
+
+    results = run(args.quick)
+    for result in results:
+        print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
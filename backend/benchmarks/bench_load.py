@@ -0,0 +1,155 @@
+# blockchain_roulette/backend/benchmarks/bench_load.py
+# Нагрузочный тест /bet/prepare, /auth/player и опроса /analytics внутри процесса через ASGI
+#
+# Запуск из папки backend:
+#   python benchmarks/bench_load.py --requests 5000 --concurrency 64
+
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import secrets
+import time
+from collections import Counter
+from typing import Dict, List
+
+import httpx
+
+from common import percentiles
+
+import main_v2
+
+
+def make_bet_payloads(wallets: int) -> List[Dict]:
+    return [
+        {"number": i % 37, "amount": 0.01, "player_address": "0x" + secrets.token_hex(20)}
+        for i in range(wallets)
+    ]
+
+
+def make_auth_payloads(wallets: int) -> List[Dict]:
+    """Подписанные сообщения входа; подпись - та же схема, что проверяет API"""
+    from eth_account import Account
+    from eth_account.messages import encode_defunct
+
+    payloads = []
+    for i in range(wallets):
+        account = Account.create()
+        message = f"ZK-Roulette login {i} {secrets.token_hex(8)}"
+        message_hash = hashlib.sha3_256(message.encode()).digest()
+        signature = Account.sign_message(encode_defunct(primitive=message_hash), account.key).signature
+        payloads.append({
+            "wallet_address": account.address,
+            "signature": signature.hex(),
+            "message": message,
+        })
+    return payloads
+
+
+async def drive(client: httpx.AsyncClient, path: str, payloads: List[Dict], requests: int, concurrency: int) -> Dict:
+    """Замкнутый цикл: concurrency клиентов, каждый шлёт следующий запрос после ответа"""
+    samples: List[float] = []
+    statuses: Counter = Counter()
+    source = itertools.cycle(payloads)
+    remaining = itertools.count()
+
+    async def client_loop():
+        while next(remaining) < requests:
+            payload = next(source)
+            started = time.perf_counter()
+            response = await client.post(path, json=payload)
+            samples.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "name": f"load{path.replace('/', '_')}",
+        "requests": len(samples),
+        "wallets": len(payloads),
+        "concurrency": concurrency,
+        "rps": len(samples) / elapsed,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        **percentiles(samples),
+    }
+
+
+async def poll(client: httpx.AsyncClient, path: str, requests: int, concurrency: int, conditional: bool) -> Dict:
+    """Опрос GET-эндпоинта; conditional - клиент присылает последний полученный ETag"""
+    samples: List[float] = []
+    statuses: Counter = Counter()
+    remaining = itertools.count()
+    etag = (await client.get(path)).headers.get("etag") if conditional else None
+    headers = {"If-None-Match": etag} if etag else {}
+
+    async def client_loop():
+        while next(remaining) < requests:
+            started = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            samples.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "name": f"load{path.replace('/', '_')}" + ("_304" if conditional else ""),
+        "requests": len(samples),
+        "concurrency": concurrency,
+        "rps": len(samples) / elapsed,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        **percentiles(samples),
+    }
+
+
+async def run_async(requests: int, concurrency: int, bet_wallets: int, auth_wallets: int) -> List[Dict]:
+    bet_payloads = make_bet_payloads(bet_wallets)
+    auth_payloads = make_auth_payloads(auth_wallets)
+
+    transport = httpx.ASGITransport(app=main_v2.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+        results = [
+            await drive(client, "/bet/prepare", bet_payloads, requests, concurrency),
+            await drive(client, "/auth/player", auth_payloads, max(1, requests // 5), concurrency),
+            await poll(client, "/analytics", requests, concurrency, conditional=False),
+            await poll(client, "/analytics", requests, concurrency, conditional=True),
+        ]
+
+    main_v2.signature_verifier.shutdown()
+    return results
+
+
+def run(quick: bool = False) -> List[Dict]:
+    if quick:
+        return asyncio.run(run_async(1000, 32, 1000, 50))
+    return asyncio.run(run_async(10_000, 64, 5000, 300))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест API через ASGI")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--bet-wallets", type=int, default=5000)
+    parser.add_argument("--auth-wallets", type=int, default=300)
+    parser.add_argument("--output", help="Файл для JSON с результатами")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_async(args.requests, args.concurrency, args.bet_wallets, args.auth_wallets))
+    for result in results:
+        print(
+            f"{result['name']:<20} {result['rps']:>8.0f} req/s  "
+            f"p50 {result['p50_ms']:.2f} ms  p95 {result['p95_ms']:.2f} ms  "
+            f"p99 {result['p99_ms']:.2f} ms  statuses {result['statuses']}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
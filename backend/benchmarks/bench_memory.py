@@ -0,0 +1,208 @@
+# blockchain_roulette/backend/benchmarks/bench_memory.py
+# Память на запись: commitment'ы, доказательства, профили и события до и после перехода на __slots__
+#
+# Запуск из папки backend:
+#   python benchmarks/bench_memory.py [--quick]
+
+import argparse
+import gc
+import hashlib
+import json
+import secrets
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+import common  # noqa: F401  (путь к модулям бэкенда)
+
+from bayesian_analyzer import PlayerProfile, PlayerProfileStore, SuspiciousEvent
+from zk_system import CommitmentStore, IncrementalMerkleTree, ZKCommitment, ZKProof
+
+# Игроков меньше, чем записей: адрес повторяется, как в реальном трафике
+PLAYERS = 10_000
+
+
+# =============== ПРЕЖНИЕ ПРЕДСТАВЛЕНИЯ (для сравнения) ===============
+
+class LegacyCommitment:
+    def __init__(self, player_address: str, number: int, nonce: str, timestamp: float):
+        self.player_address = player_address
+        self.number = number
+        self.nonce = nonce
+        self.timestamp = timestamp
+        data = f"{player_address}{number}{nonce}{timestamp}"
+        self.commitment_hash = hashlib.sha256(data.encode()).hexdigest()
+
+
+@dataclass
+class LegacyProof:
+    commitment: str
+    challenge: str
+    response: str
+    merkle_proof: List[str]
+    merkle_root: str
+    timestamp: float
+    epoch_id: int = 0
+    leaf_index: int = 0
+
+
+@dataclass
+class LegacyProfile:
+    address: str
+    total_bets: int
+    wins: int
+    total_amount: float
+    profit_loss: float
+    risk_score: float
+    win_rate: float
+    is_blacklisted: bool
+    last_activity: datetime
+    bet_patterns: Dict[str, Any]
+
+
+@dataclass
+class LegacyEvent:
+    player_address: str
+    event_type: str
+    severity: float
+    description: str
+    probability_score: float
+    timestamp: datetime
+
+
+# =============== ИЗМЕРЕНИЕ ===============
+
+def _address(i: int) -> str:
+    # Каждый запрос приносит свою строку адреса, даже для того же игрока
+    return f"0x{i % PLAYERS:040x}"
+
+
+def bytes_per_record(build: Callable[[int], Any], count: int) -> float:
+    """Прирост памяти Python (tracemalloc) на одну запись при построении count записей"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        records = build(count)
+        used = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+    del records
+    gc.collect()
+    return used / count
+
+
+def _commitments(cls) -> Callable[[int], CommitmentStore]:
+    def build(count: int) -> CommitmentStore:
+        store = CommitmentStore(max_commitments=count)
+        now = time.time()
+        for i in range(count):
+            address = _address(i)
+            timestamp = now + i * 1e-6
+            store[f"{address}_{timestamp}"] = cls(address, i % 37, secrets.token_hex(16), timestamp)
+        return store
+    return build
+
+
+def _proofs(legacy: bool, tree: IncrementalMerkleTree) -> Callable[[int], List[Any]]:
+    leaves = tree.levels[0]
+    root = tree.root_bytes
+    now = time.time()
+
+    def build(count: int) -> List[Any]:
+        proofs = []
+        for i in range(count):
+            index = i % len(leaves)
+            path = tree.get_proof_bytes(index)
+            challenge = hashlib.sha256(b"%d" % i).digest()
+            response = hashlib.sha256(challenge).digest()
+            if legacy:
+                proofs.append(LegacyProof(leaves[index].hex(), challenge.hex(), response.hex(),
+                                          [node.hex() for node in path], root.hex(), now, 0, index))
+            else:
+                proofs.append(ZKProof(leaves[index], challenge, response, path, root, now, 0, index))
+        return proofs
+    return build
+
+
+def _profiles(cls) -> Callable[[int], Dict[str, Any]]:
+    now = time.time()
+
+    def build(count: int) -> Dict[str, Any]:
+        profiles = {}
+        for i in range(count):
+            address = f"0x{i:040x}"
+            last_activity = datetime.fromtimestamp(now) if cls is LegacyProfile else now
+            profiles[address] = cls(address, 10, 3, 1.5, -0.5, 0.6, 0.3, False, last_activity, {})
+        return profiles
+    return build
+
+
+def _profile_store(count: int) -> PlayerProfileStore:
+    store = PlayerProfileStore()
+    batch = 100_000
+    for start in range(0, count, batch):
+        addresses = [f"0x{i:040x}" for i in range(start, min(count, start + batch))]
+        store.update_batch(addresses, [0.01] * len(addresses), [False] * len(addresses), [0.0] * len(addresses))
+    return store
+
+
+def _events(cls) -> Callable[[int], List[Any]]:
+    now = time.time()
+
+    def build(count: int) -> List[Any]:
+        events = []
+        kind = "bias_cusum"
+        for i in range(count):
+            timestamp = datetime.fromtimestamp(now + i) if cls is LegacyEvent else now + i
+            events.append(cls(_address(i), f"wheel_{kind}", 0.7, f"Число {i % 37}", 0.99, timestamp))
+        return events
+    return build
+
+
+def run(quick: bool = False) -> List[Dict]:
+    count = 100_000 if quick else 1_000_000
+    # Доказательство держит путь целиком; прежний формат на 1M не помещается в память стенда
+    proof_count = min(count, 200_000)
+    tree = IncrementalMerkleTree.from_leaf_bytes([hashlib.sha256(b"%d" % i).digest() for i in range(2 ** 16)])
+
+    cases = [
+        ("commitment", "before", _commitments(LegacyCommitment), count),
+        ("commitment", "after", _commitments(ZKCommitment), count),
+        ("proof", "before", _proofs(True, tree), proof_count),
+        ("proof", "after", _proofs(False, tree), proof_count),
+        ("profile", "before", _profiles(LegacyProfile), count),
+        ("profile", "after", _profiles(PlayerProfile), count),
+        ("profile", "store", _profile_store, count),
+        ("event", "before", _events(LegacyEvent), count),
+        ("event", "after", _events(SuspiciousEvent), count),
+    ]
+    results = []
+    for record, variant, build, size in cases:
+        results.append({
+            "name": f"memory_{record}_{variant}",
+            "size": size,
+            "bytes_per_record": bytes_per_record(build, size),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк памяти на запись")
+    parser.add_argument("--quick", action="store_true", help="100k записей вместо 1M")
+    parser.add_argument("--output", help="Файл для JSON с результатами")
+    args = parser.parse_args()
+
+    results = run(args.quick)
+    for result in results:
+        print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# blockchain_roulette/backend/benchmarks/bench_persistence.py
+# Пропускная способность WAL, запись снапшота и время восстановления состояния
+#
+# Запуск из папки backend:
+#   python benchmarks/bench_persistence.py [--quick] [--profiles 2000000]
+
+import argparse
+import asyncio
+import json
+import shutil
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+import common  # noqa: F401  (путь к модулям бэкенда)
+
+from bayesian_analyzer import BayesianAnalyzer
+from persistence import PersistenceManager
+from zk_system import ZKSystem
+
+PLAYER = "0x1234567890123456789012345678901234567890"
+
+
+def _manager(directory: str):
+    zk = ZKSystem(epoch_duration=10**9)
+    analyzer = BayesianAnalyzer()
+    manager = PersistenceManager(directory, zk, analyzer)
+    manager.acquire_lock()
+    manager.restore()
+    return manager, zk, analyzer
+
+
+async def bench_wal(directory: str, records: int) -> List[Dict]:
+    """Запись в WAL на горячем пути: commitment'ы и обновления профилей, со сбросом на диск"""
+    manager, zk, analyzer = _manager(directory)
+    addresses = ["0x%040x" % i for i in range(10_000)]
+    bet = {"amount": 0.1, "won": False}
+
+    results = []
+    for name, fn in (
+        ("wal_profile_update", lambda i: analyzer.update_player_stats(addresses[i % 10_000], bet)),
+        ("wal_commitment", lambda i: zk.generate_player_commitment(PLAYER, i % 37)),
+    ):
+        # Та же операция без журнала - чтобы видеть цену WAL
+        manager.detach()
+        started = time.perf_counter()
+        for i in range(records):
+            fn(i)
+        plain = time.perf_counter() - started
+
+        manager.attach()
+        bytes_before = manager.wal.bytes
+        started = time.perf_counter()
+        for i in range(records):
+            fn(i)
+        await manager.wal.flush_async()
+        logged = time.perf_counter() - started
+
+        results.append({
+            "name": name,
+            "size": records,
+            "us_per_op": logged / records * 1e6,
+            "plain_us_per_op": plain / records * 1e6,
+            "records_per_sec": records / logged,
+            "mb_per_sec": (manager.wal.bytes - bytes_before) / logged / 1e6,
+        })
+
+    await manager.stop(final_snapshot=False)
+    return results
+
+
+async def bench_restore(directory: str, profiles: int, commitments: int) -> List[Dict]:
+    manager, zk, analyzer = _manager(directory)
+    rng = np.random.default_rng(0)
+    analyzer.player_profiles.update_batch(
+        ["0x%040x" % i for i in range(profiles)],
+        rng.random(profiles), rng.random(profiles) < 0.03, rng.random(profiles) * 36
+    )
+    zk.generate_player_commitments_batch([(PLAYER, i % 37) for i in range(commitments)])
+
+    started = time.perf_counter()
+    await manager.snapshot()
+    snapshot_seconds = time.perf_counter() - started
+
+    # Хвост WAL после снапшота
+    tail = 100_000
+    addresses = ["0x%040x" % i for i in range(tail)]
+    bet = {"amount": 0.1, "won": True, "payout": 3.6}
+    for address in addresses:
+        analyzer.update_player_stats(address, bet)
+    await manager.stop(final_snapshot=False)
+
+    fresh_zk = ZKSystem(epoch_duration=10**9)
+    fresh_analyzer = BayesianAnalyzer()
+    restored = PersistenceManager(directory, fresh_zk, fresh_analyzer)
+    restored.acquire_lock()
+    started = time.perf_counter()
+    stats = restored.restore()
+    restore_seconds = time.perf_counter() - started
+    await restored.stop(final_snapshot=False)
+
+    assert len(fresh_analyzer.player_profiles) == profiles
+    assert len(fresh_zk.commitment_storage) == commitments
+
+    return [
+        {"name": "snapshot_write", "size": profiles, "seconds": snapshot_seconds,
+         "us_per_op": snapshot_seconds / profiles * 1e6},
+        {"name": "restore", "size": profiles, "seconds": restore_seconds,
+         "snapshot_load_seconds": stats["snapshot_seconds"],
+         "commitments": commitments, "wal_records": stats["wal_records"],
+         "us_per_op": restore_seconds / profiles * 1e6},
+    ]
+
+
+def run(quick: bool = False, profiles: int = 0) -> List[Dict]:
+    profiles = profiles or (200_000 if quick else 2_000_000)
+    directory = tempfile.mkdtemp(prefix="zk_persistence_")
+    try:
+        results = asyncio.run(bench_wal(directory + "/wal", 20_000 if quick else 200_000))
+        results += asyncio.run(bench_restore(directory + "/restore", profiles, 50_000 if quick else 200_000))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк WAL и снапшотов")
+    parser.add_argument("--quick", action="store_true", help="Уменьшенные объёмы данных")
+    parser.add_argument("--profiles", type=int, default=0, help="Число профилей в снапшоте")
+    parser.add_argument("--output", help="Файл для JSON с результатами")
+    args = parser.parse_args()
+
+    results = run(args.quick, args.profiles)
+    for result in results:
+        print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# blockchain_roulette/backend/benchmarks/bench_startup.py
+# Холодный старт воркера: время импорта по модулям, старт lifespan и фоновая загрузка контракта
+#
+# Запуск из папки backend:
+#   python benchmarks/bench_startup.py [--quick] [--top 15]
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List
+
+from common import BACKEND_DIR, CONTRACT_ADDRESS, PLACE_BET_ABI
+
+# Модули, которые не должны импортироваться вместе с приложением
+DEFERRED_MODULES = ("scipy", "web3", "eth_abi", "eth_account")
+
+# Выполняется в отдельном процессе: каждый запуск - действительно холодный
+CHILD = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import main_v2
+imported = time.perf_counter()
+deferred = [name for name in %(deferred)r if name in sys.modules]
+
+async def boot():
+    async with main_v2.lifespan(main_v2.app):
+        ready = time.perf_counter()
+        contract_loaded = None
+        if main_v2.contract_abi is not None:
+            while main_v2.contract is None and time.perf_counter() - ready < 30:
+                await asyncio.sleep(0.005)
+            contract_loaded = time.perf_counter()
+        return ready, contract_loaded
+
+ready, contract_loaded = asyncio.run(boot())
+print(json.dumps({
+    "import_seconds": imported - started,
+    "startup_seconds": ready - started,
+    "contract_seconds": contract_loaded - ready if contract_loaded else None,
+    "deferred_imported": deferred
+}))
+"""
+
+
+def _env(directory: str, with_contract: bool) -> Dict[str, str]:
+    env = dict(os.environ, PERSISTENCE_DIR=os.path.join(directory, "data"), SPIN_LOG_PATH="",
+               # Недоступная нода: старт не должен её ждать
+               WEB3_PROVIDER_URI="http://127.0.0.1:9", CONTRACT_ADDRESS="")
+    if with_contract:
+        abi_path = os.path.join(directory, "abi.json")
+        with open(abi_path, "w") as f:
+            json.dump({"abi": PLACE_BET_ABI}, f)
+        env.update(CONTRACT_ADDRESS=CONTRACT_ADDRESS, CONTRACT_ABI_PATH=abi_path)
+    return env
+
+
+def import_report(top: int) -> Dict:
+    """Разбор python -X importtime: время прямых импортов main_v2 по убыванию"""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main_v2"],
+        cwd=BACKEND_DIR, env=_env(tempfile.gettempdir(), False), capture_output=True, text=True, check=True
+    ).stderr
+    modules = []
+    total = None
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        if name.strip() == "main_v2":
+            total = int(cumulative) / 1e6
+        elif depth == 1:
+            modules.append((name.strip(), int(cumulative) / 1e6))
+    modules.sort(key=lambda item: -item[1])
+    return {
+        "name": "startup_import_report",
+        "total_seconds": total,
+        "modules_ms": {name: round(seconds * 1000, 1) for name, seconds in modules[:top]},
+    }
+
+
+def cold_start(runs: int, with_contract: bool) -> Dict:
+    samples = []
+    for _ in range(runs):
+        directory = tempfile.mkdtemp(prefix="zk_startup_")
+        try:
+            output = subprocess.run(
+                [sys.executable, "-c", CHILD % {"deferred": DEFERRED_MODULES}],
+                cwd=BACKEND_DIR, env=_env(directory, with_contract), capture_output=True, text=True, check=True
+            ).stdout
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    startup = statistics.median(sample["startup_seconds"] for sample in samples)
+    result = {
+        "name": "cold_start_with_contract" if with_contract else "cold_start",
+        "runs": runs,
+        "import_seconds": statistics.median(sample["import_seconds"] for sample in samples),
+        "startup_seconds": startup,
+        "us_per_op": startup * 1e6,
+        "deferred_imported": samples[-1]["deferred_imported"],
+    }
+    if with_contract:
+        result["contract_load_seconds"] = statistics.median(sample["contract_seconds"] for sample in samples)
+    return result
+
+
+def run(quick: bool = False, top: int = 15) -> List[Dict]:
+    runs = 1 if quick else 5
+    return [
+        import_report(top),
+        cold_start(runs, with_contract=False),
+        cold_start(runs, with_contract=True),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк холодного старта воркера")
+    parser.add_argument("--quick", action="store_true", help="Один запуск вместо пяти")
+    parser.add_argument("--top", type=int, default=15, help="Сколько самых тяжёлых импортов показать")
+    parser.add_argument("--output", help="Файл для JSON с результатами")
+    args = parser.parse_args()
+
+    results = run(args.quick, args.top)
+    for result in results:
+        print(json.dumps(result, ensure_ascii=False))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
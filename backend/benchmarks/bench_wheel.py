@@ -0,0 +1,131 @@
+# blockchain_roulette/backend/benchmarks/bench_wheel.py
+# Пропускная способность детектора смещения колеса, проигрывание журнала и задержка детекции
+#
+# Запуск из папки backend:
+#   python benchmarks/bench_wheel.py [--quick]
+
+import argparse
+import json
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from common import measure
+
+from bayesian_analyzer import BayesianAnalyzer
+from wheel_monitor import WheelMonitor
+
+START = 1.7e9
+
+
+def _spins(size: int, seed: int = 0, biased: int = -1, bias: float = 1.0):
+    rng = np.random.default_rng(seed)
+    p = np.ones(37)
+    if biased >= 0:
+        p[biased] = bias
+    numbers = rng.choice(37, size, p=p / p.sum())
+    # 100 вращений в секунду
+    timestamps = START + np.arange(size) * 0.01
+    return numbers, timestamps
+
+
+def bench_ingest(size: int) -> List[Dict]:
+    numbers, timestamps = _spins(size)
+    number_list, timestamp_list = numbers.tolist(), timestamps.tolist()
+
+    def live():
+        WheelMonitor(BayesianAnalyzer()).ingest_many(number_list, timestamp_list)
+
+    def replay():
+        WheelMonitor(BayesianAnalyzer()).replay(numbers, timestamps)
+
+    results = []
+    for name, fn in (("wheel_ingest", live), ("wheel_replay", replay)):
+        timing = measure(fn, 1, repeat=3)
+        results.append({
+            "name": name,
+            "size": size,
+            "us_per_op": timing["us_per_op"] / size,
+            "spins_per_sec": size / (timing["us_per_op"] / 1e6),
+        })
+    return results
+
+
+def check_replay(size: int) -> Dict:
+    """Проигрывание журнала должно давать то же состояние, что и живой приём"""
+    numbers, timestamps = _spins(size, seed=1, biased=7, bias=1.3)
+    live = WheelMonitor(BayesianAnalyzer())
+    live.ingest_many(numbers.tolist(), timestamps.tolist())
+    replayed = WheelMonitor(BayesianAnalyzer())
+    replayed.replay(numbers, timestamps)
+    return {
+        "name": "wheel_replay_matches_live",
+        "size": size,
+        "ok": bool(
+            np.allclose(live.cusum_values(), replayed.cusum_values())
+            and (live.window_counts() == replayed.window_counts()).all()
+            and (live.analyzer.alpha_params == replayed.analyzer.alpha_params).all()
+            and live.alarms["cusum"] == replayed.alarms["cusum"]
+        ),
+    }
+
+
+def detection_delay(bias: float, trials: int) -> Dict:
+    """Сколько вращений нужно CUSUM, чтобы заметить число с вероятностью bias/37"""
+    delays = []
+    for trial in range(trials):
+        numbers, timestamps = _spins(100_000, seed=100 + trial, biased=7, bias=bias)
+        monitor = WheelMonitor(BayesianAnalyzer())
+        for index, (number, timestamp) in enumerate(zip(numbers.tolist(), timestamps.tolist())):
+            if monitor.ingest(number, timestamp) is not None:
+                delays.append(index + 1)
+                break
+    return {
+        "name": f"wheel_detection_delay_x{bias}",
+        "trials": trials,
+        "detected": len(delays),
+        "median_spins": float(np.median(delays)) if delays else None,
+    }
+
+
+def false_alarms(size: int) -> Dict:
+    numbers, timestamps = _spins(size, seed=2)
+    monitor = WheelMonitor(BayesianAnalyzer())
+    started = time.perf_counter()
+    replayed = monitor.replay(numbers, timestamps)
+    return {
+        "name": "wheel_false_alarms_fair",
+        "size": size,
+        "cusum_alarms": replayed["cusum_alarms"],
+        "replay_seconds": time.perf_counter() - started,
+    }
+
+
+def run(quick: bool = False) -> List[Dict]:
+    size = 200_000 if quick else 1_000_000
+    results = bench_ingest(size)
+    results.append(check_replay(size))
+    results.append(false_alarms(size * 5))
+    for bias in (2.0, 1.5):
+        results.append(detection_delay(bias, 3 if quick else 10))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк детектора смещения колеса")
+    parser.add_argument("--quick", action="store_true", help="Уменьшенные объёмы данных")
+    parser.add_argument("--output", help="Файл для JSON с результатами")
+    args = parser.parse_args()
+
+    results = run(args.quick)
+    for result in results:
+        print(json.dumps(result, ensure_ascii=False))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# blockchain_roulette/backend/benchmarks/bench_wire.py
+# Размер и скорость кодирования ответа на ставку: JSON против бинарного формата
+#
+# Запуск из папки backend:
+#   python benchmarks/bench_wire.py [--quick]
+
+import argparse
+import json
+from typing import Dict, List
+
+from common import CONTRACT_ADDRESS, PLACE_BET_ABI, measure
+
+from chain_client import ContractABI, to_wei
+from wire_format import encode_bet_record, iter_records
+from zk_system import ZKSystem
+
+import main_v2
+
+PLAYER = "0x1234567890123456789012345678901234567890"
+SESSION_ID = "f" * 64
+
+
+def _bets(epoch_size: int, count: int):
+    """count ставок с доказательствами из эпохи epoch_size commitment'ов"""
+    zk = ZKSystem(epoch_duration=10**9)
+    commitments = zk.generate_player_commitments_batch([(PLAYER, i % 37) for i in range(epoch_size)])
+    proofs = zk.generate_zk_proofs_batch([(PLAYER, c[1], c[2]) for c in commitments[:count]])
+    contract = ContractABI(CONTRACT_ADDRESS, abi=PLACE_BET_ABI).load()
+    transactions = [{
+        "from": PLAYER,
+        "to": contract.address,
+        "value": to_wei(0.01),
+        "gas": 300000,
+        "gasPrice": 20_000_000_000,
+        "nonce": i,
+        "chainId": 1,
+        "data": contract.encode_call_bytes("placeBet", [7, p.commitment, p.merkle_proof, p.merkle_root]),
+    } for i, p in enumerate(proofs)]
+    return proofs, transactions
+
+
+def bench_wire(epoch_size: int, count: int) -> List[Dict]:
+    count = min(count, epoch_size)
+    proofs, transactions = _bets(epoch_size, count)
+
+    def encode_json() -> bytes:
+        return b"".join(
+            (json.dumps({"index": i, "status": 200, "result": main_v2.ZKProofResponse(
+                zk_proof=main_v2.zk_proof_to_dict(proof),
+                transaction_data=main_v2.transaction_to_dict(txn),
+                session_id=SESSION_ID
+            ).model_dump()}) + "\n").encode()
+            for i, (proof, txn) in enumerate(zip(proofs, transactions))
+        )
+
+    def encode_binary() -> bytes:
+        return b"".join(
+            encode_bet_record(i, proof, txn, SESSION_ID)
+            for i, (proof, txn) in enumerate(zip(proofs, transactions))
+        )
+
+    json_payload = encode_json()
+    binary_payload = encode_binary()
+
+    def decode_json():
+        # Клиент переводит дайджесты обратно в байты, как делал prepare_bet
+        for line in json_payload.splitlines():
+            proof = json.loads(line)["result"]["zk_proof"]
+            [bytes.fromhex(node) for node in proof["merkle_proof"]]
+            bytes.fromhex(proof["commitment"])
+            bytes.fromhex(proof["merkle_root"])
+
+    def decode_binary():
+        for record in iter_records(binary_payload):
+            record.proof.merkle_proof
+
+    def per_bet(timing: Dict[str, float]) -> Dict[str, float]:
+        return {"us_per_op": timing["us_per_op"] / count, "best_us_per_op": timing["best_us_per_op"] / count}
+
+    return [
+        {"name": "wire_json_encode", "size": epoch_size, "bytes_per_bet": len(json_payload) / count,
+         **per_bet(measure(encode_json, 1, repeat=5))},
+        {"name": "wire_binary_encode", "size": epoch_size, "bytes_per_bet": len(binary_payload) / count,
+         **per_bet(measure(encode_binary, 1, repeat=5))},
+        {"name": "wire_json_decode", "size": epoch_size, **per_bet(measure(decode_json, 1, repeat=5))},
+        {"name": "wire_binary_decode", "size": epoch_size, **per_bet(measure(decode_binary, 1, repeat=5))},
+    ]
+
+
+def run(quick: bool = False) -> List[Dict]:
+    results = []
+    for epoch_size in [100, 10_000] if quick else [100, 10_000, 200_000]:
+        results += bench_wire(epoch_size, 1000)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк формата ответа на ставку")
+    parser.add_argument("--quick", action="store_true", help="Только малые эпохи")
+    parser.add_argument("--output", help="Файл для JSON с результатами")
+    args = parser.parse_args()
+
+    results = run(args.quick)
+    for result in results:
+        print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# blockchain_roulette/backend/benchmarks/bench_workers.py
+# Масштабирование пропускной способности API по числу воркеров uvicorn
+#
+# Запуск из папки backend:
+#   python benchmarks/bench_workers.py --workers 1 2 4 --duration 10
+
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_server(workers: int, port: int, db_path: str, max_bets: int) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        STATE_BACKEND="sqlite",
+        STATE_DB_PATH=db_path,
+        MAX_BETS_PER_HOUR=str(max_bets),
+        WEB3_PROVIDER_URI="http://127.0.0.1:9",
+    )
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main_v2:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning",
+        ],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+
+
+async def wait_ready(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not start")
+
+
+def bet(address: str) -> dict:
+    return {"number": 7, "amount": 0.01, "player_address": address}
+
+
+async def run_load(base_url: str, duration: float, concurrency: int, wallets: int) -> dict:
+    addresses = ["0x" + secrets.token_hex(20) for _ in range(wallets)]
+    counts = {"ok": 0, "limited": 0, "error": 0}
+    stop_at = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        async def worker(offset: int):
+            i = offset
+            while time.monotonic() < stop_at:
+                response = await client.post("/bet/prepare", json=bet(addresses[i % wallets]))
+                if response.status_code == 200:
+                    counts["ok"] += 1
+                elif response.status_code == 429:
+                    counts["limited"] += 1
+                else:
+                    counts["error"] += 1
+                i += concurrency
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.monotonic() - started
+
+    total = sum(counts.values())
+    return {**counts, "requests": total, "rps": total / elapsed}
+
+
+async def check_shared_limit(base_url: str, max_bets: int) -> dict:
+    """Один кошелёк шлёт больше лимита через все воркеры: принято должно быть ровно max_bets"""
+    address = "0x" + secrets.token_hex(20)
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as client:
+        responses = await asyncio.gather(
+            *(client.post("/bet/prepare", json=bet(address)) for _ in range(max_bets * 2))
+        )
+    accepted = sum(r.status_code == 200 for r in responses)
+    return {"expected": max_bets, "accepted": accepted, "correct": accepted == max_bets}
+
+
+async def bench(workers: int, args) -> dict:
+    port = args.port
+    base_url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as tmp:
+        server = start_server(workers, port, os.path.join(tmp, "state.db"), args.max_bets)
+        try:
+            await wait_ready(base_url)
+            load = await run_load(base_url, args.duration, args.concurrency, args.wallets)
+            limit = await check_shared_limit(base_url, args.max_bets)
+        finally:
+            server.terminate()
+            server.wait()
+    return {"workers": workers, **load, "shared_rate_limit": limit}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Масштабирование API по числу воркеров")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--wallets", type=int, default=100_000)
+    parser.add_argument("--max-bets", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", help="Файл для JSON с результатами")
+    args = parser.parse_args()
+
+    results = []
+    for workers in args.workers:
+        result = await bench(workers, args)
+        print(
+            f"workers={workers}: {result['rps']:.0f} req/s, "
+            f"errors={result['error']}, shared limit ok={result['shared_rate_limit']['correct']}"
+        )
+        results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,66 @@
+# blockchain_roulette/backend/benchmarks/common.py
+# Общие помощники бенчмарков
+
+import os
+import sys
+import time
+from typing import Dict, Sequence
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Модули бэкенда импортируются как верхнеуровневые (from zk_system import ...)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# ABI функции ставки контракта ZKRouletteV2
+PLACE_BET_ABI = [{
+    "type": "function",
+    "name": "placeBet",
+    "stateMutability": "payable",
+    "inputs": [
+        {"name": "number", "type": "uint8"},
+        {"name": "commitment", "type": "bytes32"},
+        {"name": "merkleProof", "type": "bytes32[]"},
+        {"name": "merkleRoot", "type": "bytes32"},
+    ],
+    "outputs": [],
+}]
+
+CONTRACT_ADDRESS = "0x" + "5" * 40
+
+
+def percentiles(samples: Sequence[float]) -> Dict[str, float]:
+    """p50/p95/p99 и среднее в миллисекундах"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+    }
+
+
+def measure(fn, number: int, repeat: int = 5) -> Dict[str, float]:
+    """
+    Вызывает fn number раз в каждом из repeat повторов.
+    Возвращает лучшее и медианное время на операцию в микросекундах.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - started) / number)
+    timings.sort()
+    return {
+        "us_per_op": timings[len(timings) // 2] * 1e6,
+        "best_us_per_op": timings[0] * 1e6,
+        "ops_per_sec": 1.0 / timings[len(timings) // 2],
+    }
@@ -0,0 +1,127 @@
+# blockchain_roulette/backend/benchmarks/rpc_stub.py
+# Локальная замена JSON-RPC ноды (ASGI-приложение) для бенчмарков
+
+import asyncio
+import bisect
+import hashlib
+import json
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class RPCStub:
+    """
+    Минимальная нода: отвечает на eth_* методы, нужные бэкенду,
+    поддерживает пакетные запросы и искусственную задержку ответа.
+    Счётчики calls/http_requests позволяют проверить число обращений.
+
+    Логи для eth_getLogs берутся из списка logs (по возрастанию блока) или
+    из log_source(from_block, to_block) - генератора, чтобы длинная история
+    не лежала в памяти. Как у публичных провайдеров, диапазон блоков
+    (max_block_range) и число логов в ответе (max_logs) ограничены.
+    reorg(depth) меняет хеши последних depth блоков.
+    """
+
+    def __init__(self, latency: float = 0.0, chain_id: int = 1337, gas_price: int = 20 * 10**9):
+        self.latency = latency
+        self.chain_id = chain_id
+        self.gas_price = gas_price
+        self.block_number = 1
+        self.nonces: Dict[str, int] = {}
+        self.calls: Counter = Counter()
+        self.http_requests = 0
+        self.logs: List[Dict[str, Any]] = []
+        self.log_source: Optional[Callable[[int, int], List[Dict[str, Any]]]] = None
+        self.max_block_range: Optional[int] = None
+        self.max_logs = 10_000
+        # (первый блок ветки, номер ветки): после reorg блоки получают новые хеши
+        self._forks: List[Tuple[int, int]] = [(0, 0)]
+
+    def block_hash(self, number: int) -> str:
+        fork = self._forks[bisect.bisect_right(self._forks, (number, float("inf"))) - 1][1]
+        return "0x" + hashlib.sha256(f"{fork}:{number}".encode()).hexdigest()
+
+    def reorg(self, depth: int):
+        """Заменяет последние depth блоков другой веткой"""
+        self._forks.append((self.block_number - depth + 1, len(self._forks)))
+
+    def _logs(self, from_block: int, to_block: int) -> List[Dict[str, Any]]:
+        if self.log_source is not None:
+            return self.log_source(from_block, to_block)
+        blocks = [int(log["blockNumber"], 16) for log in self.logs]
+        return self.logs[bisect.bisect_left(blocks, from_block):bisect.bisect_right(blocks, to_block)]
+
+    def get_logs(self, log_filter: Dict[str, Any]) -> List[Dict[str, Any]]:
+        from_block = int(log_filter.get("fromBlock", "0x0"), 16)
+        to_block = int(log_filter.get("toBlock", hex(self.block_number)), 16)
+        if self.max_block_range is not None and to_block - from_block + 1 > self.max_block_range:
+            raise ValueError(f"block range is too large, max {self.max_block_range}")
+        address = log_filter.get("address")
+        topics = (log_filter.get("topics") or [None])[0]
+        if isinstance(topics, str):
+            topics = [topics]
+        logs = [
+            dict(log, blockHash=self.block_hash(int(log["blockNumber"], 16)))
+            for log in self._logs(from_block, min(to_block, self.block_number))
+            if (address is None or log["address"].lower() == address.lower())
+            and (topics is None or log["topics"][0] in topics)
+        ]
+        if len(logs) > self.max_logs:
+            raise ValueError(f"query returned more than {self.max_logs} results")
+        return logs
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        method = request.get("method")
+        params = request.get("params") or []
+        self.calls[method] += 1
+
+        if method == "eth_chainId":
+            result = hex(self.chain_id)
+        elif method == "eth_gasPrice":
+            result = hex(self.gas_price)
+        elif method == "eth_blockNumber":
+            result = hex(self.block_number)
+        elif method == "eth_getTransactionCount":
+            result = hex(self.nonces.get(params[0].lower(), 0))
+        elif method == "eth_getBlockByNumber":
+            number = int(params[0], 16)
+            result = {"number": params[0], "hash": self.block_hash(number)} if number <= self.block_number else None
+        elif method == "eth_getLogs":
+            try:
+                result = self.get_logs(params[0])
+            except ValueError as e:
+                return {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": -32005, "message": str(e)}}
+        else:
+            return {"jsonrpc": "2.0", "id": request.get("id"),
+                    "error": {"code": -32601, "message": f"Method not found: {method}"}}
+
+        return {"jsonrpc": "2.0", "id": request.get("id"), "result": result}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+
+        self.http_requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        payload = json.loads(body)
+        if isinstance(payload, list):
+            reply = [self.handle(request) for request in payload]
+        else:
+            reply = self.handle(payload)
+
+        data = json.dumps(reply).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json")],
+        })
+        await send({"type": "http.response.body", "body": data})
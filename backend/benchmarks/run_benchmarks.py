@@ -0,0 +1,136 @@
+# blockchain_roulette/backend/benchmarks/run_benchmarks.py
+# Запуск набора бенчмарков, сохранение результатов и сравнение с baseline
+#
+# Запуск из папки backend:
+#   python benchmarks/run_benchmarks.py                    # сравнить с baseline.json
+#   python benchmarks/run_benchmarks.py --update-baseline  # записать новый baseline
+#   python benchmarks/run_benchmarks.py --suite core --quick
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from typing import Dict, List
+
+from common import BACKEND_DIR
+
+BENCH_DIR = os.path.join(BACKEND_DIR, "benchmarks")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results", "latest.json")
+
+# Метрика -> True, если большее значение лучше
+METRICS = {
+    "us_per_op": False,
+    "rps": True,
+    "p99_ms": False,
+    "bytes_per_record": False,
+}
+
+
+def load_suites() -> Dict[str, object]:
+    import bench_admission
+    import bench_core
+    import bench_events
+    import bench_indexer
+    import bench_live
+    import bench_load
+    import bench_memory
+    import bench_persistence
+    import bench_startup
+    import bench_wheel
+    import bench_wire
+    return {
+        "core": bench_core, "load": bench_load, "wheel": bench_wheel,
+        "persistence": bench_persistence, "startup": bench_startup, "wire": bench_wire,
+        "memory": bench_memory, "indexer": bench_indexer, "live": bench_live,
+        "events": bench_events, "admission": bench_admission
+    }
+
+
+def result_key(suite: str, result: Dict) -> str:
+    size = result.get("size")
+    return f"{suite}.{result['name']}" + (f"[{size}]" if size is not None else "")
+
+
+def run_suites(names: List[str], quick: bool) -> Dict:
+    suites = load_suites()
+    results = {}
+    for name in names:
+        print(f"== {name}")
+        for result in suites[name].run(quick):
+            results[result_key(name, result)] = result
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "quick": quick,
+        "results": results,
+    }
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Возвращает список регрессий хуже baseline больше чем на tolerance"""
+    regressions = []
+    for key, result in current["results"].items():
+        reference = baseline["results"].get(key)
+        if reference is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            if metric not in result or metric not in reference or not reference[metric]:
+                continue
+            change = result[metric] / reference[metric] - 1.0
+            worse = -change if higher_is_better else change
+            marker = ""
+            if worse > tolerance:
+                marker = "  <-- REGRESSION"
+                regressions.append(f"{key} {metric}: {reference[metric]:.2f} -> {result[metric]:.2f}")
+            print(f"{key:<55} {metric:<10} {reference[metric]:>12.2f} -> {result[metric]:>12.2f} "
+                  f"({change:+.1%}){marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки ZK-Roulette с контролем регрессий")
+    parser.add_argument("--suite", nargs="+",
+                        choices=["core", "load", "wheel", "persistence", "startup", "wire", "memory", "indexer", "live", "events", "admission"],
+                        default=["core", "load", "wheel", "persistence", "startup", "wire", "memory", "indexer", "live", "events", "admission"])
+    parser.add_argument("--quick", action="store_true", help="Уменьшенные объёмы данных")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Допустимое ухудшение относительно baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    current = run_suites(args.suite, args.quick)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(current, f, indent=2)
+    print(f"Результаты сохранены в {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline обновлён: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("Baseline не найден, запустите с --update-baseline")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(current, baseline, args.tolerance)
+    if regressions:
+        print(f"Регрессии ({len(regressions)}):")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("Регрессий нет")
+
+
+if __name__ == "__main__":
+    main()
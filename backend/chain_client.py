@@ -0,0 +1,443 @@
+# blockchain_roulette/backend/chain_client.py
+# Неблокирующий доступ к блокчейн-ноде через JSON-RPC
+
+import asyncio
+import itertools
+import json
+import logging
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class ChainError(Exception):
+    """Нода недоступна, не ответила вовремя или вернула ошибку"""
+
+
+class AsyncChainClient:
+    """
+    Асинхронный JSON-RPC клиент с пулом keep-alive соединений.
+
+    Число одновременных запросов к ноде ограничено семафором, ожидание
+    слота и сам запрос ограничены таймаутами, поэтому медленная нода
+    задерживает только обращающиеся к ней запросы, а не весь event loop.
+
+    call_batched копит вызовы в течение batch_window и отправляет их
+    одним пакетным JSON-RPC запросом.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        max_connections: int = 20,
+        max_concurrency: int = 32,
+        timeout: float = 5.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        batch_window: float = 0.002,
+        max_batch_size: int = 100
+    ):
+        self.url = url
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self._transport = transport
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._ids = itertools.count(1)
+        self._chain_id: Optional[int] = None
+        self._pending: List[Tuple[str, list, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                timeout=httpx.Timeout(self.timeout),
+                transport=self._transport
+            )
+        return self._client
+
+    async def _post(self, payload: Any) -> Any:
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise ChainError("RPC concurrency limit wait timed out")
+
+        try:
+            response = await self._get_client().post(self.url, json=payload)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            raise ChainError(f"RPC transport error: {e}") from e
+        except (ValueError, KeyError) as e:
+            # Ответ не JSON (HTML-страница прокси, обрезанное тело)
+            raise ChainError(f"RPC reply is not valid JSON: {e}") from e
+        finally:
+            self._semaphore.release()
+
+    @staticmethod
+    def _result(reply: Dict[str, Any]) -> Any:
+        if not isinstance(reply, dict):
+            raise ChainError(f"Unexpected RPC reply: {reply}")
+        if "error" in reply:
+            raise ChainError(f"RPC error: {reply['error']}")
+        return reply.get("result")
+
+    async def call(self, method: str, params: Optional[list] = None) -> Any:
+        """Одиночный JSON-RPC вызов"""
+        reply = await self._post({
+            "jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params or []
+        })
+        return self._result(reply)
+
+    async def _batch_replies(self, calls: Sequence[Tuple[str, list]]) -> List[Dict[str, Any]]:
+        ids = [next(self._ids) for _ in calls]
+        replies = await self._post([
+            {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+            for request_id, (method, params) in zip(ids, calls)
+        ])
+        if not isinstance(replies, list):
+            raise ChainError(f"Unexpected batch reply: {replies}")
+        by_id = {reply.get("id"): reply for reply in replies if isinstance(reply, dict)}
+        return [by_id.get(request_id, {"error": "missing reply"}) for request_id in ids]
+
+    async def batch(self, calls: Sequence[Tuple[str, list]]) -> List[Any]:
+        """Пакет вызовов одним HTTP-запросом; результаты в порядке вызовов"""
+        if not calls:
+            return []
+        return [self._result(reply) for reply in await self._batch_replies(calls)]
+
+    async def call_batched(self, method: str, params: Optional[list] = None) -> Any:
+        """Вызов, объединяемый с соседними по времени в один пакетный запрос"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((method, params or [], future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        if pending:
+            asyncio.ensure_future(self._send_pending(pending))
+
+    async def _send_pending(self, pending: List[Tuple[str, list, asyncio.Future]]):
+        try:
+            replies = await self._batch_replies([(method, params) for method, params, _ in pending])
+        except Exception as e:
+            for _, _, future in pending:
+                if not future.done():
+                    future.set_exception(e if isinstance(e, ChainError) else ChainError(str(e)))
+            return
+
+        for (_, _, future), reply in zip(pending, replies):
+            if future.done():
+                continue
+            try:
+                future.set_result(self._result(reply))
+            except ChainError as e:
+                future.set_exception(e)
+
+    async def get_transaction_count(self, address: str, block: str = "pending") -> int:
+        return int(await self.call_batched("eth_getTransactionCount", [address, block]), 16)
+
+    async def gas_price(self) -> int:
+        return int(await self.call_batched("eth_gasPrice"), 16)
+
+    async def block_number(self) -> int:
+        return int(await self.call("eth_blockNumber"), 16)
+
+    async def get_logs(self, from_block: int, to_block: int, address: Optional[str] = None,
+                       topics: Optional[list] = None) -> List[Dict[str, Any]]:
+        """eth_getLogs по диапазону блоков [from_block, to_block] включительно"""
+        log_filter: Dict[str, Any] = {"fromBlock": hex(from_block), "toBlock": hex(to_block)}
+        if address is not None:
+            log_filter["address"] = address
+        if topics is not None:
+            log_filter["topics"] = topics
+        return await self.call("eth_getLogs", [log_filter])
+
+    async def block_hash(self, number: int) -> Optional[str]:
+        """Хеш канонического блока с номером number (None, если блока ещё нет)"""
+        block = await self.call("eth_getBlockByNumber", [hex(number), False])
+        return block["hash"] if block else None
+
+    async def chain_id(self) -> int:
+        """ID сети не меняется, поэтому запрашивается один раз"""
+        if self._chain_id is None:
+            self._chain_id = int(await self.call_batched("eth_chainId"), 16)
+        return self._chain_id
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class NonceManager:
+    """
+    Локальный учёт nonce: nonce адреса запрашивается у ноды один раз,
+    дальше выдаётся из локального счётчика. Запись живёт resync_after
+    секунд (неотправленные транзакции не оставят дыр надолго), после
+    ошибки адрес сбрасывается через resync. Одновременные холодные
+    запросы одного адреса разделяют один RPC.
+    """
+
+    def __init__(self, client: AsyncChainClient, resync_after: float = 60.0, max_addresses: int = 100_000):
+        self.client = client
+        self.resync_after = resync_after
+        self.max_addresses = max_addresses
+        # address -> [следующий nonce, время синхронизации]
+        self._nonces: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._nonces)
+
+    async def _fetch(self, key: str, address: str):
+        nonce = await self.client.get_transaction_count(address)
+        self._nonces[key] = [nonce, time.monotonic()]
+        while len(self._nonces) > self.max_addresses:
+            self._nonces.popitem(last=False)
+
+    async def _sync(self, key: str, address: str):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key, address))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        await task
+
+    async def next_nonce(self, address: str) -> int:
+        """Выдаёт следующий nonce адреса и резервирует его"""
+        key = address.lower()
+        entry = self._nonces.get(key)
+        if entry is None or time.monotonic() - entry[1] > self.resync_after:
+            await self._sync(key, address)
+            entry = self._nonces[key]
+
+        self._nonces.move_to_end(key)
+        nonce = int(entry[0])
+        entry[0] += 1
+        return nonce
+
+    def resync(self, address: str):
+        """Забывает локальный nonce: следующий запрос пойдёт в ноду"""
+        self._nonces.pop(address.lower(), None)
+
+
+class GasPriceOracle:
+    """
+    Цена газа с коротким TTL. Фоновая задача обновляет значение заранее,
+    поэтому запросы читают кеш; запрос к ноде делается только если
+    значения ещё нет или оно устарело дольше max_stale.
+    """
+
+    def __init__(self, client: AsyncChainClient, ttl: float = 3.0, max_stale: float = 30.0):
+        self.client = client
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._price: Optional[int] = None
+        self._updated_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self) -> int:
+        self._price = await self.client.gas_price()
+        self._updated_at = time.monotonic()
+        return self._price
+
+    async def get(self) -> int:
+        if self._price is None or time.monotonic() - self._updated_at > self.max_stale:
+            return await self.refresh()
+        return self._price
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Gas price refresh error: {e}")
+            await asyncio.sleep(self.ttl)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class ChainHealth:
+    """
+    Состояние ноды, обновляемое в фоне. Health-check читает готовый
+    результат и не делает RPC на каждый запрос.
+    """
+
+    def __init__(self, client: AsyncChainClient, interval: float = 5.0):
+        self.client = client
+        self.interval = interval
+        self.status: Dict[str, Any] = {
+            "connected": False,
+            "block_number": None,
+            "latency_ms": None,
+            "checked_at": None,
+            "error": "not checked yet"
+        }
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def connected(self) -> bool:
+        return self.status["connected"]
+
+    async def refresh(self) -> Dict[str, Any]:
+        started = time.monotonic()
+        try:
+            block_number = await self.client.block_number()
+            self.status = {
+                "connected": True,
+                "block_number": block_number,
+                "latency_ms": round((time.monotonic() - started) * 1000, 2),
+                "checked_at": time.time(),
+                "error": None
+            }
+        except ChainError as e:
+            self.status = {
+                **self.status,
+                "connected": False,
+                "latency_ms": None,
+                "checked_at": time.time(),
+                "error": str(e)
+            }
+        return self.status
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Chain health refresh error: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def to_wei(amount_ether: float) -> int:
+    """Сумма в эфирах -> wei, с тем же десятичным округлением, что и Web3.to_wei"""
+    return int(Decimal(str(amount_ether)) * 10**18)
+
+
+def _canonical_type(param: Dict[str, Any]) -> str:
+    """Тип параметра ABI в виде для сигнатуры функции (кортежи раскрываются)"""
+    abi_type = param["type"]
+    if abi_type.startswith("tuple"):
+        inner = ",".join(_canonical_type(component) for component in param["components"])
+        return f"({inner}){abi_type[len('tuple'):]}"
+    return abi_type
+
+
+class ContractABI:
+    """
+    Локальное ABI-кодирование вызовов контракта без web3.
+
+    ABI читается из артефакта компиляции, а eth_abi импортируется при первом
+    обращении (или заранее через load() в фоне при старте), поэтому импорт
+    приложения не платит за них. Селекторы функций кешируются.
+    """
+
+    def __init__(self, address: str, abi_path: Optional[str] = None, abi: Optional[List[Dict[str, Any]]] = None):
+        self._raw_address = address
+        self.abi_path = abi_path
+        self._abi = abi
+        self.address: Optional[str] = None
+        self._functions: Dict[str, Tuple[bytes, List[str]]] = {}
+        self._encode = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._encode is not None
+
+    @property
+    def abi(self) -> List[Dict[str, Any]]:
+        if self._abi is None:
+            with open(self.abi_path) as f:
+                artifact = json.load(f)
+            self._abi = artifact["abi"] if isinstance(artifact, dict) else artifact
+        return self._abi
+
+    def load(self) -> "ContractABI":
+        """Читает ABI, импортирует кодировщик и считает селекторы"""
+        if self._encode is None:
+            from eth_abi import encode
+            from eth_utils import keccak, to_checksum_address
+
+            functions = {}
+            for entry in self.abi:
+                if entry.get("type") != "function":
+                    continue
+                types = [_canonical_type(param) for param in entry.get("inputs", [])]
+                signature = f"{entry['name']}({','.join(types)})"
+                functions[entry["name"]] = (keccak(text=signature)[:4], types)
+            self._functions = functions
+            self.address = to_checksum_address(self._raw_address)
+            self._encode = encode
+        return self
+
+    def event(self, name: str) -> Optional[Dict[str, Any]]:
+        """Описание события name из ABI или None"""
+        for entry in self.abi:
+            if entry.get("type") == "event" and entry.get("name") == name:
+                return entry
+        return None
+
+    def event_signature(self, name: str) -> Optional[str]:
+        """Сигнатура события для topic0, например "Transfer(address,address,uint256)", или None"""
+        entry = self.event(name)
+        if entry is None:
+            return None
+        return f"{name}({','.join(_canonical_type(param) for param in entry.get('inputs', []))})"
+
+    def encode_call_bytes(self, fn_name: str, args: Sequence[Any]) -> bytes:
+        """Данные транзакции вызова fn_name(args): селектор + ABI-кодированные аргументы"""
+        self.load()
+        try:
+            selector, types = self._functions[fn_name]
+        except KeyError:
+            raise ValueError(f"Функция {fn_name} отсутствует в ABI контракта")
+        return selector + self._encode(types, list(args))
+
+    def encode_call(self, fn_name: str, args: Sequence[Any]) -> str:
+        """То же в hex с префиксом 0x, как в web3"""
+        return "0x" + self.encode_call_bytes(fn_name, args).hex()
@@ -0,0 +1,410 @@
+# blockchain_roulette/backend/event_indexer.py
+# Индексатор событий контракта: догрузка истории и слежение за цепью через eth_getLogs
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from bayesian_analyzer import BayesianAnalyzer
+from chain_client import AsyncChainClient, ChainError, ContractABI
+
+logger = logging.getLogger(__name__)
+
+# События контракта ZKRouletteV2 (betId и player - индексированные параметры):
+#   BetPlaced(uint256 indexed betId, address indexed player, uint8 number, uint256 amount, bytes32 commitment)
+#   BetSettled(uint256 indexed betId, address indexed player, uint8 result, uint256 amount, uint256 payout)
+# Это предполагаемый интерфейс: сигнатуры берутся из ABI контракта, если события
+# в нём есть, или задаются конфигурацией, а эти значения - запасные.
+BET_PLACED_SIGNATURE = "BetPlaced(uint256,address,uint8,uint256,bytes32)"
+BET_SETTLED_SIGNATURE = "BetSettled(uint256,address,uint8,uint256,uint256)"
+# Раскладка BetSettled, которую разбирает _decode: (тип, indexed) параметров
+BET_SETTLED_LAYOUT = (
+    ("uint256", True), ("address", True), ("uint8", False), ("uint256", False), ("uint256", False)
+)
+
+WEI = 10**18
+
+# Фрагменты ошибок, которыми провайдеры отвечают на слишком тяжёлый eth_getLogs
+_RANGE_ERRORS = ("more than", "too many", "too large", "range", "limit", "exceed", "size", "timeout", "timed out")
+
+
+def event_topic(signature: str) -> str:
+    """topic0 события: keccak256 сигнатуры"""
+    from eth_utils import keccak
+    return "0x" + keccak(text=signature).hex()
+
+
+class _Batch:
+    """Расшифрованные события диапазона блоков, по колонкам"""
+
+    __slots__ = ("placed", "bet_ids", "blocks", "players", "results", "amounts", "payouts")
+
+    def __init__(self):
+        self.placed = 0
+        self.bet_ids: List[int] = []
+        self.blocks: List[int] = []
+        self.players: List[str] = []
+        self.results: List[int] = []
+        self.amounts: List[float] = []
+        self.payouts: List[float] = []
+
+    def extend(self, other: "_Batch") -> "_Batch":
+        self.placed += other.placed
+        for name in self.__slots__[1:]:
+            getattr(self, name).extend(getattr(other, name))
+        return self
+
+
+class EventIndexer:
+    """
+    Читает события BetPlaced/BetSettled контракта через eth_getLogs и
+    передаёт рассчитанные ставки в анализатор пакетами: профили игроков
+    (update_batch) и апостериорные распределения чисел (record_spins).
+
+    Диапазон от чекпоинта до головы цепи минус confirmations режется на
+    чанки, которые запрашиваются параллельно (до concurrency одновременно),
+    а применяются строго по порядку блоков: чекпоинт всегда означает
+    «всё до этого блока учтено». Размер чанка подстраивается под ноду:
+    ошибка «слишком много логов / слишком большой диапазон / таймаут»
+    делит диапазон пополам и уменьшает чанк, ответ с малым числом логов
+    удваивает его.
+
+    Реорганизации: в работу берутся только блоки с confirmations
+    подтверждениями. Перед каждым проходом хеш последнего учтённого блока
+    сверяется с нодой; если он изменился (реорганизация глубже confirmations),
+    чекпоинт откатывается к последнему совпавшему якорю (хеши концов
+    прошлых проходов за max_reorg_depth блоков) и ветка индексируется
+    заново. Ставки, учтённые в отброшенной ветке и попавшие в новую,
+    повторно не учитываются (по betId); ставки, исчезнувшие вместе
+    с веткой, из статистики не вычитаются.
+
+    Адреса игроков записываются в нижнем регистре, суммы - в эфирах.
+
+    Сигнатуры событий (topic0): явно заданные в event_signatures
+    ({"BetPlaced": ..., "BetSettled": ...}), иначе из ABI контракта (abi),
+    иначе предполагаемые BET_PLACED_SIGNATURE/BET_SETTLED_SIGNATURE.
+    BetSettled из ABI с другой раскладкой параметров - ошибка: такие логи
+    нельзя разобрать.
+    """
+
+    def __init__(
+        self,
+        client: AsyncChainClient,
+        analyzer: BayesianAnalyzer,
+        contract_address: str,
+        checkpoint_path: Optional[str] = None,
+        start_block: int = 0,
+        confirmations: int = 12,
+        chunk_size: int = 2000,
+        min_chunk_size: int = 1,
+        max_chunk_size: int = 100_000,
+        target_logs: int = 5000,
+        concurrency: int = 8,
+        poll_interval: float = 5.0,
+        max_retries: int = 5,
+        max_reorg_depth: int = 256,
+        record_spins: bool = True,
+        flush: Optional[Callable[[], Awaitable[Any]]] = None,
+        abi: Optional[ContractABI] = None,
+        event_signatures: Optional[Dict[str, str]] = None
+    ):
+        self.client = client
+        self.analyzer = analyzer
+        self.contract_address = contract_address
+        self.checkpoint_path = checkpoint_path
+        self.start_block = start_block
+        self.confirmations = confirmations
+        self.chunk_size = chunk_size
+        self.min_chunk_size = min_chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.target_logs = target_logs
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.max_retries = max_retries
+        self.max_reorg_depth = max_reorg_depth
+        self.record_spins = record_spins
+        # Сброс журнала анализатора перед записью чекпоинта: чекпоинт
+        # не должен обгонять то, что уже сохранено
+        self.flush = flush
+        self.abi = abi
+        self.event_signatures = dict(event_signatures or {})
+
+        # Последний учтённый блок и его хеш
+        self.block = start_block - 1
+        self.block_hash: Optional[str] = None
+        self._anchors: Deque[Tuple[int, str]] = deque()
+        # betId -> блок для ставок последних max_reorg_depth блоков
+        self._recent_bets: "OrderedDict[int, int]" = OrderedDict()
+        self._topics: Optional[List[str]] = None
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        self.head: Optional[int] = None
+        self.stats: Dict[str, Any] = {
+            "requests": 0, "splits": 0, "retries": 0, "reorgs": 0,
+            "logs": 0, "bets_placed": 0, "bets_settled": 0, "duplicate_bets": 0,
+            "last_pass_blocks": 0, "last_pass_seconds": 0.0
+        }
+
+    # =============== ЧЕКПОИНТ ===============
+
+    def load_checkpoint(self):
+        """Продолжает с сохранённого блока (если чекпоинт есть)"""
+        self._loaded = True
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path) as f:
+            checkpoint = json.load(f)
+        self.block = checkpoint["block"]
+        self.block_hash = checkpoint.get("block_hash")
+        self._anchors = deque((block, block_hash) for block, block_hash in checkpoint.get("anchors", []))
+        self.chunk_size = checkpoint.get("chunk_size", self.chunk_size)
+
+    async def _save_checkpoint(self):
+        if not self.checkpoint_path:
+            return
+        if self.flush is not None:
+            await self.flush()
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "block": self.block,
+                "block_hash": self.block_hash,
+                "anchors": list(self._anchors),
+                "chunk_size": self.chunk_size,
+                "saved_at": time.time()
+            }, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    # =============== ЧТЕНИЕ ЛОГОВ ===============
+
+    def _abi_signatures(self) -> Dict[str, str]:
+        """Сигнатуры событий из ABI контракта; пусто, если ABI недоступен"""
+        if self.abi is None:
+            return {}
+        try:
+            settled = self.abi.event("BetSettled")
+            placed = self.abi.event_signature("BetPlaced")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"ABI контракта недоступен ({e}), сигнатуры событий - из конфигурации или по умолчанию")
+            return {}
+
+        signatures = {}
+        if placed is not None:
+            signatures["BetPlaced"] = placed
+        if settled is not None:
+            layout = tuple((param["type"], bool(param.get("indexed"))) for param in settled.get("inputs", []))
+            if layout != BET_SETTLED_LAYOUT:
+                raise ValueError(f"BetSettled в ABI не совпадает с разбираемой раскладкой {BET_SETTLED_LAYOUT}: {layout}")
+            signatures["BetSettled"] = self.abi.event_signature("BetSettled")
+        return signatures
+
+    def signatures(self) -> Dict[str, str]:
+        """Сигнатуры BetPlaced и BetSettled, по которым фильтруются логи"""
+        signatures = {**self._abi_signatures(), **self.event_signatures}
+        for name, default in (("BetPlaced", BET_PLACED_SIGNATURE), ("BetSettled", BET_SETTLED_SIGNATURE)):
+            if name not in signatures:
+                logger.warning(f"Событие {name} не найдено в ABI и не задано: предполагается {default}")
+                signatures[name] = default
+        return signatures
+
+    @property
+    def topics(self) -> List[str]:
+        if self._topics is None:
+            signatures = self.signatures()
+            self._topics = [event_topic(signatures["BetPlaced"]), event_topic(signatures["BetSettled"])]
+        return self._topics
+
+    def _decode(self, logs: List[Dict[str, Any]]) -> _Batch:
+        batch = _Batch()
+        placed_topic, settled_topic = self.topics
+        for log in logs:
+            if log.get("removed"):
+                continue
+            topics = log["topics"]
+            if topics[0] == settled_topic:
+                data = bytes.fromhex(log["data"][2:])
+                batch.bet_ids.append(int(topics[1], 16))
+                batch.blocks.append(int(log["blockNumber"], 16))
+                batch.players.append("0x" + topics[2][-40:].lower())
+                batch.results.append(data[31])
+                batch.amounts.append(int.from_bytes(data[32:64], "big") / WEI)
+                batch.payouts.append(int.from_bytes(data[64:96], "big") / WEI)
+            elif topics[0] == placed_topic:
+                batch.placed += 1
+        return batch
+
+    async def _fetch(self, from_block: int, to_block: int) -> _Batch:
+        """События диапазона; тяжёлый для ноды диапазон делится пополам"""
+        span = to_block - from_block + 1
+        for attempt in range(self.max_retries + 1):
+            self.stats["requests"] += 1
+            try:
+                logs = await self.client.get_logs(from_block, to_block, self.contract_address, [self.topics])
+                break
+            except ChainError as e:
+                if span > 1 and any(fragment in str(e).lower() for fragment in _RANGE_ERRORS):
+                    self.stats["splits"] += 1
+                    self.chunk_size = max(self.min_chunk_size, min(self.chunk_size, span // 2))
+                    middle = from_block + span // 2 - 1
+                    left, right = await asyncio.gather(
+                        self._fetch(from_block, middle), self._fetch(middle + 1, to_block)
+                    )
+                    return left.extend(right)
+                if attempt == self.max_retries:
+                    raise
+                self.stats["retries"] += 1
+                await asyncio.sleep(min(10.0, 0.2 * 2 ** attempt))
+
+        # Подстройка чанка под плотность логов
+        if len(logs) > self.target_logs:
+            self.chunk_size = max(self.min_chunk_size, span * self.target_logs // len(logs))
+        elif len(logs) < self.target_logs // 2 and span >= self.chunk_size:
+            self.chunk_size = min(self.max_chunk_size, self.chunk_size * 2)
+        self.stats["logs"] += len(logs)
+        return self._decode(logs)
+
+    # =============== ПРИМЕНЕНИЕ ===============
+
+    def _apply(self, batch: _Batch, to_block: int, horizon: int):
+        """
+        Передаёт расчёты ставок в анализатор и сдвигает чекпоинт на to_block.
+        betId запоминаются только для блоков после horizon: более ранние
+        реорганизация уже не затронет
+        """
+        recent = self._recent_bets
+        keep = [i for i, bet_id in enumerate(batch.bet_ids) if bet_id not in recent]
+        self.stats["duplicate_bets"] += len(batch.bet_ids) - len(keep)
+        if keep:
+            players = [batch.players[i] for i in keep]
+            amounts = np.array([batch.amounts[i] for i in keep])
+            payouts = np.array([batch.payouts[i] for i in keep])
+            self.analyzer.player_profiles.update_batch(players, amounts, payouts > 0, payouts)
+            if self.record_spins:
+                self.analyzer.record_spins(np.bincount([batch.results[i] for i in keep], minlength=37))
+
+        for i in keep:
+            if batch.blocks[i] > horizon:
+                recent[batch.bet_ids[i]] = batch.blocks[i]
+        while recent and next(iter(recent.values())) <= to_block - self.max_reorg_depth:
+            recent.popitem(last=False)
+
+        self.stats["bets_placed"] += batch.placed
+        self.stats["bets_settled"] += len(keep)
+        self.block = to_block
+        self.block_hash = None
+
+    async def _index_range(self, from_block: int, to_block: int):
+        """Параллельная загрузка чанков [from_block, to_block] с применением по порядку"""
+        queue: Deque[Tuple[int, asyncio.Future]] = deque()
+        next_block = from_block
+        try:
+            while next_block <= to_block or queue:
+                while next_block <= to_block and len(queue) < self.concurrency:
+                    end = min(to_block, next_block + self.chunk_size - 1)
+                    queue.append((end, asyncio.ensure_future(self._fetch(next_block, end))))
+                    next_block = end + 1
+                end, task = queue.popleft()
+                self._apply(await task, end, to_block - self.max_reorg_depth)
+                await self._save_checkpoint()
+        finally:
+            for _, task in queue:
+                task.cancel()
+
+    # =============== РЕОРГАНИЗАЦИИ ===============
+
+    async def _check_reorg(self):
+        """Откат чекпоинта, если последний учтённый блок больше не канонический"""
+        if self.block_hash is None or await self.client.block_hash(self.block) == self.block_hash:
+            return
+        self.stats["reorgs"] += 1
+
+        ancestor: Optional[Tuple[int, str]] = None
+        for block, block_hash in reversed(self._anchors):
+            if block < self.block and await self.client.block_hash(block) == block_hash:
+                ancestor = (block, block_hash)
+                break
+        if ancestor is None:
+            block = max(self.start_block - 1, self.block - self.max_reorg_depth)
+            logger.error(f"Реорганизация глубже {self.max_reorg_depth} блоков у блока {self.block}, "
+                         f"переиндексация с {block + 1}")
+            ancestor = (block, await self.client.block_hash(block) if block >= self.start_block else None)
+        else:
+            logger.warning(f"Реорганизация: блок {self.block} заменён, откат к {ancestor[0]}")
+
+        while self._anchors and self._anchors[-1][0] > ancestor[0]:
+            self._anchors.pop()
+        self.block, self.block_hash = ancestor
+        await self._save_checkpoint()
+
+    def _anchor(self, block_hash: str):
+        self.block_hash = block_hash
+        self._anchors.append((self.block, block_hash))
+        while self._anchors and self._anchors[0][0] <= self.block - self.max_reorg_depth:
+            self._anchors.popleft()
+
+    # =============== ПРОХОДЫ ===============
+
+    async def sync(self, to_block: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Один проход: догружает события до to_block (по умолчанию - до головы
+        минус confirmations). При отставании на год это и есть backfill
+        """
+        async with self._lock:
+            if not self._loaded:
+                self.load_checkpoint()
+            self.head = await self.client.block_number()
+            target = self.head - self.confirmations
+            if to_block is not None:
+                target = min(target, to_block)
+
+            await self._check_reorg()
+            started = time.perf_counter()
+            first = self.block + 1
+            if target >= first:
+                await self._index_range(first, target)
+                self._anchor(await self.client.block_hash(self.block))
+                await self._save_checkpoint()
+            self.stats["last_pass_blocks"] = max(0, target - first + 1)
+            self.stats["last_pass_seconds"] = time.perf_counter() - started
+            if self.stats["last_pass_blocks"] > 10 * self.chunk_size:
+                logger.info(f"📜 Проиндексированы блоки {first}-{target}: {self.get_stats()}")
+            return self.get_stats()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"Event indexer error: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "block": self.block,
+            "head": self.head,
+            "lag_blocks": self.head - self.block if self.head is not None else None,
+            "chunk_size": self.chunk_size,
+            "running": self._task is not None
+        }
@@ -0,0 +1,231 @@
+# blockchain_roulette/backend/event_store.py
+# Хранилище подозрительных событий: упорядоченный по времени журнал, индекс по игрокам и агрегаты по интервалам
+
+import bisect
+import time
+from collections import Counter
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    # Хранилище создаётся самим анализатором: импорт только для аннотаций
+    from bayesian_analyzer import SuspiciousEvent
+
+# Сжимать журнал, когда вытесненная голова больше половины и не меньше этого числа записей
+_COMPACT_MIN = 1024
+
+
+class _PlayerEvents:
+    """События одного игрока по времени; head - начало ещё не вытесненной части"""
+    __slots__ = ("times", "events", "head")
+
+    def __init__(self):
+        self.times: List[float] = []
+        self.events: List["SuspiciousEvent"] = []
+        self.head = 0
+
+    def __len__(self) -> int:
+        return len(self.times) - self.head
+
+    def compact(self):
+        if self.head >= 32 and self.head * 2 >= len(self.times):
+            del self.times[:self.head]
+            del self.events[:self.head]
+            self.head = 0
+
+
+class SuspiciousEventStore:
+    """
+    Журнал событий, упорядоченный по времени: параллельные списки времён и
+    событий с головой head. Вытеснение старых событий - сдвиг головы,
+    список сжимается, когда голова занимает больше половины, так что
+    память ограничена max_events при любом темпе событий. События,
+    пришедшие с опозданием, вставляются на своё место (обычно рядом с концом).
+
+    Индекс по игрокам устроен так же и вытесняется вместе с журналом:
+    вытесняется всегда самое старое событие, а у его игрока оно тоже
+    самое старое. Запросы по интервалу времени и по игроку - бинарный
+    поиск плюс k найденных событий.
+
+    Агрегаты по интервалам bucket_seconds (число событий по типам) живут
+    дольше самих событий - bucket_retention - и отвечают на вопросы
+    "сколько событий было" за длинные периоды без хранения событий.
+    """
+
+    def __init__(self, max_events: int = 100_000, retention: float = 7 * 24 * 3600,
+                 bucket_seconds: float = 60.0, bucket_retention: float = 30 * 24 * 3600,
+                 clock=time.time):
+        self.max_events = max_events
+        self.retention = retention
+        self.bucket_seconds = bucket_seconds
+        self.bucket_retention = bucket_retention
+        self.clock = clock
+
+        self._times: List[float] = []
+        self._events: List["SuspiciousEvent"] = []
+        self._head = 0
+        self._players: Dict[str, _PlayerEvents] = {}
+
+        self._bucket_ids: List[int] = []
+        self._buckets: Dict[int, Counter] = {}
+        self._bucket_totals: Dict[int, int] = {}
+
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._times) - self._head
+
+    def __iter__(self) -> Iterator["SuspiciousEvent"]:
+        return iter(self._events[self._head:])
+
+    # =============== ЗАПИСЬ ===============
+
+    def append(self, event: "SuspiciousEvent"):
+        """Добавляет событие и вытесняет вышедшие за лимиты"""
+        self._insert(event)
+        self._evict()
+
+    def extend(self, events: Iterable["SuspiciousEvent"]):
+        """Пакетное добавление (восстановление из снапшота)"""
+        for event in sorted(events, key=lambda event: event.unix_time):
+            self._insert(event)
+        self._evict()
+
+    def _insert(self, event: "SuspiciousEvent"):
+        when = event.unix_time
+        times = self._times
+        if not times or when >= times[-1]:
+            times.append(when)
+            self._events.append(event)
+        else:
+            position = bisect.bisect_right(times, when, self._head)
+            times.insert(position, when)
+            self._events.insert(position, event)
+
+        player = self._players.get(event.player_address)
+        if player is None:
+            player = self._players[event.player_address] = _PlayerEvents()
+        if not player.times or when >= player.times[-1]:
+            player.times.append(when)
+            player.events.append(event)
+        else:
+            position = bisect.bisect_right(player.times, when, player.head)
+            player.times.insert(position, when)
+            player.events.insert(position, event)
+
+        bucket_id = int(when // self.bucket_seconds)
+        counts = self._buckets.get(bucket_id)
+        if counts is None:
+            counts = self._buckets[bucket_id] = Counter()
+            self._bucket_totals[bucket_id] = 0
+            if not self._bucket_ids or bucket_id > self._bucket_ids[-1]:
+                self._bucket_ids.append(bucket_id)
+            else:
+                bisect.insort(self._bucket_ids, bucket_id)
+        counts[event.event_type] += 1
+        self._bucket_totals[bucket_id] += 1
+
+    def _evict(self):
+        now = self.clock()
+        times = self._times
+        cutoff = bisect.bisect_left(times, now - self.retention, self._head)
+        cutoff = max(cutoff, len(times) - self.max_events)
+        if cutoff > self._head:
+            players = self._players
+            for event in self._events[self._head:cutoff]:
+                player = players[event.player_address]
+                player.head += 1
+                if not len(player):
+                    del players[event.player_address]
+                else:
+                    player.compact()
+            self.evicted += cutoff - self._head
+            self._head = cutoff
+            if cutoff >= _COMPACT_MIN and cutoff * 2 >= len(times):
+                del times[:cutoff]
+                del self._events[:cutoff]
+                self._head = 0
+
+        oldest_bucket = int((now - self.bucket_retention) // self.bucket_seconds)
+        bucket_ids = self._bucket_ids
+        if bucket_ids and bucket_ids[0] < oldest_bucket:
+            expired = bisect.bisect_left(bucket_ids, oldest_bucket)
+            for bucket_id in bucket_ids[:expired]:
+                del self._buckets[bucket_id]
+                del self._bucket_totals[bucket_id]
+            del bucket_ids[:expired]
+
+    # =============== ЗАПРОСЫ ===============
+
+    def _bounds(self, times: List[float], head: int, since: Optional[float], until: Optional[float]):
+        start = head if since is None else bisect.bisect_left(times, since, head)
+        end = len(times) if until is None else bisect.bisect_left(times, until, start)
+        return start, end
+
+    def count(self, since: Optional[float] = None, until: Optional[float] = None) -> int:
+        """Число хранимых событий в [since, until)"""
+        start, end = self._bounds(self._times, self._head, since, until)
+        return end - start
+
+    def range(self, since: Optional[float] = None, until: Optional[float] = None,
+              limit: Optional[int] = None) -> List["SuspiciousEvent"]:
+        """События в [since, until) по времени; limit - последние limit из них"""
+        start, end = self._bounds(self._times, self._head, since, until)
+        if limit is not None:
+            start = max(start, end - limit)
+        return self._events[start:end]
+
+    def player_count(self, address: str, since: Optional[float] = None, until: Optional[float] = None) -> int:
+        player = self._players.get(address)
+        if player is None:
+            return 0
+        start, end = self._bounds(player.times, player.head, since, until)
+        return end - start
+
+    def for_player(self, address: str, since: Optional[float] = None, until: Optional[float] = None,
+                   limit: Optional[int] = None) -> List["SuspiciousEvent"]:
+        """События игрока в [since, until) по времени; limit - последние limit из них"""
+        player = self._players.get(address)
+        if player is None:
+            return []
+        start, end = self._bounds(player.times, player.head, since, until)
+        if limit is not None:
+            start = max(start, end - limit)
+        return player.events[start:end]
+
+    def _bucket_end(self, until: float) -> int:
+        """Первый интервал, целиком лежащий не раньше until"""
+        return int(-(-until // self.bucket_seconds))
+
+    def histogram(self, since: float, until: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Число событий по интервалам bucket_seconds в [since, until), в том числе уже вытесненных"""
+        bucket_ids = self._bucket_ids
+        start = bisect.bisect_left(bucket_ids, int(since // self.bucket_seconds))
+        end = len(bucket_ids) if until is None else bisect.bisect_left(bucket_ids, self._bucket_end(until))
+        return [
+            {
+                "start": bucket_id * self.bucket_seconds,
+                "count": self._bucket_totals[bucket_id],
+                "by_type": dict(self._buckets[bucket_id]),
+            }
+            for bucket_id in bucket_ids[start:end]
+        ]
+
+    def counts_by_type(self, since: float, until: Optional[float] = None) -> Dict[str, int]:
+        """Число событий по типам за период из агрегатов (с точностью до интервала)"""
+        total: Counter = Counter()
+        bucket_ids = self._bucket_ids
+        start = bisect.bisect_left(bucket_ids, int(since // self.bucket_seconds))
+        end = len(bucket_ids) if until is None else bisect.bisect_left(bucket_ids, self._bucket_end(until))
+        for bucket_id in bucket_ids[start:end]:
+            total.update(self._buckets[bucket_id])
+        return dict(total)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "events": len(self),
+            "players": len(self._players),
+            "buckets": len(self._bucket_ids),
+            "evicted": self.evicted,
+            "max_events": self.max_events,
+            "retention": self.retention,
+        }
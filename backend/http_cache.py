@@ -0,0 +1,56 @@
+# blockchain_roulette/backend/http_cache.py
+# Кеш сериализованных ответов по версии состояния и условные запросы (ETag / If-None-Match)
+
+import hashlib
+import secrets
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Совпадает ли ETag с одним из перечисленных в If-None-Match (сравнение слабое, RFC 9110)"""
+    if not if_none_match:
+        return False
+    tag = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == tag:
+            return True
+    return False
+
+
+class VersionedResponseCache:
+    """
+    Тело ответа строится один раз на версию состояния и отдаётся готовыми
+    байтами, пока версия не изменится. ETag - это идентификатор процесса и
+    хеш версии: после перезапуска или на другом воркере старый ETag не
+    совпадёт, даже если счётчики версий случайно равны.
+    """
+
+    def __init__(self):
+        self.boot_id = secrets.token_hex(4)
+        self._entries: Dict[str, Tuple[Hashable, str, bytes]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def etag(self, version: Hashable) -> str:
+        digest = hashlib.blake2b(repr(version).encode(), digest_size=8).hexdigest()
+        return f'"{self.boot_id}-{digest}"'
+
+    def get(self, name: str, version: Hashable, build: Callable[[], bytes]) -> Tuple[str, bytes]:
+        """(ETag, тело) ответа name для версии version; build вызывается только при смене версии"""
+        entry = self._entries.get(name)
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry[1], entry[2]
+        self.misses += 1
+        etag = self.etag(version)
+        body = build()
+        self._entries[name] = (version, etag, body)
+        return etag, body
+
+    def clear(self):
+        self._entries.clear()
@@ -0,0 +1,253 @@
+# blockchain_roulette/backend/live_feed.py
+# Live-лента аналитики: апостериорные распределения, подозрительные события и смены уровня риска подписчикам
+
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import numpy as np
+
+from bayesian_analyzer import BayesianAnalyzer, SuspiciousEvent
+
+
+class Frame:
+    """Кадр ленты: сериализуется один раз, одни и те же байты уходят всем подписчикам"""
+    __slots__ = ("seq", "data", "sse")
+
+    def __init__(self, seq: int, data: bytes):
+        self.seq = seq
+        self.data = data
+        self.sse = b"id: %d\ndata: %s\n\n" % (seq, data)
+
+
+class Subscriber:
+    """
+    Очередь подписчика ограничена: при переполнении вытесняется самый
+    старый кадр, так что медленный клиент теряет устаревшие кадры, но не
+    задерживает публикацию. Пропуск виден по разрыву в seq; апостериорные
+    средние есть в каждом кадре, поэтому последний кадр всегда актуален.
+    """
+    __slots__ = ("queue", "ready", "dropped", "closed")
+
+    def __init__(self, queue_size: int):
+        self.queue: "deque[Frame]" = deque(maxlen=queue_size)
+        self.ready = asyncio.Event()
+        self.dropped = 0
+        self.closed = False
+
+    def push(self, frame: Frame):
+        queue = self.queue
+        if len(queue) == queue.maxlen:
+            self.dropped += 1
+        queue.append(frame)
+        self.ready.set()
+
+    def close(self):
+        self.closed = True
+        self.ready.set()
+
+    async def frames(self, heartbeat: Optional[float] = None) -> AsyncIterator[Optional[Frame]]:
+        """Кадры по мере поступления; None - пора отправить heartbeat (нет кадров heartbeat секунд)"""
+        queue = self.queue
+        while not self.closed:
+            if not queue:
+                self.ready.clear()
+                try:
+                    await asyncio.wait_for(self.ready.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+            while queue:
+                yield queue.popleft()
+
+
+class LiveFeed:
+    """
+    Подписка на обновления анализатора. Обработчики только помечают, что
+    изменилось; обновления за coalesce_window секунд собираются в один
+    кадр, который сериализуется один раз и раскладывается по очередям
+    подписчиков. Обработчики вызываются из event loop (как и все
+    обновления анализатора после старта).
+    """
+
+    def __init__(self, analyzer: BayesianAnalyzer, coalesce_window: float = 0.05,
+                 queue_size: int = 16, max_subscribers: int = 10_000, max_events_per_frame: int = 100,
+                 publish_histogram=None):
+        self.analyzer = analyzer
+        self.coalesce_window = coalesce_window
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.max_events_per_frame = max_events_per_frame
+        # Гистограмма задержки от первого изменения до раскладки кадра (metrics.Histogram)
+        self.publish_histogram = publish_histogram
+
+        self.subscribers: List[Subscriber] = []
+        self.seq = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._store = None
+
+        # Накопленные с прошлого кадра изменения
+        self._dirty_since: Optional[float] = None
+        self._posterior_dirty = False
+        self._events: List[SuspiciousEvent] = []
+        self._events_skipped = 0
+        # Адрес -> [уровень до первого изменения в окне, последний уровень]
+        self._risk: Dict[str, List[str]] = {}
+
+        self.stats = {"frames": 0, "updates": 0, "bytes": 0, "last_publish_ms": 0.0}
+
+    # =============== ПОДПИСКА НА АНАЛИЗАТОР ===============
+
+    def start(self):
+        """Подключается к анализатору; вызывать из event loop после восстановления состояния"""
+        if self._loop is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self.analyzer.update_listeners.append(self._on_update)
+        # Хранилище профилей заменяется при восстановлении, поэтому берётся текущее
+        self._store = self.analyzer.player_profiles
+        self._store.risk_listeners.append(self._on_risk)
+
+    def stop(self):
+        """Отключается от анализатора и закрывает подписчиков"""
+        if self._loop is None:
+            return
+        self.analyzer.update_listeners.remove(self._on_update)
+        self._store.risk_listeners.remove(self._on_risk)
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for subscriber in self.subscribers:
+            subscriber.close()
+        self.subscribers.clear()
+        self._loop = None
+
+    def _mark(self):
+        self.stats["updates"] += 1
+        if self._dirty_since is None:
+            self._dirty_since = time.perf_counter()
+            self._flush_handle = self._loop.call_later(self.coalesce_window, self.flush)
+
+    def _on_update(self, kind: str, payload: Any):
+        if kind == "event":
+            if len(self._events) < self.max_events_per_frame:
+                self._events.append(payload)
+            else:
+                self._events_skipped += 1
+        else:
+            self._posterior_dirty = True
+        self._mark()
+
+    def _on_risk(self, address: str, old_level: str, new_level: str):
+        transition = self._risk.get(address)
+        if transition is None:
+            self._risk[address] = [old_level, new_level]
+        else:
+            transition[1] = new_level
+        self._mark()
+
+    # =============== КАДРЫ ===============
+
+    def _posterior(self) -> Dict[str, Any]:
+        analyzer = self.analyzer
+        alpha = analyzer.alpha_params
+        return {
+            "total_spins": analyzer.total_spins,
+            "mean": np.round(alpha / (alpha + analyzer.beta_params), 6).tolist(),
+        }
+
+    def _build(self) -> Dict[str, Any]:
+        # Апостериорные средние (37 чисел) идут в каждом кадре: пропущенный кадр не оставляет их устаревшими
+        frame: Dict[str, Any] = {
+            "type": "update",
+            "seq": self.seq,
+            "timestamp": time.time(),
+            "posterior_changed": self._posterior_dirty,
+            "posterior": self._posterior(),
+        }
+        if self._events:
+            frame["events"] = [
+                {
+                    "player_address": event.player_address,
+                    "event_type": event.event_type,
+                    "severity": event.severity,
+                    "description": event.description,
+                    "probability_score": event.probability_score,
+                    "timestamp": event.unix_time,
+                }
+                for event in self._events
+            ]
+            if self._events_skipped:
+                frame["events_skipped"] = self._events_skipped
+        if self._risk:
+            # Переходы, вернувшиеся к исходному уровню за окно, не публикуются
+            frame["risk"] = [
+                {"address": address, "from": old_level, "to": new_level}
+                for address, (old_level, new_level) in self._risk.items()
+                if old_level != new_level
+            ]
+        return frame
+
+    def flush(self):
+        """Собирает накопленные изменения в кадр и раскладывает его по подписчикам"""
+        self._flush_handle = None
+        if self._dirty_since is None:
+            return
+        self.seq += 1
+        data = json.dumps(self._build(), separators=(",", ":")).encode()
+        dirty_since = self._dirty_since
+        self._dirty_since = None
+        self._posterior_dirty = False
+        self._events = []
+        self._events_skipped = 0
+        self._risk = {}
+
+        frame = Frame(self.seq, data)
+        for subscriber in self.subscribers:
+            subscriber.push(frame)
+
+        elapsed = time.perf_counter() - dirty_since
+        if self.publish_histogram is not None:
+            self.publish_histogram.observe(elapsed)
+        self.stats["frames"] += 1
+        self.stats["bytes"] += len(data)
+        self.stats["last_publish_ms"] = elapsed * 1000
+
+    # =============== ПОДПИСЧИКИ ===============
+
+    def subscribe(self) -> Optional[Subscriber]:
+        """Новый подписчик или None, если достигнут max_subscribers"""
+        if len(self.subscribers) >= self.max_subscribers:
+            return None
+        subscriber = Subscriber(self.queue_size)
+        self.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscriber.close()
+        try:
+            self.subscribers.remove(subscriber)
+        except ValueError:
+            pass
+
+    def hello(self) -> bytes:
+        """Первый кадр для нового подписчика: текущее состояние и seq, с которого пойдут обновления"""
+        return json.dumps({
+            "type": "snapshot",
+            "seq": self.seq,
+            "posterior": self._posterior(),
+            "recent_suspicious_events": self.analyzer.recent_suspicious_events(),
+        }, separators=(",", ":")).encode()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "seq": self.seq,
+            "subscribers": len(self.subscribers),
+            "dropped_frames": sum(subscriber.dropped for subscriber in self.subscribers),
+            "coalesce_window": self.coalesce_window,
+            "queue_size": self.queue_size,
+        }
@@ -1,17 +1,18 @@
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Security
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Header, Security, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, Field, validator
-from web3 import Web3
 import json
 import os
 from dotenv import load_dotenv
-import numpy as np
-from scipy.stats import beta
 import secrets
 import hashlib
 import asyncio
-from typing import Dict, List, Optional, Any
+import time
+from typing import Callable, Dict, List, Optional, Any, Tuple
+from collections import Counter
 from datetime import datetime, timedelta
 import logging
 from contextlib import asynccontextmanager
@@ -19,6 +20,21 @@ from contextlib import asynccontextmanager
 # Импортируем наши модули
 from zk_system import zk_system, ZKProof
 from bayesian_analyzer import bayesian_analyzer, SuspiciousEvent
+from rate_limiter import SlidingWindowRateLimiter, RateLimit
+from state_store import create_state_store
+from chain_client import (
+    AsyncChainClient, ChainHealth, ChainError, ContractABI, NonceManager, GasPriceOracle, to_wei
+)
+from signature_verifier import SignatureVerifier
+from wheel_monitor import wheel_monitor
+from event_indexer import EventIndexer
+from persistence import PersistenceManager
+from metrics import metrics_registry
+from http_cache import VersionedResponseCache, etag_matches
+from live_feed import LiveFeed
+from risk_engine import RiskEngine
+from admission import AdmissionController, AdmissionRejected, AdmissionTicket, GradientLimit, RouteAdmission
+from wire_format import WIRE_MEDIA_TYPE, accepts_binary, encode_bet_record, encode_error_record
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -34,53 +50,339 @@ class ConfigSettings:
     """Настройки конфигурации"""
     WEB3_PROVIDER_URI = os.getenv("WEB3_PROVIDER_URI", "http://localhost:8545")
     CONTRACT_ADDRESS = os.getenv("CONTRACT_ADDRESS")
+    CONTRACT_ABI_PATH = os.getenv("CONTRACT_ABI_PATH", "../contracts/ZKRouletteV2.json")
     ADMIN_ADDRESS = os.getenv("ADMIN_ADDRESS")
     SECRET_KEY = os.getenv("SECRET_KEY", secrets.token_hex(32))
     MAX_BETS_PER_HOUR = int(os.getenv("MAX_BETS_PER_HOUR", "50"))
+    MAX_AUTH_PER_MINUTE = int(os.getenv("MAX_AUTH_PER_MINUTE", "20"))
+    RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "1000000"))
+    # memory - один процесс, sqlite - общее состояние для нескольких воркеров
+    STATE_BACKEND = os.getenv("STATE_BACKEND", "memory")
+    STATE_DB_PATH = os.getenv("STATE_DB_PATH", "zk_roulette_state.db")
+    # Ожидание блокировки SQLite другим воркером; дольше - ошибка запроса, а не зависание
+    STATE_BUSY_TIMEOUT_MS = int(os.getenv("STATE_BUSY_TIMEOUT_MS", "200"))
+    SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(24 * 3600)))
+    HOST = os.getenv("HOST", "localhost")
+    PORT = int(os.getenv("PORT", "8000"))
+    WORKERS = int(os.getenv("WORKERS", "1"))
+    RPC_MAX_CONNECTIONS = int(os.getenv("RPC_MAX_CONNECTIONS", "20"))
+    RPC_MAX_CONCURRENCY = int(os.getenv("RPC_MAX_CONCURRENCY", "32"))
+    RPC_TIMEOUT = float(os.getenv("RPC_TIMEOUT", "5.0"))
+    CHAIN_HEALTH_INTERVAL = float(os.getenv("CHAIN_HEALTH_INTERVAL", "5.0"))
+    GAS_PRICE_TTL = float(os.getenv("GAS_PRICE_TTL", "3.0"))
+    NONCE_RESYNC_SECONDS = float(os.getenv("NONCE_RESYNC_SECONDS", "60.0"))
+    SIGNATURE_WORKERS = int(os.getenv("SIGNATURE_WORKERS", "0")) or None
+    SIGNATURE_CACHE_TTL = float(os.getenv("SIGNATURE_CACHE_TTL", "300"))
+    MAX_AUTH_BATCH = int(os.getenv("MAX_AUTH_BATCH", "500"))
+    MAX_BET_BATCH = int(os.getenv("MAX_BET_BATCH", "1000"))
+    MAX_SPIN_BATCH = int(os.getenv("MAX_SPIN_BATCH", "100000"))
+    SPIN_LOG_PATH = os.getenv("SPIN_LOG_PATH")
+    # Каталог WAL и снапшотов; пустая строка отключает сохранение состояния
+    PERSISTENCE_DIR = os.getenv("PERSISTENCE_DIR", "zk_roulette_data")
+    SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", "300"))
+    WAL_COMPACT_BYTES = int(os.getenv("WAL_COMPACT_BYTES", str(64 * 1024 * 1024)))
+    WAL_FLUSH_INTERVAL = float(os.getenv("WAL_FLUSH_INTERVAL", "0.05"))
+    WAL_FSYNC = os.getenv("WAL_FSYNC", "false").lower() == "true"
+    # Индексатор событий контракта (нужен CONTRACT_ADDRESS)
+    INDEXER_ENABLED = os.getenv("INDEXER_ENABLED", "true").lower() == "true"
+    INDEXER_START_BLOCK = int(os.getenv("INDEXER_START_BLOCK", "0"))
+    INDEXER_CONFIRMATIONS = int(os.getenv("INDEXER_CONFIRMATIONS", "12"))
+    INDEXER_CONCURRENCY = int(os.getenv("INDEXER_CONCURRENCY", "8"))
+    INDEXER_POLL_INTERVAL = float(os.getenv("INDEXER_POLL_INTERVAL", "5.0"))
+    # false, если результаты вращений уже приходят через /spins
+    INDEXER_RECORD_SPINS = os.getenv("INDEXER_RECORD_SPINS", "true").lower() == "true"
+    # Сигнатуры событий, если их нет в ABI контракта, например "BetSettled(uint256,address,uint8,uint256,uint256)"
+    INDEXER_BET_PLACED_EVENT = os.getenv("INDEXER_BET_PLACED_EVENT", "")
+    INDEXER_BET_SETTLED_EVENT = os.getenv("INDEXER_BET_SETTLED_EVENT", "")
+    # Live-лента /live/sse и /live/ws
+    LIVE_COALESCE_MS = float(os.getenv("LIVE_COALESCE_MS", "50"))
+    LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "16"))
+    LIVE_MAX_SUBSCRIBERS = int(os.getenv("LIVE_MAX_SUBSCRIBERS", "10000"))
+    LIVE_HEARTBEAT = float(os.getenv("LIVE_HEARTBEAT", "15"))
+    # Оценка риска игроков (Beta-Binomial): сила априорного, кратность превышения ожидаемой доли выигрышей
+    RISK_PRIOR_STRENGTH = float(os.getenv("RISK_PRIOR_STRENGTH", "100"))
+    RISK_EXCESS = float(os.getenv("RISK_EXCESS", "2.0"))
+    RISK_RESCORE_INTERVAL = float(os.getenv("RISK_RESCORE_INTERVAL", "1.0"))
+    RISK_WORKERS = int(os.getenv("RISK_WORKERS", "0")) or None
+    RISK_SUSPEND_THRESHOLD = float(os.getenv("RISK_SUSPEND_THRESHOLD", "0.8"))
+    # Хранение подозрительных событий: не больше EVENT_MAX_COUNT и не дольше EVENT_RETENTION_HOURS
+    EVENT_MAX_COUNT = int(os.getenv("EVENT_MAX_COUNT", "100000"))
+    EVENT_RETENTION_HOURS = float(os.getenv("EVENT_RETENTION_HOURS", "168"))
+    # Контроль допуска /bet/prepare и /auth/player: потолок адаптивного лимита параллельности,
+    # длина очереди и максимальное ожидание в ней (дольше - сразу 503 с Retry-After)
+    ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_BET_MAX_INFLIGHT = int(os.getenv("ADMISSION_BET_MAX_INFLIGHT", "256"))
+    ADMISSION_AUTH_MAX_INFLIGHT = int(os.getenv("ADMISSION_AUTH_MAX_INFLIGHT", "128"))
+    ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "256"))
+    ADMISSION_MAX_WAIT_MS = float(os.getenv("ADMISSION_MAX_WAIT_MS", "500"))
     MIN_BET_AMOUNT = float(os.getenv("MIN_BET_AMOUNT", "0.001"))
     MAX_BET_AMOUNT = float(os.getenv("MAX_BET_AMOUNT", "10.0"))
 
 config = ConfigSettings()
 
-# Инициализация Web3
-try:
-    w3 = Web3(Web3.HTTPProvider(config.WEB3_PROVIDER_URI))
-    if not w3.is_connected():
-        logger.error("Failed to connect to Web3 provider")
-        raise Exception("Web3 connection failed")
-except Exception as e:
-    logger.error(f"Web3 initialization error: {e}")
-    w3 = None
-
-# Загрузка контракта
-if w3 and config.CONTRACT_ADDRESS:
+# Контракт: ABI и кодировщик загружаются в фоне после старта (load_contract),
+# до этого ставки готовятся как фиктивные транзакции
+contract_abi = ContractABI(config.CONTRACT_ADDRESS, config.CONTRACT_ABI_PATH) if config.CONTRACT_ADDRESS else None
+contract: Optional[ContractABI] = None
+
+# Асинхронный доступ к ноде для горячего пути ставок
+chain_client = AsyncChainClient(
+    config.WEB3_PROVIDER_URI,
+    max_connections=config.RPC_MAX_CONNECTIONS,
+    max_concurrency=config.RPC_MAX_CONCURRENCY,
+    timeout=config.RPC_TIMEOUT
+)
+chain_health = ChainHealth(chain_client, interval=config.CHAIN_HEALTH_INTERVAL)
+nonce_manager = NonceManager(chain_client, resync_after=config.NONCE_RESYNC_SECONDS)
+gas_oracle = GasPriceOracle(chain_client, ttl=config.GAS_PRICE_TTL)
+
+# Проверка подписей в пуле процессов
+signature_verifier = SignatureVerifier(
+    max_workers=config.SIGNATURE_WORKERS,
+    cache_ttl=config.SIGNATURE_CACHE_TTL
+)
+
+# Хранилище для rate limiting и сессий
+state_store = create_state_store(config.STATE_BACKEND, config.STATE_DB_PATH, config.STATE_BUSY_TIMEOUT_MS)
+shared_state = config.STATE_BACKEND != "memory"
+rate_limiter = SlidingWindowRateLimiter(
+    {
+        "bet": RateLimit(config.MAX_BETS_PER_HOUR, 3600),
+        "auth": RateLimit(config.MAX_AUTH_PER_MINUTE, 60),
+    },
+    max_keys=config.RATE_LIMIT_MAX_KEYS,
+    # Между процессами нужны общие часы и общие счётчики
+    clock=time.time if shared_state else time.monotonic,
+    store=state_store if shared_state else None
+)
+
+# Метрики конвейера ставок: задержка каждого этапа /bet/prepare
+BET_PHASES = ("rate_limit", "risk", "commitment", "proof", "transaction", "session")
+bet_phase_seconds = metrics_registry.histogram_family(
+    "zk_roulette_bet_phase_seconds", "Длительность этапов подготовки ставки", "phase", BET_PHASES
+)
+# Гистограммы этапов связываются заранее, чтобы в обработчике не было поиска по словарю
+(phase_rate_limit, phase_risk, phase_commitment,
+ phase_proof, phase_transaction, phase_session) = (bet_phase_seconds[phase] for phase in BET_PHASES)
+bet_prepare_seconds = metrics_registry.histogram(
+    "zk_roulette_bet_prepare_seconds", "Полная длительность /bet/prepare"
+)
+bet_batch_seconds = metrics_registry.histogram(
+    "zk_roulette_bet_batch_prepare_seconds", "Длительность подготовки пакета до начала потоковой отдачи"
+)
+metrics_registry.gauge(
+    "zk_roulette_commitments", "Число commitment'ов в хранилище", lambda: len(zk_system.commitment_storage)
+)
+# Размеры в хранилище состояния (SQLite блокирует) собираются в metrics() до render
+state_counts: Dict[str, float] = {"sessions": 0, "rate_limit_keys": 0}
+metrics_registry.gauge(
+    "zk_roulette_sessions", "Число активных сессий игроков", lambda: state_counts["sessions"]
+)
+metrics_registry.gauge(
+    "zk_roulette_rate_limit_keys", "Число ключей в rate limiter", lambda: state_counts["rate_limit_keys"]
+)
+metrics_registry.gauge(
+    "zk_roulette_player_profiles", "Число профилей игроков в анализаторе",
+    lambda: len(bayesian_analyzer.player_profiles)
+)
+metrics_registry.gauge(
+    "zk_roulette_suspicious_events", "Число хранимых подозрительных событий",
+    lambda: len(bayesian_analyzer.suspicious_events)
+)
+metrics_registry.gauge(
+    "zk_roulette_wheel_spins", "Число учтённых вращений колеса", lambda: wheel_monitor.total_spins
+)
+
+# Лимиты хранилища событий задаются до восстановления: лишнее из снапшота сразу вытесняется
+bayesian_analyzer.suspicious_events.max_events = config.EVENT_MAX_COUNT
+bayesian_analyzer.suspicious_events.retention = config.EVENT_RETENTION_HOURS * 3600
+
+# WAL и снапшоты анализатора и ZK системы (сессии и лимиты сохраняет STATE_BACKEND=sqlite)
+persistence = PersistenceManager(
+    config.PERSISTENCE_DIR,
+    zk_system,
+    bayesian_analyzer,
+    snapshot_interval=config.SNAPSHOT_INTERVAL,
+    compact_after_bytes=config.WAL_COMPACT_BYTES,
+    flush_interval=config.WAL_FLUSH_INTERVAL,
+    fsync=config.WAL_FSYNC
+) if config.PERSISTENCE_DIR else None
+metrics_registry.counter(
+    "zk_roulette_wal_bytes_total", "Байт записано в WAL с запуска",
+    lambda: persistence.wal.bytes if persistence else 0
+)
+
+# Рассчитанные ставки из событий контракта -> профили игроков и распределения чисел
+event_indexer = EventIndexer(
+    chain_client,
+    bayesian_analyzer,
+    config.CONTRACT_ADDRESS,
+    start_block=config.INDEXER_START_BLOCK,
+    confirmations=config.INDEXER_CONFIRMATIONS,
+    concurrency=config.INDEXER_CONCURRENCY,
+    poll_interval=config.INDEXER_POLL_INTERVAL,
+    record_spins=config.INDEXER_RECORD_SPINS,
+    abi=contract_abi,
+    event_signatures={
+        name: signature for name, signature in (
+            ("BetPlaced", config.INDEXER_BET_PLACED_EVENT), ("BetSettled", config.INDEXER_BET_SETTLED_EVENT)
+        ) if signature
+    }
+) if config.CONTRACT_ADDRESS and config.INDEXER_ENABLED else None
+metrics_registry.gauge(
+    "zk_roulette_indexer_lag_blocks", "Отставание индексатора событий от головы цепи",
+    lambda: (event_indexer.get_stats()["lag_blocks"] or 0) if event_indexer else 0
+)
+
+# Готовые тела ответов /analytics и /stats/{number} по версии состояния анализатора
+response_cache = VersionedResponseCache()
+metrics_registry.counter(
+    "zk_roulette_response_cache_hits_total", "Ответы аналитики, отданные из кеша без сериализации",
+    lambda: response_cache.hits
+)
+
+# Фоновый пересчёт оценок риска; проверка при ставке читает готовую оценку
+risk_engine = RiskEngine(
+    bayesian_analyzer,
+    prior_strength=config.RISK_PRIOR_STRENGTH,
+    excess=config.RISK_EXCESS,
+    interval=config.RISK_RESCORE_INTERVAL,
+    workers=config.RISK_WORKERS
+)
+metrics_registry.gauge(
+    "zk_roulette_risk_pending", "Игроки, ожидающие пересчёта оценки риска",
+    lambda: bayesian_analyzer.player_profiles.dirty_count()
+)
+
+# Push-обновления аналитики: один сериализованный кадр на окно для всех подписчиков
+live_feed = LiveFeed(
+    bayesian_analyzer,
+    coalesce_window=config.LIVE_COALESCE_MS / 1000,
+    queue_size=config.LIVE_QUEUE_SIZE,
+    max_subscribers=config.LIVE_MAX_SUBSCRIBERS,
+    publish_histogram=metrics_registry.histogram(
+        "zk_roulette_live_publish_seconds", "Задержка от изменения анализатора до раскладки кадра live-ленты"
+    )
+)
+metrics_registry.gauge(
+    "zk_roulette_live_subscribers", "Число подписчиков live-ленты", lambda: len(live_feed.subscribers)
+)
+
+# Допуск запросов на подготовку ставок и аутентификацию: лимит параллельности
+# подстраивается под задержку, лишние запросы получают быстрый 503
+admission = AdmissionController({
+    route: RouteAdmission(
+        route,
+        GradientLimit(initial=min(32, max_inflight), max_limit=max_inflight),
+        max_queue=config.ADMISSION_QUEUE_SIZE,
+        max_wait=config.ADMISSION_MAX_WAIT_MS / 1000
+    )
+    for route, max_inflight in (
+        ("bet", config.ADMISSION_BET_MAX_INFLIGHT),
+        ("auth", config.ADMISSION_AUTH_MAX_INFLIGHT)
+    )
+}, enabled=config.ADMISSION_ENABLED)
+for _route in admission.routes.values():
+    metrics_registry.gauge(
+        f"zk_roulette_admission_{_route.name}_limit", f"Текущий лимит параллельности {_route.name}",
+        lambda route=_route: route.limit.value
+    )
+    for _key in ("admitted", "rejected_queue_full", "rejected_deadline", "expired", "shed"):
+        metrics_registry.counter(
+            f"zk_roulette_admission_{_route.name}_{_key}_total", f"Запросы {_route.name} с исходом {_key} с запуска",
+            lambda route=_route, key=_key: route.stats[key]
+        )
+
+async def start_persistence() -> bool:
+    """Восстанавливает состояние из снапшота и WAL; True, если журнал включён"""
+    if persistence is None:
+        return False
+    if not persistence.acquire_lock():
+        logger.warning(f"Каталог {config.PERSISTENCE_DIR} занят другим процессом, состояние не сохраняется")
+        return False
+    restored = await asyncio.to_thread(persistence.restore)
+    logger.info(f"💾 Состояние восстановлено: {restored}")
+    persistence.start()
+    return True
+
+async def load_contract():
+    """
+    Загрузка ABI контракта в фоне: импорт кодировщика и чтение артефакта
+    не задерживают старт воркера, готовность видна в /health/ready
+    """
+    global contract
+    if contract_abi is None:
+        return
     try:
-        with open("../contracts/ZKRouletteV2.json") as f:
-            contract_json = json.load(f)
-        CONTRACT_ABI = contract_json["abi"]
-        contract = w3.eth.contract(address=config.CONTRACT_ADDRESS, abi=CONTRACT_ABI)
+        contract = await asyncio.to_thread(contract_abi.load)
     except Exception as e:
         logger.error(f"Contract loading error: {e}")
-        contract = None
-else:
-    contract = None
+        return
+    gas_oracle.start()
 
-# Хранилище для rate limiting и сессий
-player_sessions: Dict[str, Dict[str, Any]] = {}
-rate_limits: Dict[str, List[datetime]] = {}
+# Старт воркера: liveness - процесс отвечает, readiness - зависимости готовы
+startup_status: Dict[str, Any] = {"started": False, "startup_seconds": None}
+
+def readiness_checks() -> Dict[str, bool]:
+    """Что должно быть готово, чтобы воркер принимал ставки"""
+    checks = {"started": startup_status["started"]}
+    if contract_abi is not None:
+        # Без контракта ставки не уходят в ноду, и она не нужна для готовности
+        checks["contract_loaded"] = contract is not None
+        checks["chain_connected"] = chain_health.connected
+    return checks
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Управление жизненным циклом приложения"""
     logger.info("🚀 Запуск ZK-Roulette API...")
+    started = time.perf_counter()
+    
+    persisted = await start_persistence()
     
-    # Инициализация фоновых задач
+    # Инициализация фоновых задач; подключение к ноде не блокирует старт
+    zk_system.epoch_listeners.append(publish_epoch_root)
+    chain_health.start()
+    contract_task = asyncio.create_task(load_contract())
+    if config.SPIN_LOG_PATH and os.path.exists(config.SPIN_LOG_PATH):
+        # Апостериорные распределения уже восстановлены из снапшота
+        replayed = await asyncio.to_thread(
+            wheel_monitor.replay_file, config.SPIN_LOG_PATH, False, not persisted
+        )
+        logger.info(f"🎡 Журнал вращений восстановлен: {replayed}")
+    if event_indexer is not None:
+        # Чекпоинт сохраняется рядом с состоянием анализатора и только вместе с ним:
+        # без WAL история после рестарта должна загружаться заново
+        if persisted:
+            event_indexer.checkpoint_path = os.path.join(config.PERSISTENCE_DIR, "indexer_checkpoint.json")
+            event_indexer.flush = persistence.wal.flush_async
+        event_indexer.start()
+    live_feed.start()
+    await risk_engine.start()
     cleanup_task = asyncio.create_task(periodic_cleanup())
+    epoch_task = asyncio.create_task(periodic_epoch_sealing())
+    startup_status.update(started=True, startup_seconds=time.perf_counter() - started)
+    logger.info(f"✅ Старт за {startup_status['startup_seconds'] * 1000:.1f} мс")
     
     yield
     
     # Очистка при выключении
+    startup_status["started"] = False
+    contract_task.cancel()
     cleanup_task.cancel()
+    epoch_task.cancel()
+    live_feed.stop()
+    await risk_engine.stop()
+    if event_indexer is not None:
+        await event_indexer.stop()
+    await chain_health.stop()
+    await gas_oracle.stop()
+    await chain_client.close()
+    signature_verifier.shutdown()
+    wheel_monitor.flush()
+    if persisted:
+        await persistence.stop()
+    state_store.close()
     logger.info("🛑 Остановка ZK-Roulette API...")
 
 app = FastAPI(
@@ -102,14 +404,14 @@ app.add_middleware(
 # =============== МОДЕЛИ ДАННЫХ ===============
 
 class PlayerAuthRequest(BaseModel):
-    wallet_address: str = Field(..., regex=r"^0x[a-fA-F0-9]{40}$")
+    wallet_address: str = Field(..., pattern=r"^0x[a-fA-F0-9]{40}$")
     signature: str = Field(..., min_length=132, max_length=132)
     message: str
 
 class BetRequest(BaseModel):
     number: int = Field(..., ge=0, le=36, description="Номер от 0 до 36")
     amount: float = Field(..., gt=0, description="Размер ставки в ETH")
-    player_address: str = Field(..., regex=r"^0x[a-fA-F0-9]{40}$")
+    player_address: str = Field(..., pattern=r"^0x[a-fA-F0-9]{40}$")
     
     @validator('amount')
     def validate_amount(cls, v):
@@ -119,6 +421,16 @@ class BetRequest(BaseModel):
             raise ValueError(f'Максимальная ставка: {config.MAX_BET_AMOUNT} ETH')
         return v
 
+class BetBatchRequest(BaseModel):
+    bets: List[BetRequest] = Field(..., min_length=1)
+
+class SpinResult(BaseModel):
+    number: int = Field(..., ge=0, le=36)
+    timestamp: Optional[float] = Field(None, description="Unix time; по умолчанию - время приёма")
+
+class SpinBatchRequest(BaseModel):
+    spins: List[SpinResult] = Field(..., min_length=1)
+
 class ZKProofResponse(BaseModel):
     zk_proof: Dict[str, Any]
     transaction_data: Dict[str, Any]
@@ -153,74 +465,91 @@ class AnalyticsResponse(BaseModel):
 
 # =============== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ===============
 
-async def check_rate_limit(player_address: str) -> bool:
+def cached_json_response(name: str, version: Any, build: Callable[[], BaseModel],
+                         if_none_match: Optional[str]) -> Response:
+    """
+    JSON-ответ с ETag по версии состояния: 304 без тела, если клиент уже
+    видел эту версию, иначе тело из кеша (сериализуется раз на версию)
+    """
+    etag, body = response_cache.get(name, version, lambda: build().model_dump_json().encode())
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+async def check_rate_limit(player_address: str, route: str = "bet") -> bool:
     """Проверка rate limiting"""
-    now = datetime.now()
-    hour_ago = now - timedelta(hours=1)
-    
-    if player_address not in rate_limits:
-        rate_limits[player_address] = []
-    
-    # Удаляем старые записи
-    rate_limits[player_address] = [
-        timestamp for timestamp in rate_limits[player_address]
-        if timestamp > hour_ago
-    ]
-    
-    # Проверяем лимит
-    if len(rate_limits[player_address]) >= config.MAX_BETS_PER_HOUR:
-        return False
-    
-    rate_limits[player_address].append(now)
-    return True
+    return await rate_limiter.hit_async(player_address, route)
 
-def verify_player_signature(address: str, signature: str, message: str) -> bool:
-    """Верификация подписи игрока"""
+async def verify_player_signature(address: str, signature: str, message: str) -> bool:
+    """Верификация подписи игрока (вне event loop, с кешем)"""
     try:
-        # Восстанавливаем адрес из подписи
-        message_hash = hashlib.sha3_256(message.encode()).digest()
-        recovered_address = w3.eth.account.recover_message(
-            message_hash, signature=signature
-        )
-        return recovered_address.lower() == address.lower()
+        return await signature_verifier.verify(address, message, signature)
     except Exception as e:
         logger.error(f"Signature verification error: {e}")
         return False
 
-async def get_player_session(player_address: str) -> Dict[str, Any]:
-    """Получение или создание сессии игрока"""
-    if player_address not in player_sessions:
-        player_sessions[player_address] = {
-            'created_at': datetime.now(),
-            'last_activity': datetime.now(),
-            'bets_count': 0,
-            'session_id': secrets.token_hex(16)
-        }
+async def get_player_session(player_address: str, new_bets: int = 0) -> Dict[str, Any]:
+    """Получение или создание сессии игрока (атомарно в хранилище состояния)"""
+    def touch(session: Optional[Dict[str, Any]]):
+        now = time.time()
+        if session is None:
+            session = {
+                'created_at': now,
+                'last_activity': now,
+                'bets_count': 0,
+                'session_id': secrets.token_hex(16)
+            }
+        session['last_activity'] = now
+        session['bets_count'] += new_bets
+        return session, session
+    
+    # Сессия живёт SESSION_TTL_SECONDS с момента последней активности
+    return await state_store.call(
+        state_store.update, "sessions", player_address, touch, ttl=config.SESSION_TTL_SECONDS
+    )
+
+async def admit(route: str, player_address: Optional[str] = None) -> AdmissionTicket:
+    """
+    Место для обработки запроса; при перегрузке - 503 с Retry-After.
+    Игроки с живой сессией ждут в очереди впереди остальных
+    """
+    async def has_session() -> bool:
+        return await state_store.call(state_store.get, "sessions", player_address) is not None
     
-    player_sessions[player_address]['last_activity'] = datetime.now()
-    return player_sessions[player_address]
+    priority = has_session if player_address else None
+    try:
+        return await admission.acquire(route, priority)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=503, detail="Server overloaded", headers={"Retry-After": str(e.retry_after)}
+        )
+
+CLEANUP_BATCH_SIZE = 5000
 
 async def periodic_cleanup():
     """Периодическая очистка устаревших данных"""
     while True:
         try:
-            # Очистка устаревших ZK commitments
-            expired_count = zk_system.cleanup_expired_commitments(600)  # 10 минут
+            # Очистка устаревших ZK commitments (10 минут) порциями,
+            # чтобы не блокировать event loop при большом хранилище
+            expired_count = 0
+            while True:
+                removed = zk_system.cleanup_expired_commitments(600, max_batch=CLEANUP_BATCH_SIZE)
+                expired_count += removed
+                if removed < CLEANUP_BATCH_SIZE:
+                    break
+                await asyncio.sleep(0)
             if expired_count > 0:
                 logger.info(f"Очищено {expired_count} устаревших ZK commitments")
             
-            # Очистка старых сессий (старше 24 часов)
-            now = datetime.now()
-            old_sessions = [
-                addr for addr, session in player_sessions.items()
-                if now - session['last_activity'] > timedelta(hours=24)
-            ]
-            
-            for addr in old_sessions:
-                del player_sessions[addr]
+            # Очистка истёкших сессий и счётчиков rate limiting
+            purged = await state_store.call(state_store.purge_expired)
+            if purged:
+                logger.info(f"Очищено {purged} устаревших записей состояния")
             
-            if old_sessions:
-                logger.info(f"Очищено {len(old_sessions)} старых сессий")
+            # Вытеснение простаивающих ключей rate limiting
+            rate_limiter.evict_idle()
             
             await asyncio.sleep(300)  # Каждые 5 минут
             
@@ -228,6 +557,96 @@ async def periodic_cleanup():
             logger.error(f"Cleanup error: {e}")
             await asyncio.sleep(60)
 
+def is_player_suspended(player_address: str) -> bool:
+    """Проверка блокировки игрока по оценке риска"""
+    return bayesian_analyzer.player_profiles.risk_score(player_address) > config.RISK_SUSPEND_THRESHOLD
+
+def verify_admin_token(credentials: HTTPAuthorizationCredentials = Security(security)):
+    """Служебные эндпоинты доступны только с Bearer-токеном SECRET_KEY"""
+    if not secrets.compare_digest(credentials.credentials, config.SECRET_KEY):
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+def zk_proof_to_dict(zk_proof: ZKProof) -> Dict[str, Any]:
+    """ZK доказательство в формате ответа API (hex только здесь, внутри - сырые байты)"""
+    return {
+        'commitment': zk_proof.commitment.hex(),
+        'challenge': zk_proof.challenge.hex(),
+        'response': zk_proof.response.hex(),
+        'merkle_proof': [node.hex() for node in zk_proof.merkle_proof],
+        'merkle_root': zk_proof.merkle_root.hex(),
+        'timestamp': zk_proof.timestamp,
+        'epoch_id': zk_proof.epoch_id,
+        'leaf_index': zk_proof.leaf_index
+    }
+
+def transaction_to_dict(txn: Dict[str, Any]) -> Dict[str, Any]:
+    """Транзакция в формате JSON-ответа: data в hex"""
+    return {**txn, 'data': '0x' + txn['data'].hex()}
+
+async def build_bet_transaction(bet_request: BetRequest, zk_proof: ZKProof) -> Dict[str, Any]:
+    """Подготовка транзакции ставки для подписи игроком; data - сырые байты вызова"""
+    if not contract:
+        # Фиктивная транзакция для тестирования
+        txn = {
+            'to': '0x' + '0' * 40,
+            'value': int(bet_request.amount * 10**18),
+            'gas': 300000,
+            'gasPrice': 20000000000,
+            'nonce': 0,
+            'data': bet_request.number.to_bytes(32, byteorder='big')
+        }
+    else:
+        # В установившемся режиме nonce, цена газа и chain id берутся
+        # из локальных кешей; холодные запросы уходят в ноду одним пакетом
+        try:
+            nonce_tx, gas_price, chain_id = await asyncio.gather(
+                nonce_manager.next_nonce(bet_request.player_address),
+                gas_oracle.get(),
+                chain_client.chain_id()
+            )
+        except ChainError:
+            nonce_manager.resync(bet_request.player_address)
+            raise
+        
+        # ABI-кодирование вызова выполняется локально, без RPC; дайджесты
+        # доказательства уже сырые байты и передаются как есть
+        call_data = contract.encode_call_bytes('placeBet', [
+            bet_request.number,
+            zk_proof.commitment,
+            zk_proof.merkle_proof,
+            zk_proof.merkle_root
+        ])
+        txn = {
+            'from': bet_request.player_address,
+            'to': contract.address,
+            'value': to_wei(bet_request.amount),
+            'gas': 300000,
+            'gasPrice': gas_price,
+            'nonce': nonce_tx,
+            'chainId': chain_id,
+            'data': call_data
+        }
+    
+    return txn
+
+def publish_epoch_root(epoch):
+    """Публикация корня запечатанной эпохи"""
+    logger.info(
+        f"Эпоха {epoch.epoch_id} запечатана: root={epoch.root}, "
+        f"commitments={len(epoch.tree)}"
+    )
+
+async def periodic_epoch_sealing():
+    """Запечатывание эпох commitment'ов по истечении окна"""
+    while True:
+        try:
+            await asyncio.sleep(zk_system.epoch_duration)
+            zk_system.seal_epoch_if_due()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Epoch sealing error: {e}")
+
 # =============== ЭНДПОИНТЫ API ===============
 
 @app.post("/auth/player", response_model=Dict[str, str])
@@ -235,9 +654,13 @@ async def authenticate_player(auth_request: PlayerAuthRequest):
     """
     Аутентификация игрока через подпись кошелька
     """
+    ticket = await admit("auth", auth_request.wallet_address)
     try:
+        if not await check_rate_limit(auth_request.wallet_address, "auth"):
+            raise HTTPException(status_code=429, detail="Rate limit exceeded")
+        
         # Проверяем подпись
-        if not verify_player_signature(
+        if not await verify_player_signature(
             auth_request.wallet_address,
             auth_request.signature,
             auth_request.message
@@ -253,23 +676,78 @@ async def authenticate_player(auth_request: PlayerAuthRequest):
             "player_address": auth_request.wallet_address
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Authentication error: {e}")
         raise HTTPException(status_code=500, detail="Authentication failed")
+    finally:
+        ticket.release()
+
+@app.post("/auth/player/batch", response_model=List[Dict[str, str]])
+async def authenticate_players_batch(auth_requests: List[PlayerAuthRequest]):
+    """
+    Пакетная повторная аутентификация: один проход rate limiting
+    и одна пакетная проверка подписей
+    """
+    if len(auth_requests) > config.MAX_AUTH_BATCH:
+        raise HTTPException(status_code=413, detail=f"Максимум {config.MAX_AUTH_BATCH} запросов в пакете")
+    
+    # Пакет занимает одно место, как и одиночный запрос
+    ticket = await admit("auth")
+    try:
+        allowed = await rate_limiter.check_many_async(
+            [request.wallet_address for request in auth_requests], "auth"
+        )
+        to_verify = [request for request, ok in zip(auth_requests, allowed) if ok]
+        verified = iter(await signature_verifier.verify_many([
+            (request.wallet_address, request.message, request.signature)
+            for request in to_verify
+        ]))
+        
+        results = []
+        for request, ok in zip(auth_requests, allowed):
+            result = {"player_address": request.wallet_address}
+            if not ok:
+                result["status"] = "rate_limited"
+            elif not next(verified):
+                result["status"] = "invalid_signature"
+            else:
+                session = await get_player_session(request.wallet_address)
+                result["status"] = "authenticated"
+                result["session_id"] = session['session_id']
+            results.append(result)
+        
+        return results
+        
+    except Exception as e:
+        logger.error(f"Batch authentication error: {e}")
+        raise HTTPException(status_code=500, detail="Authentication failed")
+    finally:
+        ticket.release()
 
 @app.post("/bet/prepare", response_model=ZKProofResponse)
-async def prepare_bet(bet_request: BetRequest):
+async def prepare_bet(bet_request: BetRequest, accept: Optional[str] = Header(None)):
     """
-    Подготовка ставки с генерацией ZK доказательства
+    Подготовка ставки с генерацией ZK доказательства. С заголовком
+    Accept: application/x-zk-roulette ответ отдаётся в бинарном формате
+    (см. wire_format), иначе - в JSON
     """
+    ticket = await admit("bet", bet_request.player_address)
+    started = time.perf_counter()
     try:
         # Проверка rate limiting
-        if not await check_rate_limit(bet_request.player_address):
+        allowed = await check_rate_limit(bet_request.player_address)
+        t = time.perf_counter()
+        phase_rate_limit.observe(t - started)
+        if not allowed:
             raise HTTPException(status_code=429, detail="Rate limit exceeded")
         
         # Проверка блокировки игрока
-        player_stats = bayesian_analyzer.player_profiles.get(bet_request.player_address)
-        if player_stats and player_stats.risk_score > 0.8:
+        suspended = is_player_suspended(bet_request.player_address)
+        t, previous = time.perf_counter(), t
+        phase_risk.observe(t - previous)
+        if suspended:
             raise HTTPException(status_code=403, detail="Player temporarily suspended")
         
         # Генерация ZK commitment
@@ -277,6 +755,8 @@ async def prepare_bet(bet_request: BetRequest):
             bet_request.player_address,
             bet_request.number
         )
+        t, previous = time.perf_counter(), t
+        phase_commitment.observe(t - previous)
         
         # Генерация ZK доказательства
         zk_proof = zk_system.generate_zk_proof(
@@ -284,62 +764,135 @@ async def prepare_bet(bet_request: BetRequest):
             commitment_hash,
             secret_key
         )
+        t, previous = time.perf_counter(), t
+        phase_proof.observe(t - previous)
         
         # Подготовка транзакции
-        if not contract:
-            # Фиктивная транзакция для тестирования
-            txn = {
-                'to': '0x' + '0' * 40,
-                'value': int(bet_request.amount * 10**18),
-                'gas': 300000,
-                'gasPrice': 20000000000,
-                'nonce': 0,
-                'data': '0x' + bet_request.number.to_bytes(32, byteorder='big').hex()
-            }
-        else:
-            nonce_tx = w3.eth.get_transaction_count(bet_request.player_address)
-            
-            # Конвертируем ZK proof в формат для смарт-контракта
-            merkle_proof_bytes = [bytes.fromhex(proof[2:]) if proof.startswith('0x') else bytes.fromhex(proof) 
-                                 for proof in zk_proof.merkle_proof]
-            
-            txn = contract.functions.placeBet(
-                bet_request.number,
-                bytes.fromhex(zk_proof.commitment[2:] if zk_proof.commitment.startswith('0x') 
-                             else zk_proof.commitment),
-                merkle_proof_bytes,
-                bytes.fromhex(zk_proof.merkle_root[2:] if zk_proof.merkle_root.startswith('0x') 
-                             else zk_proof.merkle_root)
-            ).build_transaction({
-                'from': bet_request.player_address,
-                'value': w3.to_wei(bet_request.amount, 'ether'),
-                'gas': 300000,
-                'gasPrice': w3.eth.gas_price,
-                'nonce': nonce_tx,
-            })
+        txn = await build_bet_transaction(bet_request, zk_proof)
+        t, previous = time.perf_counter(), t
+        phase_transaction.observe(t - previous)
         
         # Получаем сессию игрока
-        session = await get_player_session(bet_request.player_address)
-        session['bets_count'] += 1
+        session = await get_player_session(bet_request.player_address, new_bets=1)
+        t, previous = time.perf_counter(), t
+        phase_session.observe(t - previous)
+        bet_prepare_seconds.observe(t - started)
         
+        if accepts_binary(accept):
+            return Response(
+                content=encode_bet_record(0, zk_proof, txn, session['session_id']),
+                media_type=WIRE_MEDIA_TYPE
+            )
         return ZKProofResponse(
-            zk_proof={
-                'commitment': zk_proof.commitment,
-                'challenge': zk_proof.challenge,
-                'response': zk_proof.response,
-                'merkle_proof': zk_proof.merkle_proof,
-                'merkle_root': zk_proof.merkle_root,
-                'timestamp': zk_proof.timestamp
-            },
-            transaction_data=txn,
+            zk_proof=zk_proof_to_dict(zk_proof),
+            transaction_data=transaction_to_dict(txn),
             session_id=session['session_id']
         )
         
     except HTTPException:
         raise
+    except ChainError as e:
+        logger.error(f"Bet preparation chain error: {e}")
+        raise HTTPException(status_code=503, detail="Blockchain node unavailable")
     except Exception as e:
         logger.error(f"Bet preparation error: {e}")
         raise HTTPException(status_code=500, detail="Bet preparation failed")
+    finally:
+        ticket.release()
+
+@app.post("/bet/prepare/batch")
+async def prepare_bets_batch(batch_request: BetBatchRequest, accept: Optional[str] = Header(None)):
+    """
+    Пакетная подготовка ставок: один проход rate limiting, commitment'ы
+    всего пакета под одним корнем Merkle и потоковая отдача ответов
+    в NDJSON по мере готовности транзакций. Каждая строка содержит
+    index ставки в пакете и status, как у /bet/prepare. С Accept:
+    application/x-zk-roulette вместо строк NDJSON идут бинарные записи.
+    """
+    bets = batch_request.bets
+    if len(bets) > config.MAX_BET_BATCH:
+        raise HTTPException(status_code=413, detail=f"Максимум {config.MAX_BET_BATCH} ставок в пакете")
+    
+    # Место занято до конца потоковой отдачи: транзакции строятся в stream()
+    ticket = await admit("bet")
+    started = time.perf_counter()
+    try:
+        allowed = await rate_limiter.check_many_async([bet.player_address for bet in bets], "bet")
+        
+        rejected: Dict[int, Tuple[int, str]] = {}
+        accepted: List[int] = []
+        for index, (bet, ok) in enumerate(zip(bets, allowed)):
+            if not ok:
+                rejected[index] = (429, "Rate limit exceeded")
+            elif is_player_suspended(bet.player_address):
+                rejected[index] = (403, "Player temporarily suspended")
+            else:
+                accepted.append(index)
+        
+        commitments = zk_system.generate_player_commitments_batch([
+            (bets[index].player_address, bets[index].number) for index in accepted
+        ])
+        zk_proofs = zk_system.generate_zk_proofs_batch([
+            (bets[index].player_address, commitment_hash, secret_key)
+            for index, (_, commitment_hash, secret_key) in zip(accepted, commitments)
+        ])
+        
+        # Одна запись сессии на адрес, а не на ставку
+        bets_per_player = Counter(bets[index].player_address for index in accepted)
+        sessions = {
+            address: await get_player_session(address, new_bets=count)
+            for address, count in bets_per_player.items()
+        }
+        bet_batch_seconds.observe(time.perf_counter() - started)
+    except Exception as e:
+        ticket.release()
+        logger.error(f"Batch bet preparation error: {e}")
+        raise HTTPException(status_code=500, detail="Bet preparation failed")
+    
+    binary = accepts_binary(accept)
+    
+    def encode_line(index: int, status: int, detail: str) -> bytes:
+        if binary:
+            return encode_error_record(index, status, detail)
+        return (json.dumps({"index": index, "status": status, "detail": detail}) + "\n").encode()
+    
+    async def prepare_one(index: int, zk_proof: ZKProof) -> bytes:
+        bet = bets[index]
+        try:
+            txn = await build_bet_transaction(bet, zk_proof)
+        except ChainError as e:
+            logger.error(f"Bet preparation chain error: {e}")
+            return encode_line(index, 503, "Blockchain node unavailable")
+        except Exception as e:
+            logger.error(f"Bet preparation error: {e}")
+            return encode_line(index, 500, "Bet preparation failed")
+        
+        session_id = sessions[bet.player_address]['session_id']
+        if binary:
+            return encode_bet_record(index, zk_proof, txn, session_id)
+        response = ZKProofResponse(
+            zk_proof=zk_proof_to_dict(zk_proof),
+            transaction_data=transaction_to_dict(txn),
+            session_id=session_id
+        )
+        return (json.dumps({"index": index, "status": 200, "result": response.model_dump()}) + "\n").encode()
+    
+    async def stream():
+        try:
+            for index, (status, detail) in rejected.items():
+                yield encode_line(index, status, detail)
+            
+            pending = [prepare_one(index, zk_proof) for index, zk_proof in zip(accepted, zk_proofs)]
+            for ready in asyncio.as_completed(pending):
+                yield await ready
+        finally:
+            ticket.release()
+    
+    # Фоновая задача освобождает место, если поток так и не был запущен
+    return StreamingResponse(
+        stream(), media_type=WIRE_MEDIA_TYPE if binary else "application/x-ndjson",
+        background=BackgroundTask(ticket.release)
+    )
 
 @app.get("/health")
 async def health_check():
@@ -348,16 +901,213 @@ async def health_check():
         "status": "healthy",
         "version": "2.0.0",
         "timestamp": datetime.now().isoformat(),
-        "web3_connected": w3.is_connected() if w3 else False,
+        "web3_connected": chain_health.connected,
+        "chain": chain_health.status,
         "contract_loaded": contract is not None
     }
 
+@app.get("/health/live")
+async def liveness():
+    """Liveness: процесс жив и event loop отвечает"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness: состояние восстановлено, контракт загружен и нода доступна"""
+    checks = readiness_checks()
+    ready = all(checks.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "starting",
+            "checks": checks,
+            "startup_seconds": startup_status["startup_seconds"],
+            "chain": chain_health.status
+        }
+    )
+
+@app.post("/spins", dependencies=[Depends(verify_admin_token)])
+async def ingest_spins(batch_request: SpinBatchRequest):
+    """
+    Приём результатов вращений колеса: обновляет апостериорные
+    распределения чисел и последовательные тесты на смещение колеса
+    """
+    spins = batch_request.spins
+    if len(spins) > config.MAX_SPIN_BATCH:
+        raise HTTPException(status_code=413, detail=f"Максимум {config.MAX_SPIN_BATCH} вращений в пакете")
+    
+    now = time.time()
+    events = wheel_monitor.ingest_many(
+        [spin.number for spin in spins],
+        [now if spin.timestamp is None else spin.timestamp for spin in spins]
+    )
+    return {
+        "accepted": len(spins),
+        "events": [
+            {
+                "event_type": event.event_type,
+                "severity": event.severity,
+                "description": event.description,
+                "probability_score": event.probability_score,
+                "timestamp": event.timestamp.isoformat()
+            }
+            for event in events
+        ],
+        "monitor": wheel_monitor.get_stats()
+    }
+
+@app.get("/spins/stats")
+async def spin_stats():
+    """Состояние детектора смещения колеса"""
+    return wheel_monitor.get_stats()
+
+@app.get("/analytics", response_model=AnalyticsResponse)
+async def get_analytics(if_none_match: Optional[str] = Header(None)):
+    """Сводная аналитика по инкрементальным итогам анализатора; поддерживает If-None-Match"""
+    health = {
+        "web3_connected": chain_health.connected,
+        "contract_loaded": contract is not None,
+        "indexer_enabled": event_indexer is not None
+    }
+    
+    def build() -> AnalyticsResponse:
+        summary = bayesian_analyzer.analytics_summary()
+        return AnalyticsResponse(
+            total_players=summary["total_players"],
+            total_spins=summary["total_spins"],
+            house_edge_actual=summary["house_edge_actual"],
+            high_risk_players=summary["high_risk_players"],
+            recent_suspicious_events=summary["recent_suspicious_events"],
+            top_numbers=summary["top_numbers"],
+            system_health={**health, "blacklisted_players": summary["blacklisted_players"]}
+        )
+    
+    version = bayesian_analyzer.analytics_version() + tuple(health.values())
+    return cached_json_response("analytics", version, build, if_none_match)
+
+@app.get("/stats/{number}", response_model=BayesianStatsResponse)
+async def get_number_stats(number: int, if_none_match: Optional[str] = Header(None)):
+    """Апостериорное распределение вероятности числа; поддерживает If-None-Match"""
+    if not 0 <= number <= 36:
+        raise HTTPException(status_code=400, detail="Номер должен быть от 0 до 36")
+    
+    def build() -> BayesianStatsResponse:
+        distribution = bayesian_analyzer.get_bayesian_probability_distribution(number)
+        expected = 1 / 37
+        width = distribution["ci_95_upper"] - distribution["ci_95_lower"]
+        return BayesianStatsResponse(
+            number=number,
+            probability=distribution["mean"],
+            # Уверенность растёт по мере сужения 95% интервала относительно честной вероятности
+            confidence=max(0.0, 1.0 - width / expected),
+            confidence_interval_95=[distribution["ci_95_lower"], distribution["ci_95_upper"]],
+            confidence_interval_99=[distribution["ci_99_lower"], distribution["ci_99_upper"]],
+            total_observations=int(distribution["observations"]),
+            deviation_score=(distribution["mean"] - expected) / distribution["variance"] ** 0.5
+        )
+    
+    return cached_json_response(f"stats/{number}", bayesian_analyzer.posterior_version, build, if_none_match)
+
+@app.get("/live/sse")
+async def live_sse():
+    """Live-лента в формате Server-Sent Events: снимок состояния, затем кадры обновлений"""
+    subscriber = live_feed.subscribe()
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Достигнут лимит подписчиков live-ленты")
+    
+    async def stream():
+        try:
+            yield b"data: %s\n\n" % live_feed.hello()
+            async for frame in subscriber.frames(config.LIVE_HEARTBEAT):
+                yield b": ping\n\n" if frame is None else frame.sse
+        finally:
+            live_feed.unsubscribe(subscriber)
+    
+    # Фоновая задача снимает подписку, если поток так и не был запущен (клиент ушёл до первого кадра)
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(live_feed.unsubscribe, subscriber)
+    )
+
+@app.websocket("/live/ws")
+async def live_ws(websocket: WebSocket):
+    """Live-лента через WebSocket; кадры - JSON в бинарных сообщениях (без перекодирования на клиента)"""
+    await websocket.accept()
+    subscriber = live_feed.subscribe()
+    if subscriber is None:
+        await websocket.close(code=1013)
+        return
+    
+    async def drain():
+        # Входящие сообщения не нужны, но без чтения не заметить закрытие клиентом
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+        subscriber.close()
+    
+    reader = asyncio.create_task(drain())
+    try:
+        await websocket.send_bytes(live_feed.hello())
+        async for frame in subscriber.frames():
+            await websocket.send_bytes(frame.data)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        reader.cancel()
+        live_feed.unsubscribe(subscriber)
+
+@app.get("/live/stats")
+async def live_stats():
+    """Состояние live-ленты: подписчики, кадры, отброшенные кадры"""
+    return live_feed.get_stats()
+
+@app.get("/risk/stats")
+async def risk_stats():
+    """Состояние пересчёта оценок риска"""
+    return risk_engine.get_stats()
+
+@app.get("/admission/stats")
+async def admission_stats():
+    """Контроль допуска: лимиты, занятые места, очередь и отказы по маршрутам"""
+    return admission.get_stats()
+
+@app.get("/indexer/stats")
+async def indexer_stats():
+    """Состояние индексатора событий контракта"""
+    if event_indexer is None:
+        raise HTTPException(status_code=404, detail="Индексатор событий выключен")
+    return event_indexer.get_stats()
+
+async def refresh_state_counts():
+    """Считает записи хранилища состояния вне event loop; недоступное значение - NaN"""
+    for name, method, args in (
+        ("sessions", state_store.count, ("sessions",)),
+        ("rate_limit_keys", len, (rate_limiter,))
+    ):
+        try:
+            state_counts[name] = await state_store.call(method, *args)
+        except Exception as e:
+            logger.warning(f"Не удалось посчитать {name} для метрик: {e}")
+            state_counts[name] = float("nan")
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Метрики в текстовом формате Prometheus"""
+    await refresh_state_counts()
+    return PlainTextResponse(
+        metrics_registry.render(),
+        media_type="text/plain; version=0.0.4"
+    )
+
 if __name__ == "__main__":
     import uvicorn
+    if config.WORKERS > 1 and not shared_state:
+        logger.warning("WORKERS > 1 с STATE_BACKEND=memory: лимиты и сессии не будут общими")
     uvicorn.run(
         "main_v2:app",
-        host="localhost",
-        port=8000,
-        reload=True,
+        host=config.HOST,
+        port=config.PORT,
+        workers=config.WORKERS,
         log_level="info"
     ) 
\ No newline at end of file
@@ -0,0 +1,155 @@
+# blockchain_roulette/backend/metrics.py
+# Метрики в формате Prometheus: гистограммы с фиксированными корзинами, gauge и счётчики
+
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Корзины задержек в секундах: от 50 мкс до 5 с
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными корзинами. observe - это bisect по
+    кортежу границ и инкремент счётчика в списке: без блокировок
+    (код выполняется в одном event loop) и без выделения памяти.
+    """
+    __slots__ = ("bounds", "counts", "sum", "labels")
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS, labels: Tuple[Tuple[str, str], ...] = ()):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.labels = labels
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def render(self, name: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(self.labels, ('le', repr(bound)))} {cumulative}")
+        cumulative += self.counts[-1]
+        lines.append(f"{name}_bucket{_format_labels(self.labels, ('le', '+Inf'))} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(self.labels)} {self.sum}")
+        lines.append(f"{name}_count{_format_labels(self.labels)} {cumulative}")
+        return lines
+
+
+class HistogramFamily:
+    """Набор гистограмм одной метрики с заранее известными значениями метки"""
+
+    def __init__(self, name: str, help_text: str, label: str, values: Sequence[str],
+                 bounds: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.children: Dict[str, Histogram] = {
+            value: Histogram(bounds, ((label, value),)) for value in values
+        }
+
+    def __getitem__(self, value: str) -> Histogram:
+        return self.children[value]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for child in self.children.values():
+            lines += child.render(self.name)
+        return lines
+
+
+class Gauge:
+    """Gauge, значение которого вычисляется только при сборе метрик"""
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, fn: Callable[[], float]):
+        self.name = name
+        self.help_text = help_text
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            lines.append(f"{self.name} {float(self.fn())}")
+        except Exception:
+            lines.append(f"{self.name} NaN")
+        return lines
+
+
+class Counter(Gauge):
+    """
+    Счётчик: монотонно растущий итог, который уже ведёт сам компонент
+    (значение тоже читается при сборе). Имя по соглашению Prometheus
+    оканчивается на _total
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, fn: Callable[[], float]):
+        if not name.endswith("_total"):
+            raise ValueError(f"Имя счётчика должно оканчиваться на _total: {name}")
+        super().__init__(name, help_text, fn)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[object] = []
+
+    def histogram(self, name: str, help_text: str, bounds: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        histogram = Histogram(bounds)
+        family = _SingleHistogram(name, help_text, histogram)
+        self._metrics.append(family)
+        return histogram
+
+    def histogram_family(self, name: str, help_text: str, label: str, values: Sequence[str],
+                         bounds: Sequence[float] = LATENCY_BUCKETS) -> HistogramFamily:
+        family = HistogramFamily(name, help_text, label, values, bounds)
+        self._metrics.append(family)
+        return family
+
+    def gauge(self, name: str, help_text: str, fn: Callable[[], float]) -> Gauge:
+        gauge = Gauge(name, help_text, fn)
+        self._metrics.append(gauge)
+        return gauge
+
+    def counter(self, name: str, help_text: str, fn: Callable[[], float]) -> Counter:
+        counter = Counter(name, help_text, fn)
+        self._metrics.append(counter)
+        return counter
+
+    def render(self) -> str:
+        """Текстовый формат экспозиции Prometheus 0.0.4"""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+class _SingleHistogram:
+    def __init__(self, name: str, help_text: str, histogram: Histogram):
+        self.name = name
+        self.help_text = help_text
+        self.histogram = histogram
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"] + \
+            self.histogram.render(self.name)
+
+
+# Глобальный реестр метрик
+metrics_registry = MetricsRegistry()
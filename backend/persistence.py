@@ -0,0 +1,631 @@
+# blockchain_roulette/backend/persistence.py
+# Журнал упреждающей записи (WAL) и снапшоты состояния анализатора и ZK системы
+
+import asyncio
+import fcntl
+import gc
+import json
+import logging
+import os
+import pickle
+import shutil
+import struct
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from bayesian_analyzer import BayesianAnalyzer, PlayerProfile, PlayerProfileStore
+from zk_system import CommitmentEpoch, ZKCommitment, ZKSystem
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+# Типы записей WAL
+REC_COMMITMENT = 1
+REC_EPOCH_SEALED = 2
+REC_PROFILES = 3
+REC_PROFILE_PUT = 4
+REC_BLACKLIST = 5
+REC_SPINS = 6
+
+_HEADER = struct.Struct("<IBI")  # длина payload, тип, crc32 payload
+_STR_LEN = struct.Struct("<H")
+_COMMITMENT = struct.Struct("<BdI32s")  # число, timestamp, эпоха, хеш
+_SEAL = struct.Struct("<Id")
+_PROFILES = struct.Struct("<I?I")  # число ставок, время на каждую ставку, длина адресов
+_SINGLE_BET = struct.Struct("<d?dd")  # сумма, выигрыш, выплата, время
+_BLACKLIST = struct.Struct("<?")
+_SPINS = struct.Struct("<37I")
+
+
+def _pack_str(value: str) -> bytes:
+    data = value.encode()
+    return _STR_LEN.pack(len(data)) + data
+
+
+def _unpack_str(buffer: memoryview, offset: int) -> Tuple[str, int]:
+    (length,) = _STR_LEN.unpack_from(buffer, offset)
+    offset += _STR_LEN.size
+    return bytes(buffer[offset:offset + length]).decode(), offset + length
+
+
+class WriteAheadLog:
+    """
+    Сегментированный append-only журнал: файлы wal-<seq>.log.
+
+    Запись кадра - это только дописывание в буфер в памяти. Буфер
+    сбрасывается в файл фоновым потоком-писателем (один поток, поэтому
+    порядок записей сохраняется и при смене сегмента). Кадр: длина,
+    тип, crc32 и payload; оборванный при аварии хвост отбрасывается
+    при чтении.
+    """
+
+    def __init__(self, directory: str, fsync: bool = False):
+        self.directory = directory
+        self.fsync = fsync
+        self.seq: Optional[int] = None
+        self.records = 0
+        self.bytes = 0
+        self._buffer = bytearray()
+        self._file = None
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wal-writer")
+
+    def segment_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"wal-{seq:08d}.log")
+
+    def segments(self) -> List[int]:
+        return sorted(
+            int(name[4:-4]) for name in os.listdir(self.directory)
+            if name.startswith("wal-") and name.endswith(".log")
+        )
+
+    def open(self, seq: int):
+        """Начинает новый сегмент; всё записанное раньше уходит в предыдущий"""
+        self.flush()
+        if self._file is not None:
+            self._writer.submit(self._file.close)
+        self._file = open(self.segment_path(seq), "ab")
+        self.seq = seq
+
+    def append(self, record_type: int, payload: bytes):
+        self._buffer += _HEADER.pack(len(payload), record_type, zlib.crc32(payload))
+        self._buffer += payload
+        self.records += 1
+        self.bytes += _HEADER.size + len(payload)
+
+    def _write(self, file, data: bytes):
+        file.write(data)
+        file.flush()
+        if self.fsync:
+            os.fsync(file.fileno())
+
+    def flush(self) -> Optional[Future]:
+        """Передаёт накопленный буфер писателю"""
+        if not self._buffer or self._file is None:
+            return None
+        data, self._buffer = bytes(self._buffer), bytearray()
+        return self._writer.submit(self._write, self._file, data)
+
+    async def flush_async(self):
+        future = self.flush()
+        if future is not None:
+            await asyncio.wrap_future(future)
+
+    def rotate(self) -> int:
+        self.open(self.seq + 1)
+        return self.seq
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._writer.submit(self._file.close)
+            self._file = None
+        self._writer.shutdown(wait=True)
+
+    @staticmethod
+    def read(path: str) -> Iterator[Tuple[int, memoryview]]:
+        """Записи сегмента; чтение останавливается на повреждённом кадре"""
+        with open(path, "rb") as f:
+            data = memoryview(f.read())
+        offset = 0
+        while offset + _HEADER.size <= len(data):
+            length, record_type, checksum = _HEADER.unpack_from(data, offset)
+            start = offset + _HEADER.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                logger.warning(f"WAL {path}: повреждённый хвост с позиции {offset}, пропущено {len(data) - offset} байт")
+                return
+            yield record_type, payload
+            offset = start + length
+
+
+class PersistenceManager:
+    """
+    Сохранение состояния bayesian_analyzer и zk_system между перезапусками.
+
+    Изменения пишутся в WAL через журнальные хуки модулей (атрибут journal
+    и epoch_listeners), а периодическая компакция сохраняет снапшот и
+    удаляет покрытые им сегменты. Снапшот - каталог .npy файлов, поэтому
+    при старте колонки профилей отображаются в память (mmap, copy-on-write)
+    вместо чтения и разбора.
+
+    Компакция не блокирует обработку запросов: на event loop выполняются
+    только смена сегмента WAL и заморозка хранилищ (без копирования),
+    копирование, сериализация и запись на диск идут в отдельном потоке.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        zk: ZKSystem,
+        analyzer: BayesianAnalyzer,
+        snapshot_interval: float = 300.0,
+        compact_after_bytes: int = 64 * 1024 * 1024,
+        flush_interval: float = 0.05,
+        fsync: bool = False,
+        commitment_max_age: float = 600.0
+    ):
+        self.directory = directory
+        self.zk = zk
+        self.analyzer = analyzer
+        self.snapshot_interval = snapshot_interval
+        self.compact_after_bytes = compact_after_bytes
+        self.flush_interval = flush_interval
+        self.commitment_max_age = commitment_max_age
+        self.wal = WriteAheadLog(directory, fsync)
+
+        self.last_snapshot_seq: Optional[int] = None
+        self.last_snapshot_at = 0.0
+        self.last_snapshot_seconds = 0.0
+        self._snapshot_records = 0
+        self._snapshot_bytes = 0
+        self._lock_file = None
+        self._snapshot_lock = asyncio.Lock()
+        self._tasks: List[asyncio.Task] = []
+
+    # =============== ЖУРНАЛ ===============
+
+    def commitment(self, commitment_id: str, commitment: ZKCommitment, epoch_id: int):
+        self.wal.append(REC_COMMITMENT, b"".join((
+            _pack_str(commitment_id),
+            _pack_str(commitment.player_address),
+            _pack_str(commitment.nonce),
+            _COMMITMENT.pack(commitment.number, commitment.timestamp, epoch_id, commitment.digest)
+        )))
+
+    def epoch_sealed(self, epoch: CommitmentEpoch):
+        self.wal.append(REC_EPOCH_SEALED, _SEAL.pack(epoch.epoch_id, epoch.sealed_at))
+
+    def profiles(self, addresses: Sequence[str], amounts: Sequence[float], won: Sequence[bool],
+                 payouts: Sequence[float], timestamps):
+        if len(addresses) == 1 and not np.ndim(timestamps):
+            # Одиночная ставка: тот же формат без промежуточных массивов
+            address = addresses[0].encode()
+            self.wal.append(REC_PROFILES, _PROFILES.pack(1, False, len(address)) + address + _SINGLE_BET.pack(
+                amounts[0], bool(won[0]), payouts[0], timestamps
+            ))
+            return
+        per_bet = bool(np.ndim(timestamps))
+        joined = "\0".join(addresses).encode()
+        self.wal.append(REC_PROFILES, b"".join((
+            _PROFILES.pack(len(addresses), per_bet, len(joined)),
+            joined,
+            np.asarray(amounts, dtype="<f8").tobytes(),
+            np.asarray(won, dtype=np.uint8).tobytes(),
+            np.asarray(payouts, dtype="<f8").tobytes(),
+            np.asarray(timestamps, dtype="<f8").reshape(-1).tobytes()
+        )))
+
+    def profile_put(self, address: str, profile: PlayerProfile):
+        self.wal.append(REC_PROFILE_PUT, pickle.dumps(profile))
+
+    def blacklist(self, address: str, blacklisted: bool):
+        self.wal.append(REC_BLACKLIST, _BLACKLIST.pack(blacklisted) + address.encode())
+
+    def spins(self, counts: np.ndarray):
+        self.wal.append(REC_SPINS, _SPINS.pack(*(int(count) for count in counts)))
+
+    def attach(self):
+        self.zk.journal = self
+        self.analyzer.journal = self
+        self.analyzer.player_profiles.journal = self
+        if self.epoch_sealed not in self.zk.epoch_listeners:
+            self.zk.epoch_listeners.append(self.epoch_sealed)
+
+    def detach(self):
+        self.zk.journal = None
+        self.analyzer.journal = None
+        self.analyzer.player_profiles.journal = None
+        if self.epoch_sealed in self.zk.epoch_listeners:
+            self.zk.epoch_listeners.remove(self.epoch_sealed)
+
+    # =============== ВОССТАНОВЛЕНИЕ ===============
+
+    def acquire_lock(self) -> bool:
+        """Каталог может использовать только один процесс (один воркер)"""
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_file = open(os.path.join(self.directory, "LOCK"), "w")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._lock_file.close()
+            self._lock_file = None
+            return False
+        return True
+
+    def _snapshots(self) -> List[int]:
+        return sorted(
+            int(name[9:]) for name in os.listdir(self.directory)
+            if name.startswith("snapshot-") and not name.endswith(".tmp")
+        )
+
+    def _snapshot_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"snapshot-{seq:08d}")
+
+    def restore(self) -> Dict[str, Any]:
+        """
+        Загружает последний снапшот и проигрывает WAL после него,
+        затем открывает новый сегмент и подключает журнал.
+        """
+        started = time.perf_counter()
+        self.detach()
+
+        # Массовое создание объектов: без сборщика мусора, который иначе
+        # многократно обходит миллионы только что созданных объектов
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            snapshots = self._snapshots()
+            snapshot_seq = snapshots[-1] if snapshots else None
+            if snapshot_seq is not None:
+                self._load_snapshot(self._snapshot_path(snapshot_seq))
+                self.last_snapshot_seq = snapshot_seq
+            snapshot_seconds = time.perf_counter() - started
+
+            replayed = 0
+            segments = [seq for seq in self.wal.segments() if snapshot_seq is None or seq >= snapshot_seq]
+            for seq in segments:
+                replayed += self._replay_segment(self.wal.segment_path(seq))
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        # Дописывать в старый сегмент нельзя: его хвост мог оборваться
+        next_seq = max(segments + [snapshot_seq if snapshot_seq is not None else -1]) + 1
+        self.wal.open(next_seq)
+        self.attach()
+
+        stats = {
+            "snapshot": snapshot_seq,
+            "wal_segments": len(segments),
+            "wal_records": replayed,
+            "snapshot_seconds": snapshot_seconds,
+            "profiles": len(self.analyzer.player_profiles),
+            "commitments": len(self.zk.commitment_storage),
+            "seconds": time.perf_counter() - started
+        }
+        return stats
+
+    def _load_snapshot(self, path: str):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Неподдерживаемая версия снапшота: {meta.get('version')}")
+
+        analyzer = self.analyzer
+        analyzer.alpha_params[:] = meta["alpha"]
+        analyzer.beta_params[:] = meta["beta"]
+        analyzer._stale_intervals[:] = True
+        analyzer.number_frequencies.update({int(k): v for k, v in meta["frequencies"].items()})
+        analyzer.total_spins = sum(analyzer.number_frequencies.values())
+        analyzer.posterior_version += 1
+        with open(os.path.join(path, "events.pkl"), "rb") as f:
+            analyzer.add_suspicious_events(pickle.load(f))
+
+        # Колонки профилей отображаются в память; страницы копируются при записи
+        columns = {
+            name: np.load(os.path.join(path, f"profile_{name}.npy"), mmap_mode="c")
+            for name in PlayerProfileStore._COLUMNS
+        }
+        # Адреса не раскладываются в словарь: поиск идёт по отсортированной копии
+        addresses = np.load(os.path.join(path, "profile_addresses.npy"), mmap_mode="r")
+        sorted_addresses = np.load(os.path.join(path, "profile_sorted.npy"), mmap_mode="r")
+        order = np.load(os.path.join(path, "profile_order.npy"), mmap_mode="r")
+        with open(os.path.join(path, "profile_patterns.pkl"), "rb") as f:
+            patterns = pickle.load(f)
+        analyzer.player_profiles = PlayerProfileStore.from_columns(
+            addresses, sorted_addresses, order, columns, patterns
+        )
+
+        self._load_zk(path, meta)
+
+    def _load_zk(self, path: str, meta: Dict[str, Any]):
+        zk = self.zk
+        timestamps = np.load(os.path.join(path, "commitment_timestamps.npy"))
+        # Истёкшие commitment'ы всё равно были бы удалены очисткой
+        live = np.flatnonzero(timestamps >= time.time() - self.commitment_max_age)
+        if live.size:
+            ids = np.load(os.path.join(path, "commitment_ids.npy"), mmap_mode="r")[live].tolist()
+            players = np.load(os.path.join(path, "commitment_players.npy"), mmap_mode="r")[live].tolist()
+            nonces = np.load(os.path.join(path, "commitment_nonces.npy"), mmap_mode="r")[live].tolist()
+            numbers = np.load(os.path.join(path, "commitment_numbers.npy"), mmap_mode="r")[live].tolist()
+            hashes = np.load(os.path.join(path, "commitment_hashes.npy"), mmap_mode="r")[live]
+            digests = hashes.tobytes()
+            zk.commitment_storage.load(
+                (commitment_id, ZKCommitment.restore(player, number, nonce, timestamp, digests[32 * i:32 * (i + 1)]))
+                for i, (commitment_id, player, nonce, number, timestamp)
+                in enumerate(zip(ids, players, nonces, numbers, timestamps[live].tolist()))
+            )
+        zk.commitment_storage.evicted = meta["evicted"]
+
+        epochs = np.load(os.path.join(path, "epochs.npy"))
+        roots = np.load(os.path.join(path, "epoch_roots.npy"))
+        leaves = np.load(os.path.join(path, "epoch_leaves.npy"), mmap_mode="r").tobytes()
+        for epoch, root in zip(epochs, roots):
+            offset, length = int(epoch["offset"]), int(epoch["length"])
+            sealed_at = float(epoch["sealed_at"])
+            zk.restore_epoch(
+                int(epoch["epoch_id"]),
+                float(epoch["started_at"]),
+                None if np.isnan(sealed_at) else sealed_at,
+                root.tobytes().hex() if not np.isnan(sealed_at) else "",
+                [leaves[32 * i:32 * (i + 1)] for i in range(offset, offset + length)]
+            )
+
+    def _replay_segment(self, path: str) -> int:
+        zk = self.zk
+        analyzer = self.analyzer
+        # Подряд идущие обновления профилей применяются одним update_batch
+        addresses: List[str] = []
+        amounts: List[float] = []
+        won: List[bool] = []
+        payouts: List[float] = []
+        timestamps: List[float] = []
+
+        def apply_profiles():
+            if not addresses:
+                return
+            analyzer.player_profiles.update_batch(
+                addresses, np.array(amounts), np.array(won, dtype=bool), np.array(payouts), np.array(timestamps)
+            )
+            for values in (addresses, amounts, won, payouts, timestamps):
+                values.clear()
+
+        records = 0
+        for record_type, payload in WriteAheadLog.read(path):
+            records += 1
+            if record_type == REC_PROFILES:
+                count, per_bet, joined_length = _PROFILES.unpack_from(payload)
+                offset = _PROFILES.size
+                if count == 1 and not per_bet:
+                    addresses.append(bytes(payload[offset:offset + joined_length]).decode())
+                    amount, bet_won, payout, timestamp = _SINGLE_BET.unpack_from(payload, offset + joined_length)
+                    amounts.append(amount)
+                    won.append(bet_won)
+                    payouts.append(payout)
+                    timestamps.append(timestamp)
+                    continue
+                addresses.extend(bytes(payload[offset:offset + joined_length]).decode().split("\0"))
+                offset += joined_length
+                amounts.extend(np.frombuffer(payload, "<f8", count, offset).tolist())
+                won.extend(np.frombuffer(payload, np.uint8, count, offset + 8 * count).astype(bool).tolist())
+                payouts.extend(np.frombuffer(payload, "<f8", count, offset + 9 * count).tolist())
+                batch_timestamps = np.frombuffer(payload, "<f8", count if per_bet else 1, offset + 17 * count).tolist()
+                timestamps.extend(batch_timestamps if per_bet else batch_timestamps * count)
+            elif record_type == REC_COMMITMENT:
+                commitment_id, offset = _unpack_str(payload, 0)
+                player, offset = _unpack_str(payload, offset)
+                nonce, offset = _unpack_str(payload, offset)
+                number, timestamp, epoch_id, digest = _COMMITMENT.unpack_from(payload, offset)
+                zk.restore_commitment(
+                    commitment_id,
+                    ZKCommitment.restore(player, number, nonce, timestamp, digest),
+                    epoch_id
+                )
+            elif record_type == REC_EPOCH_SEALED:
+                zk.restore_seal(*_SEAL.unpack_from(payload))
+            elif record_type == REC_SPINS:
+                analyzer.record_spins(_SPINS.unpack_from(payload))
+            elif record_type == REC_PROFILE_PUT:
+                apply_profiles()
+                profile = pickle.loads(payload)
+                analyzer.player_profiles[profile.address] = profile
+            elif record_type == REC_BLACKLIST:
+                apply_profiles()
+                (blacklisted,) = _BLACKLIST.unpack_from(payload)
+                analyzer.player_profiles.set_blacklisted(bytes(payload[_BLACKLIST.size:]).decode(), blacklisted)
+            else:
+                logger.warning(f"WAL {path}: неизвестный тип записи {record_type}")
+        apply_profiles()
+        return records
+
+    # =============== СНАПШОТЫ ===============
+
+    def _capture(self) -> Dict[str, Any]:
+        """
+        Состояние на момент смены сегмента; выполняется на event loop и не
+        копирует большие структуры: профили и commitment'ы замораживаются,
+        от листьев эпох берётся длина (листья только дописываются).
+        Копии снимает _export в потоке, после чего _release размораживает хранилища
+        """
+        analyzer = self.analyzer
+        zk = self.zk
+        epochs = list(zk.sealed_epochs.values()) + [zk.current_epoch]
+        return {
+            "alpha": analyzer.alpha_params.tolist(),
+            "beta": analyzer.beta_params.tolist(),
+            "frequencies": dict(analyzer.number_frequencies),
+            "events": list(analyzer.suspicious_events),
+            "profiles": analyzer.player_profiles.freeze(),
+            "commitments": zk.commitment_storage.freeze(),
+            "evicted": zk.commitment_storage.evicted,
+            "epochs": [
+                (epoch.epoch_id, epoch.started_at, epoch.sealed_at, epoch.root,
+                 epoch.tree.levels[0], len(epoch.tree.levels[0]))
+                for epoch in epochs
+            ],
+        }
+
+    @staticmethod
+    def _export(state: Dict[str, Any]):
+        """Копирует замороженное состояние (в потоке снапшота)"""
+        state["profiles"] = state["profiles"].export()
+        state["commitments"] = list(state["commitments"].items())
+        state["epochs"] = [
+            (epoch_id, started_at, sealed_at, root, leaves[:length])
+            for epoch_id, started_at, sealed_at, root, leaves, length in state["epochs"]
+        ]
+
+    def _release(self):
+        self.analyzer.player_profiles.thaw()
+        self.zk.commitment_storage.thaw()
+
+    def _write_snapshot(self, seq: int, state: Dict[str, Any]):
+        final_path = self._snapshot_path(seq)
+        path = final_path + ".tmp"
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+
+        profiles = state["profiles"]
+        for name, column in profiles["columns"].items():
+            np.save(os.path.join(path, f"profile_{name}.npy"), column)
+        addresses = profiles["base_addresses"]
+        if profiles["addresses"]:
+            addresses = np.concatenate([addresses, np.array([a.encode() for a in profiles["addresses"]])])
+        order = np.argsort(addresses, kind="stable")
+        np.save(os.path.join(path, "profile_addresses.npy"), addresses)
+        np.save(os.path.join(path, "profile_sorted.npy"), addresses[order])
+        np.save(os.path.join(path, "profile_order.npy"), order.astype(np.int64))
+        with open(os.path.join(path, "profile_patterns.pkl"), "wb") as f:
+            pickle.dump(profiles["patterns"], f, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(os.path.join(path, "events.pkl"), "wb") as f:
+            pickle.dump(state["events"], f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        commitments = state["commitments"]
+        count = len(commitments)
+        np.save(os.path.join(path, "commitment_ids.npy"), np.array([key for key, _ in commitments], dtype=str))
+        np.save(os.path.join(path, "commitment_players.npy"),
+                np.array([c.player_address for _, c in commitments], dtype=str))
+        np.save(os.path.join(path, "commitment_nonces.npy"), np.array([c.nonce for _, c in commitments], dtype=str))
+        np.save(os.path.join(path, "commitment_numbers.npy"),
+                np.fromiter((c.number for _, c in commitments), dtype=np.uint8, count=count))
+        np.save(os.path.join(path, "commitment_timestamps.npy"),
+                np.fromiter((c.timestamp for _, c in commitments), dtype=np.float64, count=count))
+        hashes = b"".join(c.digest for _, c in commitments)
+        np.save(os.path.join(path, "commitment_hashes.npy"), np.frombuffer(hashes, dtype=np.uint8).reshape(count, 32))
+
+        epoch_table = np.zeros(len(state["epochs"]), dtype=[
+            ("epoch_id", "<i8"), ("started_at", "<f8"), ("sealed_at", "<f8"), ("offset", "<i8"), ("length", "<i8")
+        ])
+        roots = np.zeros((len(state["epochs"]), 32), dtype=np.uint8)
+        leaves: List[bytes] = []
+        for i, (epoch_id, started_at, sealed_at, root, epoch_leaves) in enumerate(state["epochs"]):
+            epoch_table[i] = (epoch_id, started_at, np.nan if sealed_at is None else sealed_at,
+                              len(leaves), len(epoch_leaves))
+            if root:
+                roots[i] = np.frombuffer(bytes.fromhex(root), dtype=np.uint8)
+            leaves.extend(epoch_leaves)
+        np.save(os.path.join(path, "epochs.npy"), epoch_table)
+        np.save(os.path.join(path, "epoch_roots.npy"), roots)
+        np.save(os.path.join(path, "epoch_leaves.npy"),
+                np.frombuffer(b"".join(leaves), dtype=np.uint8).reshape(len(leaves), 32))
+
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({
+                "version": SNAPSHOT_VERSION,
+                "seq": seq,
+                "created_at": time.time(),
+                "alpha": state["alpha"],
+                "beta": state["beta"],
+                "frequencies": state["frequencies"],
+                "evicted": state["evicted"],
+                "profiles": len(addresses),
+                "commitments": count
+            }, f)
+
+        os.replace(path, final_path)
+
+        # Снапшот покрывает все более ранние сегменты и снапшоты
+        for old in self._snapshots():
+            if old < seq:
+                shutil.rmtree(self._snapshot_path(old), ignore_errors=True)
+        for old in self.wal.segments():
+            if old < seq:
+                os.remove(self.wal.segment_path(old))
+
+    async def snapshot(self) -> int:
+        """Компакция: новый сегмент WAL, снимок состояния и запись снапшота в потоке"""
+        async with self._snapshot_lock:
+            started = time.perf_counter()
+            seq = self.wal.rotate()
+            state = self._capture()
+            self._snapshot_records = self.wal.records
+            self._snapshot_bytes = self.wal.bytes
+            try:
+                await asyncio.to_thread(self._export, state)
+            finally:
+                self._release()
+            await self.wal.flush_async()
+            await asyncio.to_thread(self._write_snapshot, seq, state)
+            self.last_snapshot_seq = seq
+            self.last_snapshot_at = time.time()
+            self.last_snapshot_seconds = time.perf_counter() - started
+            return seq
+
+    def _snapshot_due(self) -> bool:
+        if self.wal.records == self._snapshot_records:
+            return False
+        return (
+            self.wal.bytes - self._snapshot_bytes >= self.compact_after_bytes
+            or time.time() - self.last_snapshot_at >= self.snapshot_interval
+        )
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.wal.flush_async()
+            except Exception as e:
+                logger.error(f"WAL flush error: {e}")
+
+    async def _compaction_loop(self):
+        self.last_snapshot_at = time.time()
+        while True:
+            await asyncio.sleep(1.0)
+            if self._snapshot_due():
+                try:
+                    seq = await self.snapshot()
+                    logger.info(f"💾 Снапшот {seq} записан за {self.last_snapshot_seconds:.2f} с")
+                except Exception as e:
+                    logger.error(f"Snapshot error: {e}")
+
+    def start(self):
+        self._tasks = [
+            asyncio.create_task(self._flush_loop()),
+            asyncio.create_task(self._compaction_loop())
+        ]
+
+    async def stop(self, final_snapshot: bool = True):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if final_snapshot and self.wal.records != self._snapshot_records:
+            await self.snapshot()
+        self.detach()
+        self.wal.close()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "wal_segment": self.wal.seq,
+            "wal_records": self.wal.records,
+            "wal_bytes": self.wal.bytes,
+            "last_snapshot": self.last_snapshot_seq,
+            "last_snapshot_seconds": self.last_snapshot_seconds
+        }
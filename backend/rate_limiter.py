@@ -0,0 +1,200 @@
+# blockchain_roulette/backend/rate_limiter.py
+# Rate limiting на скользящем окне с проверкой за O(1)
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+from state_store import StateStore
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    limit: int
+    window_seconds: float
+
+
+class _WindowState:
+    """Компактное состояние ключа: счётчики текущего и предыдущего окна"""
+    __slots__ = ("window", "previous", "current", "last_seen")
+
+    def __init__(self, window: int, last_seen: float):
+        self.window = window
+        self.previous = 0
+        self.current = 0
+        self.last_seen = last_seen
+
+
+class SlidingWindowRateLimiter:
+    """
+    Sliding-window counter: вместо списка отметок времени на ключ хранятся
+    только два счётчика соседних фиксированных окон, а число запросов за
+    последнее окно оценивается их взвешенной суммой. Проверка и обновление
+    стоят O(1) независимо от лимита.
+
+    Ключи каждого маршрута лежат в OrderedDict в порядке последнего
+    обращения, поэтому простаивающие ключи вытесняются с головы за
+    O(вытесненных), а общее число ключей ограничено max_keys.
+
+    Если передан store, счётчики хранятся в разделяемом StateStore
+    (пространство имён ratelimit:<route>) и обновляются атомарно, так что
+    лимит соблюдается для всех воркеров сразу; простаивающие ключи
+    истекают по TTL в два окна. Часы в этом режиме должны быть общими для
+    процессов (time.time).
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, RateLimit],
+        max_keys: int = 1_000_000,
+        clock: Callable[[], float] = time.monotonic,
+        store: Optional[StateStore] = None
+    ):
+        self.limits = dict(limits)
+        self.max_keys = max_keys
+        self.clock = clock
+        self.store = store
+        self._states: Dict[str, "OrderedDict[str, _WindowState]"] = {
+            route: OrderedDict() for route in self.limits
+        }
+
+    def __len__(self) -> int:
+        if self.store is not None:
+            return sum(self.store.count(f"ratelimit:{route}") for route in self.limits)
+        return sum(len(states) for states in self._states.values())
+
+    def add_route(self, route: str, limit: RateLimit):
+        """Регистрирует (или меняет) лимит для маршрута"""
+        self.limits[route] = limit
+        self._states.setdefault(route, OrderedDict())
+
+    def _hit(
+        self,
+        states: "OrderedDict[str, _WindowState]",
+        key: str,
+        rate: RateLimit,
+        now: float,
+        cost: int
+    ) -> bool:
+        window_seconds = rate.window_seconds
+        window = int(now // window_seconds)
+
+        state = states.get(key)
+        if state is None:
+            state = _WindowState(window, now)
+            states[key] = state
+        else:
+            states.move_to_end(key)
+            if state.window != window:
+                state.previous = state.current if state.window == window - 1 else 0
+                state.current = 0
+                state.window = window
+        state.last_seen = now
+
+        # Доля предыдущего окна, всё ещё попадающая в скользящее окно
+        overlap = 1.0 - (now - window * window_seconds) / window_seconds
+        if state.previous * overlap + state.current + cost > rate.limit:
+            return False
+
+        state.current += cost
+        return True
+
+    def _shared_hits(self, keys: List[str], route: str, cost: int) -> List[bool]:
+        """Проверка через разделяемое хранилище: состояние [окно, пред., тек.]"""
+        rate = self.limits[route]
+        window_seconds = rate.window_seconds
+        now = self.clock()
+        window = int(now // window_seconds)
+        overlap = 1.0 - (now - window * window_seconds) / window_seconds
+
+        def apply(state):
+            if state is None:
+                state = [window, 0, 0]
+            elif state[0] != window:
+                state = [window, state[2] if state[0] == window - 1 else 0, 0]
+            if state[1] * overlap + state[2] + cost > rate.limit:
+                return state, False
+            state[2] += cost
+            return state, True
+
+        return self.store.update_many(
+            f"ratelimit:{route}", keys, apply, ttl=2 * window_seconds
+        )
+
+    def _evict(
+        self,
+        states: "OrderedDict[str, _WindowState]",
+        rate: RateLimit,
+        now: float,
+        budget: Optional[int] = None
+    ) -> int:
+        """Удаляет с головы ключи, простаивающие дольше двух окон"""
+        idle_after = 2 * rate.window_seconds
+        evicted = 0
+        while states and (budget is None or evicted < budget):
+            key, state = next(iter(states.items()))
+            if now - state.last_seen < idle_after:
+                break
+            del states[key]
+            evicted += 1
+        return evicted
+
+    def hit(self, key: str, route: str = "default", cost: int = 1) -> bool:
+        """Учитывает запрос ключа; False, если лимит маршрута исчерпан"""
+        if self.store is not None:
+            return self._shared_hits([key], route, cost)[0]
+
+        rate = self.limits[route]
+        states = self._states[route]
+        now = self.clock()
+
+        # Попутно вытесняем пару простаивающих ключей, чтобы память не росла
+        self._evict(states, rate, now, 2)
+        if len(states) >= self.max_keys and key not in states:
+            states.popitem(last=False)
+
+        return self._hit(states, key, rate, now, cost)
+
+    def check_many(self, keys: Iterable[str], route: str = "default", cost: int = 1) -> List[bool]:
+        """Пакетная проверка: один замер времени и один проход по ключам"""
+        keys = list(keys)
+        if self.store is not None:
+            return self._shared_hits(keys, route, cost)
+
+        rate = self.limits[route]
+        states = self._states[route]
+        now = self.clock()
+
+        self._evict(states, rate, now, len(keys))
+        results = []
+        for key in keys:
+            if len(states) >= self.max_keys and key not in states:
+                states.popitem(last=False)
+            results.append(self._hit(states, key, rate, now, cost))
+        return results
+
+    async def hit_async(self, key: str, route: str = "default", cost: int = 1) -> bool:
+        """hit для вызова из event loop: с разделяемым хранилищем - вне event loop"""
+        if self.store is not None:
+            return await self.store.call(self.hit, key, route, cost)
+        return self.hit(key, route, cost)
+
+    async def check_many_async(self, keys: Iterable[str], route: str = "default", cost: int = 1) -> List[bool]:
+        """check_many для вызова из event loop"""
+        if self.store is not None:
+            return await self.store.call(self.check_many, list(keys), route, cost)
+        return self.check_many(keys, route, cost)
+
+    def evict_idle(self, route: Optional[str] = None) -> int:
+        """Полное вытеснение простаивающих ключей (для периодической очистки)"""
+        if self.store is not None:
+            # В разделяемом хранилище ключи истекают по TTL
+            return 0
+
+        now = self.clock()
+        routes = [route] if route else list(self._states)
+        return sum(
+            self._evict(self._states[name], self.limits[name], now)
+            for name in routes
+        )
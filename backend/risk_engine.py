@@ -0,0 +1,242 @@
+# blockchain_roulette/backend/risk_engine.py
+# Оценка риска игроков: Beta-Binomial модель числа выигрышей против ожидаемой доли для типа ставки
+
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Доля выигрышей ставки на одно число на честном колесе
+STRAIGHT_BET_RATE = 1.0 / 37
+
+
+def _upper_tail(wins: np.ndarray, bets: np.ndarray, prior_alpha: float, prior_beta: float,
+                threshold: float) -> np.ndarray:
+    """
+    P(theta > threshold) для апостериорного Beta(prior_alpha + wins, prior_beta + bets - wins).
+    1 - I_t(a, b) = I_{1-t}(b, a), поэтому хвост - один вызов betainc
+    """
+    # Тяжёлый импорт scipy.special - только при первой оценке
+    from scipy.special import betainc
+    return betainc(prior_beta + (bets - wins), prior_alpha + wins, 1.0 - threshold)
+
+
+def _upper_tail_chunk(args) -> np.ndarray:
+    """Точка входа для пула процессов"""
+    return _upper_tail(*args)
+
+
+class RiskModel:
+    """
+    Доля выигрышей игрока theta имеет априорное Beta со средним
+    expected_rate и силой prior_strength псевдоставок; по выигрышам и
+    ставкам получается апостериорное Beta. Оценка риска - апостериорная
+    вероятность того, что theta выше expected_rate в excess раз. Один
+    выигрыш на одну ставку почти не сдвигает апостериорное и не даёт
+    высокого риска; устойчиво высокая доля выигрышей на сотнях ставок даёт.
+
+    Для ставок меньше table_size оценки берутся из таблицы (bets, wins),
+    посчитанной один раз: у большинства игроков немного ставок, и полный
+    проход сводится к выборке по индексу.
+    """
+    __slots__ = ("expected_rate", "prior_strength", "excess", "threshold",
+                 "prior_alpha", "prior_beta", "table_size", "_table")
+
+    def __init__(self, expected_rate: float = STRAIGHT_BET_RATE, prior_strength: float = 100.0,
+                 excess: float = 2.0, table_size: int = 512):
+        self.expected_rate = expected_rate
+        self.prior_strength = prior_strength
+        self.excess = excess
+        self.threshold = min(expected_rate * excess, 1.0)
+        self.prior_alpha = expected_rate * prior_strength
+        self.prior_beta = (1.0 - expected_rate) * prior_strength
+        self.table_size = table_size
+        self._table: Optional[np.ndarray] = None
+
+    def _tail(self, wins: np.ndarray, bets: np.ndarray) -> np.ndarray:
+        return _upper_tail(wins, bets, self.prior_alpha, self.prior_beta, self.threshold)
+
+    def table(self) -> np.ndarray:
+        """Оценки для всех bets < table_size и wins <= bets"""
+        if self._table is None:
+            size = self.table_size
+            bets, wins = np.ogrid[:size, :size]
+            self._table = self._tail(np.minimum(wins, bets), np.broadcast_to(bets, (size, size)))
+        return self._table
+
+    def score(self, wins: np.ndarray, bets: np.ndarray, executor: Optional[Executor] = None,
+              chunk_size: int = 1_000_000) -> np.ndarray:
+        """
+        Векторная оценка. Строки вне таблицы при executor и их числе больше
+        chunk_size делятся на части и считаются в пуле процессов
+        """
+        bets = np.asarray(bets, dtype=np.int64)
+        wins = np.minimum(np.asarray(wins, dtype=np.int64), bets)
+        small = bets < self.table_size
+        if small.all():
+            return self.table()[bets, wins]
+        scores = np.empty(len(bets))
+        scores[small] = self.table()[bets[small], wins[small]]
+
+        large = np.flatnonzero(~small)
+        if executor is None or len(large) <= chunk_size:
+            scores[large] = self._tail(wins[large], bets[large])
+            return scores
+        parts = [large[start:start + chunk_size] for start in range(0, len(large), chunk_size)]
+        results = executor.map(_upper_tail_chunk, [
+            (wins[part], bets[part], self.prior_alpha, self.prior_beta, self.threshold) for part in parts
+        ])
+        for part, result in zip(parts, results):
+            scores[part] = result
+        return scores
+
+    def score_one(self, wins: int, bets: int) -> float:
+        """Оценка одного игрока (для проверки при ставке)"""
+        wins = min(wins, bets)
+        if bets < self.table_size:
+            return float(self.table()[bets, wins])
+        return float(self._tail(wins, bets))
+
+
+class RiskEngine:
+    """
+    Пересчёт оценок риска всех игроков анализатора. Ставки только помечают
+    строки изменёнными; фоновый цикл раз в interval секунд пересчитывает
+    их одним векторным вызовом. После старта все игроки один раз
+    пересчитываются заново (оценки из снапшота могли считаться другими
+    параметрами модели) - в отдельном потоке, а строки вне таблицы
+    делятся по пулу процессов.
+
+    Ожидаемая доля выигрышей - доля ставки на число на честном колесе.
+    Из апостериорных распределений чисел её не получить: каждое вращение
+    прибавляет выигрыш одному числу и проигрыш остальным, и средняя по
+    числам доля всегда равна 1/37.
+    """
+
+    def __init__(self, analyzer, prior_strength: float = 100.0, excess: float = 2.0,
+                 interval: float = 1.0, workers: Optional[int] = None, chunk_size: int = 1_000_000):
+        self.analyzer = analyzer
+        self.interval = interval
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._task: Optional[asyncio.Task] = None
+        self.model = RiskModel(STRAIGHT_BET_RATE, prior_strength, excess)
+        self.stats = {
+            "full_passes": 0,
+            "incremental_passes": 0,
+            "rescored": 0,
+            "last_full_seconds": None,
+            "last_incremental_ms": None,
+        }
+
+    def executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers is None or self.workers < 2:
+            return None
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def rescore_dirty(self) -> int:
+        """Пересчитывает изменённых с прошлого прохода игроков; возвращает их число"""
+        started = time.perf_counter()
+        store = self.analyzer.player_profiles
+        store.risk_model = self.model
+        rescored = store.rescore_dirty()
+        self.stats["incremental_passes"] += 1
+        self.stats["rescored"] += rescored
+        self.stats["last_incremental_ms"] = (time.perf_counter() - started) * 1000
+        return rescored
+
+    def compute_all(self, model: RiskModel, wins: np.ndarray, bets: np.ndarray) -> np.ndarray:
+        """Оценки для всех строк (без доступа к хранилищу - можно вызывать вне event loop)"""
+        return model.score(wins, bets, executor=self.executor(), chunk_size=self.chunk_size)
+
+    def rescore_all(self) -> int:
+        """Синхронный полный пересчёт (скрипты, бенчмарки)"""
+        started = time.perf_counter()
+        model = self.model
+        store = self.analyzer.player_profiles
+        store.risk_model = model
+        size = len(store)
+        scores = self.compute_all(model, store.column('wins'), store.column('total_bets'))
+        store.set_risk_scores(np.arange(size), scores, notify=False)
+        self._full_pass_done(size, started)
+        return size
+
+    async def rescore_all_async(self) -> int:
+        """
+        Полный пересчёт: колонки копируются в event loop, оценки считаются
+        в потоке, результат записывается снова в event loop. Строки,
+        изменённые за время расчёта, остаются помеченными и будут
+        пересчитаны следующим инкрементальным проходом
+        """
+        started = time.perf_counter()
+        model = self.model
+        store = self.analyzer.player_profiles
+        store.risk_model = model
+        size = len(store)
+        wins = store.column('wins').copy()
+        bets = store.column('total_bets').copy()
+        scores = await asyncio.to_thread(self.compute_all, model, wins, bets)
+        if self.analyzer.player_profiles is store:
+            store.set_risk_scores(np.arange(size), scores, notify=False)
+        self._full_pass_done(size, started)
+        return size
+
+    def _full_pass_done(self, size: int, started: float):
+        self.stats["full_passes"] += 1
+        self.stats["rescored"] += size
+        self.stats["last_full_seconds"] = time.perf_counter() - started
+
+    async def _run(self):
+        # Первый проход - полный: оценки из снапшота могли считаться другой моделью
+        full = True
+        while True:
+            try:
+                if full:
+                    await self.rescore_all_async()
+                    full = False
+                else:
+                    self.rescore_dirty()
+            except Exception as e:
+                logger.error(f"Risk rescoring error: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        """
+        Строит таблицу оценок (и импортирует scipy) в потоке до приёма
+        запросов: иначе первая проверка при ставке строила бы её в event loop
+        """
+        if self._task is None:
+            await asyncio.to_thread(self.model.table)
+            self.analyzer.player_profiles.risk_model = self.model
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.stop_executor()
+
+    def stop_executor(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "expected_rate": self.model.expected_rate,
+            "threshold": self.model.threshold,
+            "pending": self.analyzer.player_profiles.dirty_count(),
+        }
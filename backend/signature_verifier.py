@@ -0,0 +1,123 @@
+# blockchain_roulette/backend/signature_verifier.py
+# Проверка подписей кошельков вне event loop с кешированием результатов
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+# (address, message, signature)
+SignedMessage = Tuple[str, str, str]
+
+
+def recover_signer(message: str, signature: str) -> str:
+    """Восстанавливает адрес подписавшего sha3-256 хеш сообщения"""
+    from eth_account import Account
+    from eth_account.messages import encode_defunct
+
+    message_hash = hashlib.sha3_256(message.encode()).digest()
+    return Account.recover_message(encode_defunct(primitive=message_hash), signature=signature)
+
+
+def _verify_chunk(items: Sequence[SignedMessage]) -> List[bool]:
+    """Выполняется в процессе пула: проверка пачки подписей за один вызов"""
+    results = []
+    for address, message, signature in items:
+        try:
+            results.append(recover_signer(message, signature).lower() == address.lower())
+        except Exception:
+            results.append(False)
+    return results
+
+
+class SignatureVerifier:
+    """
+    ECDSA-восстановление выполняется в пуле процессов, event loop только
+    ждёт результат. Число одновременно отправленных в пул задач ограничено,
+    результаты кешируются в LRU с TTL по ключу (address, message, signature),
+    поэтому повторный логин с тем же подписанным сообщением бесплатен.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_pending: int = 64,
+        cache_size: int = 100_000,
+        cache_ttl: float = 300.0,
+        chunk_size: int = 32
+    ):
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.chunk_size = chunk_size
+        self._semaphore = asyncio.Semaphore(max_pending)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cache: "OrderedDict[SignedMessage, Tuple[bool, float]]" = OrderedDict()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    @staticmethod
+    def _key(address: str, message: str, signature: str) -> SignedMessage:
+        return (address.lower(), message, signature.lower())
+
+    def _cached(self, key: SignedMessage, now: float) -> Optional[bool]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= now:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return entry[0]
+
+    def _remember(self, key: SignedMessage, valid: bool, now: float):
+        self._cache[key] = (valid, now + self.cache_ttl)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _run_chunk(self, chunk: Sequence[SignedMessage]) -> List[bool]:
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), _verify_chunk, chunk)
+
+    async def verify(self, address: str, message: str, signature: str) -> bool:
+        return (await self.verify_many([(address, message, signature)]))[0]
+
+    async def verify_many(self, items: Sequence[SignedMessage]) -> List[bool]:
+        """
+        Пакетная проверка: кешированные и повторяющиеся подписи не
+        пересчитываются, остальные уходят в пул пачками по chunk_size.
+        """
+        now = time.monotonic()
+        keys = [self._key(*item) for item in items]
+        results: List[Optional[bool]] = [self._cached(key, now) for key in keys]
+
+        missing = list(OrderedDict.fromkeys(
+            key for key, result in zip(keys, results) if result is None
+        ))
+        if missing:
+            chunks = [
+                missing[i:i + self.chunk_size]
+                for i in range(0, len(missing), self.chunk_size)
+            ]
+            verified = await asyncio.gather(*(self._run_chunk(chunk) for chunk in chunks))
+            now = time.monotonic()
+            fresh = {}
+            for chunk, chunk_results in zip(chunks, verified):
+                for key, valid in zip(chunk, chunk_results):
+                    fresh[key] = valid
+                    self._remember(key, valid, now)
+            results = [fresh[key] if result is None else result for key, result in zip(keys, results)]
+
+        return results
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,290 @@
+# blockchain_roulette/backend/state_store.py
+# Хранилище разделяемого состояния (сессии, rate limiting) для нескольких воркеров
+
+import asyncio
+import functools
+import heapq
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Функция атомарного обновления: старое значение (или None) -> (новое значение, результат)
+UpdateFn = Callable[[Optional[Any]], Tuple[Any, Any]]
+
+
+class StateStore(ABC):
+    """
+    Key-value хранилище с пространствами имён и TTL.
+    Значения должны сериализоваться в JSON, update выполняется атомарно
+    относительно всех процессов, работающих с тем же хранилищем.
+    """
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def put(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        ...
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def update_many(
+        self,
+        namespace: str,
+        keys: Iterable[str],
+        fn: UpdateFn,
+        ttl: Optional[float] = None
+    ) -> List[Any]:
+        """Атомарно применяет fn к каждому ключу и возвращает результаты"""
+
+    @abstractmethod
+    def count(self, namespace: str) -> int:
+        ...
+
+    @abstractmethod
+    def purge_expired(self, limit: Optional[int] = None) -> int:
+        """Удаляет записи с истёкшим TTL"""
+
+    def update(self, namespace: str, key: str, fn: UpdateFn, ttl: Optional[float] = None) -> Any:
+        return self.update_many(namespace, [key], fn, ttl)[0]
+
+    async def call(self, method: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Вызов метода хранилища из event loop. Хранилище в памяти отвечает
+        сразу; блокирующие бэкенды выполняют вызов вне event loop
+        """
+        return method(*args, **kwargs)
+
+    def close(self):
+        pass
+
+
+class InMemoryStateStore(StateStore):
+    """
+    Хранилище в памяти процесса (один воркер). Истечение TTL - куча
+    (expires_at, namespace, key); продление записи оставляет в куче
+    устаревший элемент, поэтому куча перестраивается по живым записям,
+    когда становится вдвое больше них.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Dict[str, Tuple[Any, Optional[float]]]] = {}
+        self._expiry: List[Tuple[float, str, str]] = []
+        self._expiring = 0  # записи с TTL - живые элементы кучи
+
+    def _live(self, namespace: str, key: str, now: float) -> Optional[Tuple[Any, Optional[float]]]:
+        entry = self._data.get(namespace, {}).get(key)
+        if entry is None or (entry[1] is not None and entry[1] <= now):
+            return None
+        return entry
+
+    def _set(self, namespace: str, key: str, value: Any, ttl: Optional[float], now: float):
+        expires_at = now + ttl if ttl is not None else None
+        entries = self._data.setdefault(namespace, {})
+        previous = entries.get(key)
+        entries[key] = (value, expires_at)
+        if previous is not None and previous[1] is not None:
+            self._expiring -= 1
+        if expires_at is not None:
+            self._expiring += 1
+            heapq.heappush(self._expiry, (expires_at, namespace, key))
+            if len(self._expiry) > 2 * self._expiring + 1024:
+                self._rebuild_expiry()
+
+    def _rebuild_expiry(self):
+        """Куча только из актуальных сроков записей"""
+        self._expiry = [
+            (entry[1], namespace, key)
+            for namespace, entries in self._data.items()
+            for key, entry in entries.items()
+            if entry[1] is not None
+        ]
+        heapq.heapify(self._expiry)
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        entry = self._live(namespace, key, time.time())
+        return entry[0] if entry else None
+
+    def put(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        self._set(namespace, key, value, ttl, time.time())
+
+    def delete(self, namespace: str, key: str) -> bool:
+        entry = self._data.get(namespace, {}).pop(key, None)
+        if entry is not None and entry[1] is not None:
+            self._expiring -= 1
+        return entry is not None
+
+    def update_many(
+        self,
+        namespace: str,
+        keys: Iterable[str],
+        fn: UpdateFn,
+        ttl: Optional[float] = None
+    ) -> List[Any]:
+        now = time.time()
+        results = []
+        for key in keys:
+            entry = self._live(namespace, key, now)
+            value, result = fn(entry[0] if entry else None)
+            self._set(namespace, key, value, ttl, now)
+            results.append(result)
+        return results
+
+    def count(self, namespace: str) -> int:
+        return len(self._data.get(namespace, {}))
+
+    def purge_expired(self, limit: Optional[int] = None) -> int:
+        now = time.time()
+        removed = 0
+        expiry = self._expiry
+        while expiry and expiry[0][0] <= now and (limit is None or removed < limit):
+            expires_at, namespace, key = heapq.heappop(expiry)
+            entries = self._data.get(namespace, {})
+            entry = entries.get(key)
+            # Запись могла быть продлена после постановки в кучу
+            if entry is not None and entry[1] == expires_at:
+                del entries[key]
+                self._expiring -= 1
+                removed += 1
+        return removed
+
+
+class SQLiteStateStore(StateStore):
+    """
+    Разделяемое хранилище на SQLite в режиме WAL для воркеров одного хоста.
+    Чтения не блокируют запись, а update выполняется в транзакции
+    BEGIN IMMEDIATE, поэтому read-modify-write атомарен между процессами.
+
+    Вызовы из event loop идут через call в отдельный поток: ожидание
+    блокировки другого воркера не останавливает event loop. busy_timeout
+    держится много меньше дедлайна запроса - при долгой блокировке
+    запрос получает ошибку, а не висит.
+    """
+
+    def __init__(self, path: str, busy_timeout_ms: int = 200):
+        self.path = path
+        self._lock = threading.Lock()
+        # Соединение одно и под блокировкой: больше одного потока не нужно
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state-store")
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute(f"PRAGMA busy_timeout={busy_timeout_ms}")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL,"
+            " PRIMARY KEY (namespace, key)"
+            ") WITHOUT ROWID"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS state_expires ON state (expires_at)"
+            " WHERE expires_at IS NOT NULL"
+        )
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM state WHERE namespace = ? AND key = ?"
+                " AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO state (namespace, key, value, expires_at)"
+                " VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), expires_at)
+            )
+
+    def delete(self, namespace: str, key: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM state WHERE namespace = ? AND key = ?", (namespace, key)
+            )
+        return cursor.rowcount > 0
+
+    def update_many(
+        self,
+        namespace: str,
+        keys: Iterable[str],
+        fn: UpdateFn,
+        ttl: Optional[float] = None
+    ) -> List[Any]:
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        results = []
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for key in keys:
+                    row = conn.execute(
+                        "SELECT value FROM state WHERE namespace = ? AND key = ?"
+                        " AND (expires_at IS NULL OR expires_at > ?)",
+                        (namespace, key, now)
+                    ).fetchone()
+                    value, result = fn(json.loads(row[0]) if row else None)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO state (namespace, key, value, expires_at)"
+                        " VALUES (?, ?, ?, ?)",
+                        (namespace, key, json.dumps(value), expires_at)
+                    )
+                    results.append(result)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return results
+
+    def count(self, namespace: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM state WHERE namespace = ?"
+                " AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, time.time())
+            ).fetchone()
+        return row[0]
+
+    def purge_expired(self, limit: Optional[int] = None) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM state WHERE (namespace, key) IN ("
+                " SELECT namespace, key FROM state"
+                " WHERE expires_at IS NOT NULL AND expires_at <= ? LIMIT ?)",
+                (time.time(), -1 if limit is None else limit)
+            )
+        return cursor.rowcount
+
+    async def call(self, method: Callable[..., Any], *args, **kwargs) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(method, *args, **kwargs)
+        )
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._conn.close()
+
+
+def create_state_store(backend: str = "memory", path: str = "zk_roulette_state.db",
+                       busy_timeout_ms: int = 200) -> StateStore:
+    """Создаёт хранилище по имени бэкенда: memory или sqlite"""
+    if backend == "memory":
+        return InMemoryStateStore()
+    if backend == "sqlite":
+        return SQLiteStateStore(path, busy_timeout_ms)
+    raise ValueError(f"Unknown state backend: {backend}")
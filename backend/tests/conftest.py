@@ -0,0 +1,10 @@
+# blockchain_roulette/backend/tests/conftest.py
+# Общая настройка тестов: модули бэкенда импортируются как верхнеуровневые
+
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
@@ -0,0 +1,145 @@
+# blockchain_roulette/backend/tests/test_chain_client.py
+# JSON-RPC клиент: ошибки ответа ноды, склейка вызовов в пакеты, локальный учёт nonce
+
+import asyncio
+import json
+from collections import Counter
+
+import httpx
+import pytest
+
+from chain_client import AsyncChainClient, ChainError, NonceManager
+
+ADDRESS = "0x1234567890123456789012345678901234567890"
+
+
+class FakeNode:
+    """Нода для httpx.MockTransport: считает HTTP-запросы и вызовы, отвечает на пакеты в обратном порядке"""
+
+    def __init__(self):
+        self.nonces = Counter()
+        self.calls = Counter()
+        self.http_requests = 0
+        self.batch_sizes = []
+        self.fail = False
+
+    def reply(self, call):
+        method = call["method"]
+        self.calls[method] += 1
+        if method == "eth_getTransactionCount":
+            return {"jsonrpc": "2.0", "id": call["id"], "result": hex(self.nonces[call["params"][0].lower()])}
+        if method == "eth_chainId":
+            return {"jsonrpc": "2.0", "id": call["id"], "result": hex(1337)}
+        return {"jsonrpc": "2.0", "id": call["id"], "error": {"code": -32601, "message": "method not found"}}
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.http_requests += 1
+        if self.fail:
+            return httpx.Response(200, content=b"<html>502 Bad Gateway</html>")
+        payload = json.loads(request.content)
+        if isinstance(payload, list):
+            self.batch_sizes.append(len(payload))
+            return httpx.Response(200, json=[self.reply(call) for call in reversed(payload)])
+        return httpx.Response(200, json=self.reply(payload))
+
+
+def _client(node: FakeNode, **kwargs) -> AsyncChainClient:
+    return AsyncChainClient("http://node", transport=httpx.MockTransport(node), **kwargs)
+
+
+def test_non_json_reply_raises_chain_error():
+    node = FakeNode()
+    node.fail = True
+
+    async def scenario():
+        client = _client(node)
+        with pytest.raises(ChainError):
+            await client.call("eth_blockNumber")
+        with pytest.raises(ChainError):
+            await client.get_transaction_count(ADDRESS)
+        await client.close()
+
+    asyncio.run(scenario())
+
+
+def test_batched_calls_share_one_request_and_match_replies_by_id():
+    node = FakeNode()
+    addresses = ["0x%040x" % i for i in range(10)]
+    for i, address in enumerate(addresses):
+        node.nonces[address] = i
+
+    async def scenario():
+        client = _client(node, batch_window=0.01)
+        results = await asyncio.gather(
+            *(client.get_transaction_count(address) for address in addresses),
+            client.call_batched("eth_unknown"),
+            return_exceptions=True
+        )
+        await client.close()
+        return results
+
+    results = asyncio.run(scenario())
+    assert node.http_requests == 1
+    assert node.batch_sizes == [11]
+    assert results[:10] == list(range(10))
+    # Ошибка одного вызова не затрагивает остальные вызовы пакета
+    assert isinstance(results[10], ChainError)
+
+
+def test_batch_is_flushed_at_max_batch_size():
+    node = FakeNode()
+
+    async def scenario():
+        client = _client(node, batch_window=10.0, max_batch_size=4)
+        await asyncio.wait_for(asyncio.gather(*(client.chain_id() for _ in range(8))), 1.0)
+        await client.close()
+
+    asyncio.run(scenario())
+    assert node.batch_sizes == [4, 4]
+
+
+def test_nonce_manager_counts_locally_and_resyncs():
+    node = FakeNode()
+    node.nonces[ADDRESS.lower()] = 5
+
+    async def scenario():
+        client = _client(node)
+        nonces = NonceManager(client)
+        # Одновременные холодные запросы адреса разделяют один RPC
+        first = await asyncio.gather(*(nonces.next_nonce(ADDRESS) for _ in range(3)))
+        fetched = node.calls["eth_getTransactionCount"]
+
+        # Транзакции с nonce 5-6 дошли до ноды, 7 - нет: после resync счёт идёт от ноды
+        node.nonces[ADDRESS.lower()] = 7
+        nonces.resync(ADDRESS)
+        after_resync = await nonces.next_nonce(ADDRESS)
+        await client.close()
+        return first, fetched, after_resync
+
+    first, fetched, after_resync = asyncio.run(scenario())
+    assert sorted(first) == [5, 6, 7]
+    assert fetched == 1
+    assert after_resync == 7
+    assert node.calls["eth_getTransactionCount"] == 2
+
+
+def test_nonce_manager_expires_entries_and_retries_after_error():
+    node = FakeNode()
+    node.nonces[ADDRESS.lower()] = 3
+
+    async def scenario():
+        client = _client(node)
+        nonces = NonceManager(client, resync_after=-1.0)
+        assert await nonces.next_nonce(ADDRESS) == 3
+        # Запись старше resync_after: nonce снова берётся у ноды
+        assert await nonces.next_nonce(ADDRESS) == 3
+
+        node.fail = True
+        with pytest.raises(ChainError):
+            await nonces.next_nonce(ADDRESS)
+        node.fail = False
+        node.nonces[ADDRESS.lower()] = 4
+        assert await nonces.next_nonce(ADDRESS) == 4
+        await client.close()
+
+    asyncio.run(scenario())
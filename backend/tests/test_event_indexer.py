@@ -0,0 +1,73 @@
+# blockchain_roulette/backend/tests/test_event_indexer.py
+# Сигнатуры событий индексатора: из ABI контракта, из конфигурации или предполагаемые по умолчанию
+
+import json
+import logging
+
+import pytest
+
+from bayesian_analyzer import BayesianAnalyzer
+from chain_client import ContractABI
+from event_indexer import BET_PLACED_SIGNATURE, BET_SETTLED_SIGNATURE, EventIndexer, event_topic
+
+CONTRACT = "0x" + "ab" * 20
+
+
+def _event(name, inputs):
+    return {
+        "type": "event", "name": name, "anonymous": False,
+        "inputs": [{"name": f"p{i}", "type": abi_type, "indexed": indexed} for i, (abi_type, indexed) in enumerate(inputs)]
+    }
+
+
+SETTLED = [("uint256", True), ("address", True), ("uint8", False), ("uint256", False), ("uint256", False)]
+# Другой BetPlaced: без commitment и с временем ставки
+PLACED = [("uint256", True), ("address", True), ("uint8", False), ("uint256", False), ("uint64", False)]
+
+
+def _indexer(abi=None, **kwargs) -> EventIndexer:
+    return EventIndexer(None, BayesianAnalyzer(), CONTRACT, abi=abi, **kwargs)
+
+
+def _abi_file(tmp_path, events) -> ContractABI:
+    path = tmp_path / "Roulette.json"
+    path.write_text(json.dumps({"abi": [{"type": "function", "name": "placeBet", "inputs": []}] + events}))
+    return ContractABI(CONTRACT, str(path))
+
+
+def test_signatures_taken_from_abi(tmp_path):
+    abi = _abi_file(tmp_path, [_event("BetPlaced", PLACED), _event("BetSettled", SETTLED)])
+    indexer = _indexer(abi)
+    assert indexer.signatures() == {
+        "BetPlaced": "BetPlaced(uint256,address,uint8,uint256,uint64)",
+        "BetSettled": BET_SETTLED_SIGNATURE,
+    }
+    assert indexer.topics == [event_topic("BetPlaced(uint256,address,uint8,uint256,uint64)"),
+                              event_topic(BET_SETTLED_SIGNATURE)]
+
+
+def test_configured_signatures_override_abi(tmp_path):
+    abi = _abi_file(tmp_path, [_event("BetPlaced", PLACED), _event("BetSettled", SETTLED)])
+    indexer = _indexer(abi, event_signatures={"BetPlaced": BET_PLACED_SIGNATURE})
+    assert indexer.signatures()["BetPlaced"] == BET_PLACED_SIGNATURE
+
+
+def test_defaults_assumed_with_warning_without_abi_events(tmp_path, caplog):
+    cases = [
+        _indexer(),
+        _indexer(ContractABI(CONTRACT, str(tmp_path / "missing.json"))),
+        _indexer(_abi_file(tmp_path, [])),
+    ]
+    for indexer in cases:
+        caplog.clear()
+        with caplog.at_level(logging.WARNING, logger="event_indexer"):
+            assert indexer.signatures() == {"BetPlaced": BET_PLACED_SIGNATURE, "BetSettled": BET_SETTLED_SIGNATURE}
+        assert "BetSettled" in caplog.text
+
+
+def test_abi_with_other_settled_layout_rejected(tmp_path):
+    # amount проиндексирован: data уже не содержит его, разбор по смещениям дал бы мусор
+    layout = SETTLED[:3] + [("uint256", True), ("uint256", False)]
+    indexer = _indexer(_abi_file(tmp_path, [_event("BetSettled", layout)]))
+    with pytest.raises(ValueError):
+        indexer.topics
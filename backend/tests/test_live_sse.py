@@ -0,0 +1,27 @@
+# blockchain_roulette/backend/tests/test_live_sse.py
+# /live/sse: подписка снимается, даже если клиент ушёл до первого кадра
+
+import asyncio
+
+import main_v2
+
+
+def test_sse_unsubscribes_when_client_leaves_before_first_frame():
+    live_feed = main_v2.live_feed
+
+    async def scenario():
+        response = await main_v2.live_sse()
+        assert len(live_feed.subscribers) == before + 1
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            # Медленный клиент: отключение обнаруживается раньше, чем уходит первый кадр
+            await asyncio.sleep(0.1)
+
+        await response({"type": "http", "method": "GET", "path": "/live/sse", "headers": []}, receive, send)
+
+    before = len(live_feed.subscribers)
+    asyncio.run(scenario())
+    assert len(live_feed.subscribers) == before
@@ -0,0 +1,161 @@
+# blockchain_roulette/backend/tests/test_merkle.py
+# Проверка путей и мультидоказательств Merkle: честные проходят, любые искажения - нет
+
+import hashlib
+import itertools
+import random
+
+import pytest
+
+from zk_system import (
+    IncrementalMerkleTree, ZKProof, ZKSystem, merkle_root_from_path, verify_merkle_multiproof,
+    verify_merkle_path, verify_merkle_paths
+)
+
+PLAYER = "0x" + "34" * 20
+
+
+def _tree(size: int) -> IncrementalMerkleTree:
+    tree = IncrementalMerkleTree()
+    for i in range(size):
+        tree.append_bytes(hashlib.sha256(b"leaf%d" % i).digest())
+    return tree
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 8, 13])
+def test_every_leaf_path_verifies(size):
+    tree = _tree(size)
+    root = tree.root_bytes
+    for index, leaf in enumerate(tree.levels[0]):
+        path = tree.get_proof_bytes(index)
+        assert len(path) == tree.depth
+        assert verify_merkle_path(leaf, index, path, root)
+
+
+def test_tampered_path_rejected():
+    tree = _tree(11)
+    root = tree.root_bytes
+    leaf = tree.levels[0][6]
+    path = tree.get_proof_bytes(6)
+
+    assert not verify_merkle_path(tree.levels[0][7], 6, path, root)
+    assert not verify_merkle_path(leaf, 7, path, root)
+    assert not verify_merkle_path(leaf, 6, path, tree.levels[0][0])
+    for level in range(len(path)):
+        broken = list(path)
+        broken[level] = bytes(32)
+        assert not verify_merkle_path(leaf, 6, broken, root)
+    # Перестановка соседей и укороченный путь
+    assert not verify_merkle_path(leaf, 6, path[::-1], root)
+    assert not verify_merkle_path(leaf, 6, path[:-1], root)
+
+
+def test_index_outside_path_rejected():
+    tree = _tree(8)
+    root = tree.root_bytes
+    leaf = tree.levels[0][5]
+    path = tree.get_proof_bytes(5)
+    # Старшие биты индекса не участвуют в пересчёте, поэтому отсекаются явно
+    assert merkle_root_from_path(leaf, 5 + 8, path) == root
+    assert not verify_merkle_path(leaf, 5 + 8, path, root)
+    assert not verify_merkle_path(leaf, -3, path, root)
+
+
+def test_batch_verification_matches_single():
+    tree = _tree(9)
+    root = tree.root_bytes
+    items = []
+    for index, leaf in enumerate(tree.levels[0]):
+        path = tree.get_proof_bytes(index)
+        items.append((leaf, index, path, root))
+        items.append((leaf, index ^ 1, path, root))
+        items.append((leaf, index, path, bytes(32)))
+    assert verify_merkle_paths(items) == [verify_merkle_path(*item) for item in items]
+    assert verify_merkle_paths(items)[::3] == [True] * 9
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 16, 21])
+def test_multiproof_verifies_any_subset(size):
+    tree = _tree(size)
+    root = tree.root_bytes
+    leaves = tree.levels[0]
+    rng = random.Random(size)
+    subsets = [list(range(size))] + [sorted(rng.sample(range(size), rng.randint(1, size))) for _ in range(10)]
+    for indices in subsets:
+        nodes = tree.get_multiproof_bytes(indices)
+        chosen = [leaves[index] for index in indices]
+        assert verify_merkle_multiproof(indices, chosen, nodes, size, root)
+        # Порядок листьев в доказательстве не важен
+        assert verify_merkle_multiproof(indices[::-1], chosen[::-1], nodes, size, root)
+
+
+def test_multiproof_tampering_rejected():
+    tree = _tree(21)
+    root = tree.root_bytes
+    leaves = tree.levels[0]
+    indices = [2, 3, 9, 17]
+    chosen = [leaves[index] for index in indices]
+    nodes = tree.get_multiproof_bytes(indices)
+    assert verify_merkle_multiproof(indices, chosen, nodes, 21, root)
+
+    assert not verify_merkle_multiproof(indices, chosen, nodes + [bytes(32)], 21, root)
+    assert not verify_merkle_multiproof(indices, chosen, nodes[:-1], 21, root)
+    assert not verify_merkle_multiproof(indices, chosen[::-1], nodes, 21, root)
+    assert not verify_merkle_multiproof(indices, chosen, nodes, 18, root)
+    assert not verify_merkle_multiproof(indices, chosen, nodes, 21, bytes(32))
+    assert not verify_merkle_multiproof([2, 3, 9, 21], chosen, nodes, 21, root)
+    assert not verify_merkle_multiproof([], [], nodes, 21, root)
+    assert not verify_merkle_multiproof(indices, chosen[:3], nodes, 21, root)
+    # Один индекс с двумя разными листьями
+    assert not verify_merkle_multiproof([2, 2], [leaves[2], leaves[3]], nodes, 21, root)
+    for position in range(len(nodes)):
+        broken = list(nodes)
+        broken[position] = bytes(32)
+        assert not verify_merkle_multiproof(indices, chosen, broken, 21, root)
+    for a, b in itertools.combinations(range(len(nodes)), 2):
+        swapped = list(nodes)
+        swapped[a], swapped[b] = swapped[b], swapped[a]
+        assert not verify_merkle_multiproof(indices, chosen, swapped, 21, root)
+
+
+def test_duplicated_last_leaf_is_not_a_phantom_leaf():
+    """
+    Непарный узел хешируется сам с собой, поэтому путь последнего листа
+    нечётного дерева подходит и для несуществующего индекса за ним;
+    такие индексы отсекаются по числу листьев эпохи
+    """
+    zk = ZKSystem()
+    entries = [zk.generate_player_commitment(PLAYER, i) for i in range(3)]
+    zk.seal_epoch()
+    _, commitment_hash, secret_key = entries[2]
+    proof = zk.generate_zk_proof(PLAYER, commitment_hash, secret_key)
+    assert proof.leaf_index == 2
+    assert zk.verify_zk_proof(proof, PLAYER)
+
+    phantom = ZKProof(
+        commitment=proof.commitment, challenge=proof.challenge, response=proof.response,
+        merkle_proof=proof.merkle_proof, merkle_root=proof.merkle_root, timestamp=proof.timestamp,
+        epoch_id=proof.epoch_id, leaf_index=3
+    )
+    assert merkle_root_from_path(phantom.commitment, 3, phantom.merkle_proof) == proof.merkle_root
+    assert not zk.verify_zk_proof(phantom, PLAYER)
+
+
+def test_proof_rejected_when_challenge_expired_or_epoch_unknown():
+    zk = ZKSystem()
+    _, commitment_hash, secret_key = zk.generate_player_commitment(PLAYER, 7)
+    proof = zk.generate_zk_proof(PLAYER, commitment_hash, secret_key)
+
+    stale = ZKProof(*proof._fields())
+    stale.timestamp -= 3600
+    assert not zk.verify_zk_proof(stale, PLAYER)
+    # Без ограничения возраста тоже отказ: challenge посчитан от прежнего времени
+    assert not zk.verify_zk_proof(stale, PLAYER, max_age=None)
+
+    foreign = ZKProof(*proof._fields())
+    foreign.epoch_id += 1
+    assert not zk.verify_zk_proof(foreign, PLAYER)
+
+    truncated = ZKProof(*proof._fields())
+    truncated.commitment = proof.commitment[:31]
+    assert not zk.verify_zk_proof(truncated, PLAYER)
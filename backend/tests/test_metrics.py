@@ -0,0 +1,59 @@
+# blockchain_roulette/backend/tests/test_metrics.py
+# Экспозиция Prometheus: типы gauge и counter, имена счётчиков, сбор без блокировки event loop
+
+import asyncio
+import threading
+
+import pytest
+
+import main_v2
+from metrics import MetricsRegistry
+from state_store import SQLiteStateStore
+
+
+def test_counter_rendered_with_counter_type():
+    registry = MetricsRegistry()
+    stats = {"shed": 0}
+    registry.gauge("queue_depth", "Глубина очереди", lambda: 3)
+    registry.counter("requests_shed_total", "Сброшенные запросы", lambda: stats["shed"])
+    stats["shed"] = 4
+
+    lines = registry.render().splitlines()
+    assert "# TYPE queue_depth gauge" in lines
+    assert "# TYPE requests_shed_total counter" in lines
+    assert "requests_shed_total 4.0" in lines
+
+
+def test_counter_name_must_end_with_total():
+    with pytest.raises(ValueError):
+        MetricsRegistry().counter("requests_shed", "Сброшенные запросы", lambda: 0)
+
+
+def test_state_counts_collected_off_event_loop(tmp_path, monkeypatch):
+    store = SQLiteStateStore(str(tmp_path / "state.db"))
+    store.put("sessions", "0x01", {"bets_count": 1}, ttl=3600)
+    store.put("sessions", "0x02", {"bets_count": 1}, ttl=3600)
+    threads = []
+    count = store.count
+
+    def recording_count(namespace):
+        threads.append(threading.current_thread())
+        return count(namespace)
+
+    monkeypatch.setattr(store, "count", recording_count)
+    monkeypatch.setattr(main_v2, "state_store", store)
+    try:
+        response = asyncio.run(main_v2.metrics())
+    finally:
+        store.close()
+
+    assert threads and threading.main_thread() not in threads
+    assert "zk_roulette_sessions 2.0" in response.body.decode().splitlines()
+
+
+def test_cumulative_totals_exported_as_counters():
+    lines = main_v2.metrics_registry.render().splitlines()
+    for name in ("zk_roulette_wal_bytes_total", "zk_roulette_response_cache_hits_total",
+                 "zk_roulette_admission_bet_shed_total"):
+        assert f"# TYPE {name} counter" in lines
+    assert not any(line.startswith(("zk_roulette_wal_bytes ", "zk_roulette_response_cache_hits ")) for line in lines)
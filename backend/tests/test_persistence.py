@@ -0,0 +1,240 @@
+# blockchain_roulette/backend/tests/test_persistence.py
+# WAL и снапшоты: восстановление после аварии и согласованность снапшота со сменой сегмента
+
+import asyncio
+import os
+
+import numpy as np
+
+from bayesian_analyzer import BayesianAnalyzer, PlayerProfile, PlayerProfileStore
+from persistence import REC_SPINS, PersistenceManager, WriteAheadLog
+from zk_system import CommitmentStore, ZKCommitment, ZKSystem
+
+PLAYER = "0x1234567890123456789012345678901234567890"
+ADDRESSES = ["0x%040x" % i for i in range(200)]
+
+
+def _manager(directory: str):
+    zk = ZKSystem(epoch_duration=10**9)
+    analyzer = BayesianAnalyzer()
+    manager = PersistenceManager(directory, zk, analyzer)
+    manager.acquire_lock()
+    manager.restore()
+    return manager, zk, analyzer
+
+
+def _state(zk: ZKSystem, analyzer: BayesianAnalyzer):
+    profiles = analyzer.player_profiles
+    return (
+        {address: profiles[address] for address in profiles},
+        {key: (c.player_address, c.nonce, c.number, c.timestamp) for key, c in zk.commitment_storage.items()},
+        list(zk.current_epoch.tree.levels[0]),
+    )
+
+
+def _crash(manager: PersistenceManager):
+    """Аварийная остановка: буфер WAL дописан, снапшота нет, блокировка каталога снята"""
+    manager.detach()
+    manager.wal.close()
+    manager._lock_file.close()
+    manager._lock_file = None
+
+
+def _full_state(zk: ZKSystem, analyzer: BayesianAnalyzer):
+    return _state(zk, analyzer) + (
+        analyzer.alpha_params.tolist(),
+        analyzer.beta_params.tolist(),
+        sorted(zk.sealed_epochs),
+    )
+
+
+def _write_during_snapshot(zk: ZKSystem, analyzer: BayesianAnalyzer):
+    profiles = analyzer.player_profiles
+    profiles.update(ADDRESSES[0], 5.0, True, 180.0, timestamp=2000.0)
+    # Новые строки и уже известные адреса в одном пакете
+    profiles.update_batch(ADDRESSES[50:] + ADDRESSES[:10], np.full(160, 2.0), np.ones(160, dtype=bool),
+                          np.full(160, 72.0), 3000.0)
+    profiles.set_blacklisted(ADDRESSES[1])
+    profiles[ADDRESSES[2]] = PlayerProfile(ADDRESSES[2], 7, 1, 7.0, -1.0, 0.9, 1 / 7, False, 4000.0,
+                                           {"favorite": 17})
+    profiles.rescore_dirty()
+    for i in range(5):
+        zk.generate_player_commitment(PLAYER, i)
+
+
+def test_snapshot_excludes_writes_made_while_copying(tmp_path):
+    directory = str(tmp_path / "live")
+
+    async def scenario():
+        manager, zk, analyzer = _manager(directory)
+        analyzer.player_profiles.update_batch(ADDRESSES[:50], np.ones(50), np.zeros(50, dtype=bool),
+                                              np.zeros(50), 1000.0)
+        for i in range(20):
+            zk.generate_player_commitment(PLAYER, i % 37)
+        frozen_state = _state(zk, analyzer)
+
+        export = manager._export
+
+        def export_with_writes(state):
+            _write_during_snapshot(zk, analyzer)
+            export(state)
+
+        manager._export = export_with_writes
+        seq = await manager.snapshot()
+        live_state = _state(zk, analyzer)
+        await manager.stop(final_snapshot=False)
+        return seq, frozen_state, live_state
+
+    seq, frozen_state, live_state = asyncio.run(scenario())
+    assert frozen_state != live_state
+
+    # Снапшот и WAL после него - текущее состояние
+    manager, zk, analyzer = _manager(directory)
+    assert manager.last_snapshot_seq == seq
+    assert _state(zk, analyzer) == live_state
+    asyncio.run(manager.stop(final_snapshot=False))
+
+    # Один снапшот - состояние на момент смены сегмента
+    for segment in manager.wal.segments():
+        os.remove(manager.wal.segment_path(segment))
+    manager, zk, analyzer = _manager(directory)
+    assert _state(zk, analyzer) == frozen_state
+    asyncio.run(manager.stop(final_snapshot=False))
+
+
+def test_profile_export_restores_frozen_rows():
+    profiles = PlayerProfileStore(capacity=4)
+    profiles.update_batch(ADDRESSES[:3], [1.0, 1.0, 1.0], [True, False, False], [36.0, 0.0, 0.0], 1000.0)
+    assert profiles.dirty_count() == 3
+
+    frozen = profiles.freeze()
+    for _ in range(3):
+        profiles.update(ADDRESSES[0], 1.0, True, 36.0, timestamp=2000.0)
+    profiles.update(ADDRESSES[1], 1.0, False, timestamp=2000.0)
+    # Новые строки сверх ёмкости: колонки перевыделяются во время заморозки
+    profiles.update_batch(ADDRESSES[:20], np.ones(20), np.zeros(20, dtype=bool), np.zeros(20), 2000.0)
+    exported = frozen.export()
+    profiles.thaw()
+
+    assert exported["addresses"] == ADDRESSES[:3]
+    columns = exported["columns"]
+    assert columns["total_bets"].tolist() == [1, 1, 1]
+    assert columns["wins"].tolist() == [1, 0, 0]
+    assert columns["last_activity"].tolist() == [1000.0] * 3
+    # Строки, ещё не оценённые при заморозке, оценены в копии
+    expected = profiles.risk_model.score(np.array([1, 0, 0]), np.array([1, 1, 1]))
+    assert columns["risk_score"].tolist() == expected.tolist()
+    assert profiles[ADDRESSES[0]].total_bets == 5
+    assert len(profiles) == 20
+    assert profiles._frozen is None
+
+
+def _commitment(i: int) -> ZKCommitment:
+    return ZKCommitment(PLAYER, i % 37, f"{i:032x}", 1000.0 + i)
+
+
+def test_commitment_store_freeze_keeps_dict_unchanged():
+    store = CommitmentStore(max_commitments=10)
+    for i in range(10):
+        store[f"c{i}"] = _commitment(i)
+
+    frozen = store.freeze()
+    original = dict(frozen)
+    # Переполнение вытесняет самый старый, истечение удаляет ещё два
+    store["c10"] = _commitment(10)
+    store["c3"] = _commitment(30)
+    assert store.pop_expired(1003.0) == 2
+    assert dict(frozen) == original
+
+    assert len(store) == 8
+    assert "c0" not in store and "c1" not in store and "c2" not in store
+    assert store["c3"].timestamp == 1030.0
+    assert sorted(store) == sorted(f"c{i}" for i in range(3, 11))
+
+    store.thaw()
+    assert store._items is frozen
+    assert sorted(frozen) == sorted(f"c{i}" for i in range(3, 11))
+    assert store.oldest_timestamp() == 1004.0
+
+
+def _write_history(zk: ZKSystem, analyzer: BayesianAnalyzer, start: int):
+    profiles = analyzer.player_profiles
+    for i in range(start, start + 30):
+        profiles.update(ADDRESSES[i % 40], 1.0, i % 7 == 0, 36.0, timestamp=1000.0 + i)
+        zk.generate_player_commitment(ADDRESSES[i % 40], i % 37)
+    profiles.update_batch(ADDRESSES[:5], np.ones(5), np.zeros(5, dtype=bool), np.zeros(5), 5000.0 + start)
+    profiles.set_blacklisted(ADDRESSES[start % 40])
+    analyzer.record_spins(np.bincount([start % 37, 5, 5], minlength=37))
+    zk.seal_epoch()
+
+
+def test_replay_after_crash_without_snapshot(tmp_path):
+    directory = str(tmp_path / "wal")
+    manager, zk, analyzer = _manager(directory)
+    _write_history(zk, analyzer, 0)
+    expected = _full_state(zk, analyzer)
+    _crash(manager)
+
+    manager, zk, analyzer = _manager(directory)
+    assert manager.last_snapshot_seq is None
+    assert _full_state(zk, analyzer) == expected
+    asyncio.run(manager.stop(final_snapshot=False))
+
+
+def test_torn_tail_dropped_and_later_segments_replayed(tmp_path):
+    directory = str(tmp_path / "wal")
+    manager, zk, analyzer = _manager(directory)
+    _write_history(zk, analyzer, 0)
+    before_spins = _full_state(zk, analyzer)
+    analyzer.record_spins(np.ones(37, dtype=np.int64))
+    torn_segment = manager.wal.segment_path(manager.wal.seq)
+    _crash(manager)
+
+    # Обрыв посреди последней записи (вращения)
+    size = os.path.getsize(torn_segment)
+    with open(torn_segment, "r+b") as f:
+        f.truncate(size - 10)
+
+    manager, zk, analyzer = _manager(directory)
+    assert _full_state(zk, analyzer) == before_spins
+    # Новые записи идут в новый сегмент, а не за оборванным хвостом
+    assert manager.wal.segment_path(manager.wal.seq) != torn_segment
+    _write_history(zk, analyzer, 100)
+    expected = _full_state(zk, analyzer)
+    _crash(manager)
+
+    manager, zk, analyzer = _manager(directory)
+    assert _full_state(zk, analyzer) == expected
+    asyncio.run(manager.stop(final_snapshot=False))
+
+
+def test_wal_read_stops_at_corrupted_record(tmp_path):
+    wal = WriteAheadLog(str(tmp_path))
+    wal.open(0)
+    for i in range(5):
+        wal.append(REC_SPINS, bytes([i]) * 148)
+    wal.close()
+
+    path = wal.segment_path(0)
+    with open(path, "r+b") as f:
+        # Байт payload третьей записи: crc32 не совпадёт
+        f.seek(2 * (9 + 148) + 9 + 100)
+        f.write(b"\xff")
+    assert [bytes(payload[:1]) for _, payload in WriteAheadLog.read(path)] == [b"\x00", b"\x01"]
+
+
+def test_snapshot_then_crash_replays_only_newer_segments(tmp_path):
+    directory = str(tmp_path / "wal")
+    manager, zk, analyzer = _manager(directory)
+    _write_history(zk, analyzer, 0)
+    seq = asyncio.run(manager.snapshot())
+    # Сегменты до снапшота удалены, повторно они не проигрываются
+    assert manager.wal.segments() == [seq]
+    _write_history(zk, analyzer, 200)
+    expected = _full_state(zk, analyzer)
+    _crash(manager)
+
+    manager, zk, analyzer = _manager(directory)
+    assert manager.last_snapshot_seq == seq
+    assert _full_state(zk, analyzer) == expected
+    asyncio.run(manager.stop(final_snapshot=False))
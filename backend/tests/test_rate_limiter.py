@@ -0,0 +1,100 @@
+# blockchain_roulette/backend/tests/test_rate_limiter.py
+# Скользящее окно на границах: вес предыдущего окна, сброс после простоя, одинаково в памяти и в общем хранилище
+
+import asyncio
+
+import pytest
+
+from rate_limiter import RateLimit, SlidingWindowRateLimiter
+from state_store import InMemoryStateStore, SQLiteStateStore
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(params=["memory", "shared-memory", "shared-sqlite"])
+def limiter(request, tmp_path):
+    clock = Clock()
+    store = None
+    if request.param == "shared-memory":
+        store = InMemoryStateStore()
+    elif request.param == "shared-sqlite":
+        store = SQLiteStateStore(str(tmp_path / "state.db"))
+    yield SlidingWindowRateLimiter({"bet": RateLimit(10, 10.0)}, clock=clock, store=store)
+    if isinstance(store, SQLiteStateStore):
+        store.close()
+
+
+def _allowed(limiter, count: int, key: str = "alice") -> int:
+    return sum(limiter.hit(key, "bet") for _ in range(count))
+
+
+def test_limit_reached_within_window(limiter):
+    assert _allowed(limiter, 15) == 10
+    # Ключи учитываются отдельно
+    assert _allowed(limiter, 15, "bob") == 10
+
+
+def test_previous_window_weight_at_boundary(limiter):
+    clock = limiter.clock
+    clock.now = 1009.999
+    assert _allowed(limiter, 10) == 10
+    # Начало следующего окна: предыдущее учитывается целиком
+    clock.now = 1010.0
+    assert _allowed(limiter, 1) == 0
+    # Середина окна: от предыдущего осталась половина
+    clock.now = 1015.0
+    assert _allowed(limiter, 10) == 5
+    # Окно 1010-1020 стало предыдущим: 5 запросов целиком, ещё 5 свободно
+    clock.now = 1020.0
+    assert _allowed(limiter, 10) == 5
+
+
+def test_idle_key_starts_from_empty_window(limiter):
+    clock = limiter.clock
+    assert _allowed(limiter, 10) == 10
+    # Через окно и больше предыдущее окно уже не соседнее
+    clock.now = 1020.0
+    assert _allowed(limiter, 12) == 10
+
+
+def test_cost_counts_against_limit(limiter):
+    assert limiter.hit("alice", "bet", cost=7)
+    assert not limiter.hit("alice", "bet", cost=4)
+    assert limiter.hit("alice", "bet", cost=3)
+    assert not limiter.hit("alice", "bet")
+
+
+def test_check_many_counts_repeated_keys(limiter):
+    assert limiter.check_many(["alice"] * 12 + ["bob"], "bet") == [True] * 10 + [False, False, True]
+
+
+def test_async_api_matches_sync(limiter):
+    async def scenario():
+        single = [await limiter.hit_async("alice", "bet") for _ in range(8)]
+        batch = await limiter.check_many_async(["alice"] * 4, "bet")
+        return single + batch
+
+    assert asyncio.run(scenario()) == [True] * 10 + [False, False]
+
+
+def test_memory_idle_keys_evicted_after_two_windows():
+    clock = Clock()
+    limiter = SlidingWindowRateLimiter({"bet": RateLimit(10, 10.0)}, clock=clock, max_keys=3)
+    for key in ("a", "b", "c"):
+        limiter.hit(key, "bet")
+    clock.now += 19.9
+    assert limiter.evict_idle() == 0
+    clock.now += 0.1
+    assert limiter.evict_idle() == 3
+
+    # Переполнение вытесняет ключ, к которому дольше всего не обращались
+    for key in ("a", "b", "c", "a", "d"):
+        limiter.hit(key, "bet")
+    assert len(limiter) == 3
+    assert set(limiter._states["bet"]) == {"c", "a", "d"}
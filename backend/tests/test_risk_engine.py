@@ -0,0 +1,42 @@
+# blockchain_roulette/backend/tests/test_risk_engine.py
+# Оценка риска: модель различает удачу и устойчиво высокую долю выигрышей, таблица строится при старте
+
+import asyncio
+
+from bayesian_analyzer import BayesianAnalyzer
+from risk_engine import STRAIGHT_BET_RATE, RiskEngine, RiskModel
+
+
+def test_single_win_is_not_risky():
+    model = RiskModel()
+    assert model.score_one(1, 1) < 0.5
+
+
+def test_sustained_excess_is_risky():
+    model = RiskModel()
+    # Вчетверо больше выигрышей, чем ожидается на 1000 ставках
+    assert model.score_one(108, 1000) > 0.99
+    # Большое число ставок - вне таблицы, та же оценка прямым расчётом
+    assert model.score_one(1080, 10_000) > 0.99
+
+
+def test_start_builds_table_before_serving():
+    async def scenario():
+        engine = RiskEngine(BayesianAnalyzer(), interval=60)
+        assert engine.model._table is None
+        await engine.start()
+        try:
+            assert engine.model._table is not None
+            assert engine.analyzer.player_profiles.risk_model is engine.model
+        finally:
+            await engine.stop()
+
+    asyncio.run(scenario())
+
+
+def test_expected_rate_is_fair_wheel_rate():
+    analyzer = BayesianAnalyzer()
+    counts = [0] * 37
+    counts[7] = 100_000
+    analyzer.record_spins(counts)
+    assert RiskEngine(analyzer).model.expected_rate == STRAIGHT_BET_RATE
@@ -0,0 +1,91 @@
+# blockchain_roulette/backend/tests/test_signature_verifier.py
+# Проверка подписей кошельков: подпись принимается только для своего адреса и сообщения
+
+import asyncio
+import hashlib
+
+from eth_account import Account
+from eth_account.messages import encode_defunct
+
+from signature_verifier import SignatureVerifier, _verify_chunk, recover_signer
+
+
+def _sign(account, message: str) -> str:
+    message_hash = hashlib.sha3_256(message.encode()).digest()
+    return account.sign_message(encode_defunct(primitive=message_hash)).signature.hex()
+
+
+ALICE = Account.from_key(b"\x01" * 32)
+BOB = Account.from_key(b"\x02" * 32)
+MESSAGE = "zk-roulette login 1700000000"
+
+
+def test_recover_signer_returns_signing_address():
+    assert recover_signer(MESSAGE, _sign(ALICE, MESSAGE)) == ALICE.address
+
+
+def test_verify_chunk_rejects_wrong_signer_message_and_garbage():
+    signature = _sign(ALICE, MESSAGE)
+    assert _verify_chunk([
+        (ALICE.address, MESSAGE, signature),
+        (ALICE.address.lower(), MESSAGE, signature),
+        (BOB.address, MESSAGE, signature),
+        (ALICE.address, MESSAGE + " ", signature),
+        (ALICE.address, MESSAGE, _sign(BOB, MESSAGE)),
+        (ALICE.address, MESSAGE, "0x" + "00" * 65),
+        (ALICE.address, MESSAGE, "not a signature"),
+        (ALICE.address, MESSAGE, signature[:-2]),
+    ]) == [True, True, False, False, False, False, False, False]
+
+
+def test_verifier_caches_results_and_deduplicates():
+    verifier = SignatureVerifier(cache_ttl=60.0)
+    checked = []
+
+    async def run_inline(chunk):
+        checked.extend(chunk)
+        return _verify_chunk(chunk)
+
+    verifier._run_chunk = run_inline
+    good = (ALICE.address, MESSAGE, _sign(ALICE, MESSAGE))
+    bad = (BOB.address, MESSAGE, good[2])
+
+    async def scenario():
+        first = await verifier.verify_many([good, bad, good])
+        # Повтор с другим регистром адреса и подписи - тот же ключ кеша
+        second = await verifier.verify_many([(good[0].lower(), good[1], good[2].upper()), bad])
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == [True, False, True]
+    assert second == [True, False]
+    assert len(checked) == 2
+
+
+def test_verifier_cache_entries_expire():
+    verifier = SignatureVerifier(cache_ttl=0.0)
+    calls = []
+
+    async def run_inline(chunk):
+        calls.append(len(chunk))
+        return _verify_chunk(chunk)
+
+    verifier._run_chunk = run_inline
+    good = (ALICE.address, MESSAGE, _sign(ALICE, MESSAGE))
+
+    async def scenario():
+        assert await verifier.verify(*good)
+        assert await verifier.verify(*good)
+
+    asyncio.run(scenario())
+    assert calls == [1, 1]
+
+
+def test_verifier_process_pool_round_trip():
+    verifier = SignatureVerifier(max_workers=1, chunk_size=2)
+    items = [(ALICE.address, f"{MESSAGE} {i}", _sign(ALICE, f"{MESSAGE} {i}")) for i in range(3)]
+    items.append((BOB.address, items[0][1], items[0][2]))
+    try:
+        assert asyncio.run(verifier.verify_many(items)) == [True, True, True, False]
+    finally:
+        verifier.shutdown()
@@ -0,0 +1,73 @@
+# blockchain_roulette/backend/tests/test_state_store.py
+# Хранилище состояния: куча сроков не растёт от продлений, SQLite не блокирует event loop
+
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from state_store import InMemoryStateStore, SQLiteStateStore
+
+
+def _touch(session):
+    session = session or {"bets_count": 0}
+    session["bets_count"] += 1
+    return session, session
+
+
+def test_memory_expiry_heap_bounded_by_live_entries():
+    store = InMemoryStateStore()
+    # Сессия продлевается на каждую ставку: 50k продлений 10 ключей
+    for i in range(50_000):
+        store.update("sessions", f"player{i % 10}", _touch, ttl=24 * 3600)
+    assert store.count("sessions") == 10
+    assert len(store._expiry) <= 2 * 10 + 1024 + 1
+    assert store.get("sessions", "player3")["bets_count"] == 5000
+
+
+def test_memory_purge_after_rebuild():
+    store = InMemoryStateStore()
+    for i in range(5000):
+        store.put("ratelimit:bet", f"key{i % 3}", i, ttl=0.01)
+    store.put("sessions", "kept", 1, ttl=3600)
+    time.sleep(0.02)
+    assert store.purge_expired() == 3
+    assert store.get("sessions", "kept") == 1
+    store.delete("sessions", "kept")
+    assert store._expiring == 0
+
+
+def test_sqlite_calls_run_off_event_loop(tmp_path):
+    store = SQLiteStateStore(str(tmp_path / "state.db"))
+
+    def thread_name(*_):
+        return threading.current_thread().name
+
+    async def scenario():
+        assert await store.call(store.update, "sessions", "p", _touch, ttl=60) == {"bets_count": 1}
+        assert (await store.call(store.get, "sessions", "p"))["bets_count"] == 1
+        return await store.call(thread_name)
+
+    try:
+        assert asyncio.run(scenario()).startswith("state-store")
+    finally:
+        store.close()
+
+
+def test_sqlite_lock_wait_is_bounded(tmp_path):
+    path = str(tmp_path / "state.db")
+    store = SQLiteStateStore(path, busy_timeout_ms=100)
+    # Другой "воркер" держит блокировку записи
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        started = time.perf_counter()
+        with pytest.raises(sqlite3.OperationalError):
+            store.update("sessions", "p", _touch, ttl=60)
+        assert time.perf_counter() - started < 1.0
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+        store.close()
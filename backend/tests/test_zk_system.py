@@ -0,0 +1,123 @@
+# blockchain_roulette/backend/tests/test_zk_system.py
+# Верификация доказательств включения: честные доказательства проходят, подделанные пути - нет
+
+import os
+
+from zk_system import ZKProof, ZKSystem, merkle_root_from_path
+
+PLAYER = "0x" + "12" * 20
+
+
+def _commit(zk: ZKSystem, count: int):
+    return [zk.generate_player_commitment(PLAYER, i % 37) for i in range(count)]
+
+
+def _forge(zk: ZKSystem, proof: ZKProof) -> ZKProof:
+    """Настоящий лист, случайные соседи и пересчитанные корень и challenge (секрет не нужен)"""
+    siblings = [os.urandom(32) for _ in range(5)]
+    root = merkle_root_from_path(proof.commitment, proof.leaf_index, siblings)
+    return ZKProof(
+        commitment=proof.commitment,
+        challenge=zk._challenge(PLAYER, proof.commitment.hex(), root, proof.timestamp),
+        response=proof.response,
+        merkle_proof=siblings,
+        merkle_root=root,
+        timestamp=proof.timestamp,
+        epoch_id=proof.epoch_id,
+        leaf_index=proof.leaf_index,
+    )
+
+
+def test_live_epoch_proof_verifies():
+    zk = ZKSystem()
+    _, commitment_hash, secret_key = _commit(zk, 20)[3]
+    proof = zk.generate_zk_proof(PLAYER, commitment_hash, secret_key)
+    assert zk.verify_zk_proof(proof, PLAYER)
+
+
+def test_live_epoch_proof_survives_later_leaves():
+    """Доказательство против более раннего корня живой эпохи остаётся верным"""
+    zk = ZKSystem()
+    _, commitment_hash, secret_key = _commit(zk, 5)[2]
+    proof = zk.generate_zk_proof(PLAYER, commitment_hash, secret_key)
+    _commit(zk, 10)
+    assert proof.merkle_root != zk.current_epoch.tree.root_bytes
+    assert zk.verify_zk_proof(proof, PLAYER)
+
+
+def test_forged_siblings_rejected_in_live_epoch():
+    zk = ZKSystem()
+    _, commitment_hash, secret_key = _commit(zk, 20)[3]
+    proof = zk.generate_zk_proof(PLAYER, commitment_hash, secret_key)
+    forged = _forge(zk, proof)
+    assert not zk.verify_zk_proof(forged, PLAYER)
+    assert zk.verify_zk_proofs_batch([proof, forged], [PLAYER, PLAYER]) == [True, False]
+
+
+def test_forged_siblings_rejected_in_sealed_epoch():
+    zk = ZKSystem()
+    _, commitment_hash, secret_key = _commit(zk, 20)[3]
+    zk.seal_epoch()
+    proof = zk.generate_zk_proof(PLAYER, commitment_hash, secret_key)
+    assert zk.verify_zk_proof(proof, PLAYER)
+    assert not zk.verify_zk_proof(_forge(zk, proof), PLAYER)
+
+
+def _internal_node_proof(zk: ZKSystem, proof: ZKProof) -> ZKProof:
+    """Внутренний узел как commitment: укороченный путь сходится к настоящему корню, challenge пересчитан"""
+    levels = zk._epoch(proof.epoch_id).tree.levels
+    node = levels[1][0]
+    return ZKProof(
+        commitment=node,
+        challenge=zk._challenge(PLAYER, node.hex(), proof.merkle_root, proof.timestamp),
+        response=proof.response,
+        merkle_proof=[levels[1][1]],
+        merkle_root=proof.merkle_root,
+        timestamp=proof.timestamp,
+        epoch_id=proof.epoch_id,
+        leaf_index=0,
+    )
+
+
+def test_internal_node_rejected_in_sealed_epoch():
+    zk = ZKSystem()
+    _, commitment_hash, secret_key = _commit(zk, 4)[0]
+    zk.seal_epoch()
+    proof = zk.generate_zk_proof(PLAYER, commitment_hash, secret_key)
+    forged = _internal_node_proof(zk, proof)
+    assert merkle_root_from_path(forged.commitment, 0, forged.merkle_proof) == proof.merkle_root
+    assert not zk.verify_zk_proof(forged, PLAYER)
+
+
+def test_internal_node_rejected_in_live_epoch():
+    zk = ZKSystem()
+    _, commitment_hash, secret_key = _commit(zk, 4)[0]
+    proof = zk.generate_zk_proof(PLAYER, commitment_hash, secret_key)
+    assert not zk.verify_zk_proof(_internal_node_proof(zk, proof), PLAYER)
+
+
+def test_proof_bound_to_player():
+    zk = ZKSystem()
+    _, commitment_hash, secret_key = _commit(zk, 4)[1]
+    proof = zk.generate_zk_proof(PLAYER, commitment_hash, secret_key)
+    assert zk.verify_zk_proof(proof, PLAYER.upper().replace("0X", "0x"))
+    assert not zk.verify_zk_proof(proof, "0x" + "56" * 20)
+
+
+def test_issued_roots_are_bounded():
+    zk = ZKSystem(max_issued_roots=4)
+    for _ in range(10):
+        _, commitment_hash, secret_key = _commit(zk, 1)[0]
+        zk.generate_zk_proof(PLAYER, commitment_hash, secret_key)
+    assert len(zk.current_epoch.issued_roots) == 4
+    zk.seal_epoch()
+    assert not zk.sealed_epochs[0].issued_roots
+
+
+def test_multiproof_with_foreign_root_rejected():
+    zk = ZKSystem()
+    hashes = [commitment_hash for _, commitment_hash, _ in _commit(zk, 12)]
+    multiproof = zk.generate_multiproof(hashes[2:6])
+    assert zk.verify_multiproof(multiproof)
+    multiproof.merkle_root = os.urandom(32)
+    assert not zk.verify_multiproof(multiproof)
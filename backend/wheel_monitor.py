@@ -0,0 +1,360 @@
+# blockchain_roulette/backend/wheel_monitor.py
+# Потоковый приём результатов вращений и последовательная детекция смещения колеса
+
+import math
+import time
+import numpy as np
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from bayesian_analyzer import BayesianAnalyzer, SuspiciousEvent, bayesian_analyzer
+
+NUMBERS = 37
+
+# Адрес, под которым в SuspiciousEvent записываются события колеса
+WHEEL_EVENT_ADDRESS = "wheel"
+
+
+class WheelMonitor:
+    """
+    Детектор смещения колеса по потоку вращений.
+
+    На каждое вращение - O(1) работы:
+    - счётчики для апостериорных распределений копятся и сбрасываются
+      в анализатор пачкой (record_spins) при смене корзины или каждые
+      flush_every вращений;
+    - CUSUM Бернулли по каждому числу (H0: p = 1/37, H1: p = cusum_shift/37).
+      Промах добавляет ко всем остальным числам одинаковый отрицательный
+      вклад, поэтому значение числа хранится на момент последнего выпадения
+      и досчитывается лениво при следующем;
+    - счётчики по временным корзинам фиксированного размера. Хи-квадрат
+      по окну из window_buckets корзин считается при закрытии корзины.
+    """
+
+    def __init__(self, analyzer: BayesianAnalyzer, bucket_seconds: float = 10.0,
+                 window_buckets: int = 60, cusum_shift: float = 2.0,
+                 cusum_threshold: float = 15.0, chi2_alpha: float = 1e-6,
+                 min_window_spins: int = 370, flush_every: int = 4096,
+                 event_cooldown_spins: int = 10_000,
+                 clock: Callable[[], float] = time.time):
+        self.analyzer = analyzer
+        self.bucket_seconds = bucket_seconds
+        self.window_buckets = window_buckets
+        self.cusum_threshold = cusum_threshold
+        self.chi2_alpha = chi2_alpha
+        self._chi2_critical: Optional[float] = None
+        self.min_window_spins = min_window_spins
+        self.flush_every = flush_every
+        # Повторные тревоги CUSUM по тому же числу считаются, но событие
+        # создаётся не чаще раза в event_cooldown_spins вращений
+        self.event_cooldown_spins = event_cooldown_spins
+        self.clock = clock
+
+        # Логарифм отношения правдоподобия для выпадения и промаха
+        p0 = 1.0 / NUMBERS
+        p1 = cusum_shift / NUMBERS
+        self._hit_llr = math.log(p1 / p0)
+        self._miss_llr = math.log((1.0 - p1) / (1.0 - p0))
+
+        # Обработчики новых событий (например, публикация в live-ленту)
+        self.event_listeners: List[Callable[[SuspiciousEvent], Any]] = []
+        self.reset()
+
+    def reset(self):
+        """Сбрасывает состояние детектора (но не анализатора)"""
+        self.total_spins = 0
+        self._cusum = [0.0] * NUMBERS
+        self._cusum_at = [0] * NUMBERS
+        self._cusum_quiet_until = [0] * NUMBERS
+        self._pending = [0] * NUMBERS
+        self._pending_total = 0
+
+        self._bucket: Optional[int] = None
+        self._bucket_counts = [0] * NUMBERS
+        self._ring = np.zeros((self.window_buckets, NUMBERS), dtype=np.int64)
+        self._window = np.zeros(NUMBERS, dtype=np.int64)
+        self._chi2_quiet_until = -1
+        self.last_chi2 = 0.0
+        self.alarms = {"cusum": 0, "chi2": 0}
+        # Куда ingest_many собирает события пакета
+        self._collected: Optional[List[SuspiciousEvent]] = None
+
+    def ingest(self, number: int, timestamp: Optional[float] = None) -> Optional[SuspiciousEvent]:
+        """
+        Учитывает одно вращение; возвращает событие, если сработал CUSUM.
+        События хи-квадрат доставляются через event_listeners.
+        """
+        if not 0 <= number < NUMBERS:
+            raise ValueError("Number must be between 0 and 36")
+        if timestamp is None:
+            timestamp = self.clock()
+
+        bucket = int(timestamp // self.bucket_seconds)
+        if self._bucket is None:
+            self._bucket = bucket
+        elif bucket > self._bucket:
+            self._rotate(bucket)
+        # Опоздавшие вращения учитываются в текущей корзине
+        self._bucket_counts[number] += 1
+
+        self._pending[number] += 1
+        self._pending_total += 1
+
+        spin = self.total_spins
+        self.total_spins = spin + 1
+
+        # Ленивый CUSUM: промахи с прошлого выпадения, затем само выпадение
+        value = self._cusum[number] + (spin - self._cusum_at[number]) * self._miss_llr
+        if value < 0.0:
+            value = 0.0
+        value += self._hit_llr
+        self._cusum_at[number] = spin + 1
+
+        event = None
+        if value > self.cusum_threshold:
+            event = self._cusum_alarm(number, value, timestamp, spin)
+            value = 0.0
+        self._cusum[number] = value
+
+        if self._pending_total >= self.flush_every:
+            self.flush()
+        return event
+
+    def ingest_many(self, numbers: Sequence[int],
+                    timestamps: Optional[Sequence[float]] = None) -> List[SuspiciousEvent]:
+        """Учитывает пакет вращений по порядку; возвращает новые события"""
+        events: List[SuspiciousEvent] = []
+        self._collected = events
+        ingest = self.ingest
+        try:
+            if timestamps is None:
+                now = self.clock()
+                for number in numbers:
+                    ingest(number, now)
+            else:
+                for number, timestamp in zip(numbers, timestamps):
+                    ingest(number, timestamp)
+        finally:
+            self._collected = None
+            self.flush()
+        return events
+
+    def flush(self):
+        """Переносит накопленные вращения в апостериорные распределения анализатора"""
+        if self._pending_total:
+            self.analyzer.record_spins(self._pending)
+            self._pending = [0] * NUMBERS
+            self._pending_total = 0
+
+    def cusum_values(self) -> np.ndarray:
+        """Текущие значения CUSUM всех чисел с учётом ленивых промахов"""
+        at = np.array(self._cusum_at)
+        values = np.array(self._cusum) + (self.total_spins - at) * self._miss_llr
+        return np.maximum(values, 0.0)
+
+    def window_counts(self) -> np.ndarray:
+        """Выпадения чисел в окне закрытых корзин плюс текущая корзина"""
+        return self._window + np.array(self._bucket_counts)
+
+    def _rotate(self, bucket: int, check: bool = True):
+        """Закрывает текущую корзину и пропущенные пустые корзины до bucket"""
+        window_buckets = self.window_buckets
+        counts = np.array(self._bucket_counts, dtype=np.int64)
+
+        slot = self._bucket % window_buckets
+        self._window -= self._ring[slot]
+        self._ring[slot] = counts
+        self._window += counts
+
+        # Пустые корзины между закрытой и новой (не больше размера окна)
+        for skipped in range(self._bucket + 1, min(bucket, self._bucket + 1 + window_buckets)):
+            slot = skipped % window_buckets
+            self._window -= self._ring[slot]
+            self._ring[slot] = 0
+
+        closed = self._bucket
+        self._bucket = bucket
+        self._bucket_counts = [0] * NUMBERS
+        self.flush()
+        if check:
+            self._check_chi2(closed)
+
+    @property
+    def chi2_critical(self) -> float:
+        """Критическое значение хи-квадрат; scipy импортируется при первой проверке окна"""
+        if self._chi2_critical is None:
+            from scipy.stats import chi2
+            self._chi2_critical = float(chi2.isf(self.chi2_alpha, NUMBERS - 1))
+        return self._chi2_critical
+
+    def _check_chi2(self, closed_bucket: int):
+        window = self._window
+        total = int(window.sum())
+        if total < self.min_window_spins:
+            return
+        expected = total / NUMBERS
+        statistic = float(((window - expected) ** 2).sum() / expected)
+        self.last_chi2 = statistic
+
+        # После тревоги окно должно полностью обновиться
+        if statistic > self.chi2_critical and closed_bucket >= self._chi2_quiet_until:
+            self._chi2_quiet_until = closed_bucket + self.window_buckets
+            from scipy.stats import chi2
+            p_value = float(chi2.sf(statistic, NUMBERS - 1))
+            deviation = int(np.argmax(np.abs(window - expected)))
+            self._emit(SuspiciousEvent(
+                player_address=WHEEL_EVENT_ADDRESS,
+                event_type="wheel_distribution_chi2",
+                severity=min(1.0, 0.5 * statistic / self.chi2_critical),
+                description=(
+                    f"Распределение чисел за окно {self.window_buckets * self.bucket_seconds:.0f} с "
+                    f"отличается от равномерного: chi2={statistic:.1f}, p={p_value:.2e}, "
+                    f"{total} вращений, наибольшее отклонение у числа {deviation}"
+                ),
+                probability_score=1.0 - p_value,
+                timestamp=datetime.fromtimestamp((closed_bucket + 1) * self.bucket_seconds)
+            ), "chi2")
+
+    def _cusum_alarm(self, number: int, value: float, timestamp: float,
+                     spin: int) -> Optional[SuspiciousEvent]:
+        if spin < self._cusum_quiet_until[number]:
+            self.alarms["cusum"] += 1
+            return None
+        self._cusum_quiet_until[number] = spin + self.event_cooldown_spins
+        event = SuspiciousEvent(
+            player_address=WHEEL_EVENT_ADDRESS,
+            event_type="wheel_bias_cusum",
+            severity=min(1.0, 0.5 * value / self.cusum_threshold),
+            description=f"Число {number} выпадает чаще ожидаемого: CUSUM {value:.1f} > {self.cusum_threshold}",
+            probability_score=1.0 / (1.0 + math.exp(-value)),
+            timestamp=datetime.fromtimestamp(timestamp)
+        )
+        self._emit(event, "cusum")
+        return event
+
+    def _emit(self, event: SuspiciousEvent, kind: str):
+        self.alarms[kind] += 1
+        self.analyzer.add_suspicious_event(event)
+        if self._collected is not None:
+            self._collected.append(event)
+        for listener in self.event_listeners:
+            listener(event)
+
+    def replay(self, numbers: Sequence[int], timestamps: Optional[Sequence[float]] = None,
+               emit_events: bool = False, record: bool = True) -> Dict[str, int]:
+        """
+        Восстанавливает состояние по журналу вращений (в порядке времени)
+        без прохода по каждому вращению в Python:
+        - апостериорные распределения - один bincount;
+        - корзины окна - bincount по (корзина, число) только для последних
+          window_buckets корзин;
+        - CUSUM - рекурсия Линдли в замкнутом виде, S_k = X_k - min(-S_0, min X_j),
+          по позициям выпадений каждого числа, с перезапуском после тревоги.
+        Тревоги хи-квадрат при проигрывании не проверяются. С record=False
+        апостериорные распределения анализатора не трогаются (если они
+        уже восстановлены из снапшота).
+        """
+        numbers = np.asarray(numbers, dtype=np.int64)
+        size = len(numbers)
+        if size == 0:
+            return {"spins": 0, "cusum_alarms": 0}
+        if numbers.min() < 0 or numbers.max() >= NUMBERS:
+            raise ValueError("Number must be between 0 and 36")
+
+        if timestamps is None:
+            timestamps = np.full(size, self.clock())
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+
+        base = self.total_spins
+        alarms = 0
+        for number in range(NUMBERS):
+            positions = np.flatnonzero(numbers == number)
+            if positions.size:
+                alarms += self._replay_cusum(number, positions + base, timestamps[positions], emit_events)
+        self.total_spins = base + size
+
+        if record:
+            counts = np.bincount(numbers, minlength=NUMBERS)
+            self._pending = [pending + int(count) for pending, count in zip(self._pending, counts)]
+            self._pending_total += size
+
+        self._replay_buckets(numbers, timestamps)
+        self.flush()
+        return {"spins": size, "cusum_alarms": alarms}
+
+    def _replay_buckets(self, numbers: np.ndarray, timestamps: np.ndarray):
+        buckets = (timestamps // self.bucket_seconds).astype(np.int64)
+        if self._bucket is None:
+            self._bucket = int(buckets[0])
+        # Как и при живом приёме, опоздавшие вращения попадают в текущую корзину
+        buckets = np.maximum(buckets, self._bucket)
+
+        recent = buckets >= buckets[-1] - self.window_buckets
+        distinct, inverse = np.unique(buckets[recent], return_inverse=True)
+        per_bucket = np.bincount(
+            inverse * NUMBERS + numbers[recent], minlength=len(distinct) * NUMBERS
+        ).reshape(len(distinct), NUMBERS)
+
+        for bucket, counts in zip(distinct, per_bucket):
+            bucket = int(bucket)
+            if bucket > self._bucket:
+                self._rotate(bucket, check=False)
+            self._bucket_counts = [current + int(count) for current, count in zip(self._bucket_counts, counts)]
+
+    def _replay_cusum(self, number: int, positions: np.ndarray, timestamps: np.ndarray,
+                      emit_events: bool) -> int:
+        hit, miss, threshold = self._hit_llr, self._miss_llr, self.cusum_threshold
+        origin = self._cusum_at[number]
+        start_value = self._cusum[number]
+        alarms = 0
+        start = 0
+        while start < len(positions):
+            tail = positions[start:]
+            k = np.arange(len(tail))
+            # Накопленный LLR от origin до момента перед k-м выпадением
+            before = hit * k + miss * (tail - origin - k)
+            floor = np.minimum(np.minimum.accumulate(before), -start_value)
+            values = before + hit - floor
+
+            over = np.flatnonzero(values > threshold)
+            if over.size == 0:
+                self._cusum[number] = float(values[-1])
+                self._cusum_at[number] = int(tail[-1]) + 1
+                break
+
+            i = int(over[0])
+            alarms += 1
+            if emit_events:
+                self._cusum_alarm(number, float(values[i]), float(timestamps[start + i]), int(tail[i]))
+            else:
+                self.alarms["cusum"] += 1
+            origin = int(tail[i]) + 1
+            start_value = 0.0
+            self._cusum[number] = 0.0
+            self._cusum_at[number] = origin
+            start += i + 1
+        return alarms
+
+    def replay_file(self, path: str, emit_events: bool = False, record: bool = True) -> Dict[str, int]:
+        """Журнал вращений: CSV со строками 'timestamp,number'"""
+        log = np.loadtxt(path, delimiter=",", ndmin=2)
+        if log.size == 0:
+            return {"spins": 0, "cusum_alarms": 0}
+        return self.replay(log[:, 1].astype(np.int64), log[:, 0], emit_events, record)
+
+    def get_stats(self) -> Dict[str, Any]:
+        cusum = self.cusum_values()
+        return {
+            "total_spins": self.total_spins,
+            "window_spins": int(self.window_counts().sum()),
+            "last_chi2": self.last_chi2,
+            "chi2_critical": self.chi2_critical,
+            "max_cusum": float(cusum.max()),
+            "max_cusum_number": int(cusum.argmax()),
+            "cusum_threshold": self.cusum_threshold,
+            "alarms": dict(self.alarms)
+        }
+
+
+# Глобальный детектор, связанный с глобальным анализатором
+wheel_monitor = WheelMonitor(bayesian_analyzer)
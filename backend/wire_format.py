@@ -0,0 +1,219 @@
+# blockchain_roulette/backend/wire_format.py
+# Компактный бинарный формат ответов на ставки: доказательства и транзакции без hex и JSON
+
+import struct
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from zk_system import ZKProof
+
+# Тип содержимого бинарного ответа; выбирается заголовком Accept
+WIRE_MEDIA_TYPE = "application/x-zk-roulette"
+
+# Формат записи (little-endian, кроме value):
+#   u32 длина остатка записи
+#   u32 index ставки в пакете, u16 status (HTTP-код)
+#   status != 200: текст ошибки в UTF-8 до конца записи
+#   status == 200:
+#     доказательство: u64 epoch_id, u64 leaf_index, f64 timestamp, u16 длина пути,
+#                     32 commitment, 32 challenge, 32 response, 32 merkle_root, 32 * длина пути
+#     транзакция:     u8 флаги (1 - есть from, 2 - есть chainId), 20 to, [20 from],
+#                     32 value (uint256 big-endian), u64 gas, u64 gasPrice, u64 nonce,
+#                     [u64 chainId], u32 длина data, data
+#     сессия:         u16 длина, session_id в UTF-8
+# /bet/prepare отвечает одной записью, /bet/prepare/batch - потоком записей.
+_FRAME = struct.Struct("<I")
+_HEADER = struct.Struct("<IH")
+_PROOF = struct.Struct("<QQdH")
+_TX_FLAGS = struct.Struct("<B")
+_TX_NUMBERS = struct.Struct("<QQQ")
+_U64 = struct.Struct("<Q")
+_U32 = struct.Struct("<I")
+_U16 = struct.Struct("<H")
+
+_HAS_FROM = 1
+_HAS_CHAIN_ID = 2
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def accepts_binary(accept: Optional[str]) -> bool:
+    """Клиент явно просит бинарный формат (и не запрещает его через q=0)"""
+    if not accept or WIRE_MEDIA_TYPE not in accept:
+        return False
+    for media_range in accept.split(","):
+        media_type, _, params = media_range.partition(";")
+        if media_type.strip() == WIRE_MEDIA_TYPE:
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+def _address(value: str) -> bytes:
+    raw = bytes.fromhex(value[2:] if value.startswith("0x") else value)
+    if len(raw) != 20:
+        raise ValueError("Address must be 20 bytes")
+    return raw
+
+
+def _encode_proof(proof: ZKProof, out: List[bytes]):
+    out.append(_PROOF.pack(proof.epoch_id, proof.leaf_index, proof.timestamp, len(proof.merkle_proof)))
+    out.append(proof.commitment)
+    out.append(proof.challenge)
+    out.append(proof.response)
+    out.append(proof.merkle_root)
+    out.extend(proof.merkle_proof)
+
+
+def _encode_transaction(txn: Dict[str, Any], out: List[bytes]):
+    sender = txn.get("from")
+    chain_id = txn.get("chainId")
+    out.append(_TX_FLAGS.pack((_HAS_FROM if sender else 0) | (_HAS_CHAIN_ID if chain_id is not None else 0)))
+    out.append(_address(txn["to"]))
+    if sender:
+        out.append(_address(sender))
+    out.append(txn["value"].to_bytes(32, "big"))
+    out.append(_TX_NUMBERS.pack(txn["gas"], txn["gasPrice"], txn["nonce"]))
+    if chain_id is not None:
+        out.append(_U64.pack(chain_id))
+    data = txn["data"]
+    out.append(_U32.pack(len(data)))
+    out.append(data)
+
+
+def encode_bet_record(index: int, proof: ZKProof, txn: Dict[str, Any], session_id: str) -> bytes:
+    """
+    Запись успешно подготовленной ставки. txn - транзакция в том виде, в каком
+    её строит build_bet_transaction: data - сырые байты вызова контракта.
+    """
+    out = [b"", _HEADER.pack(index, 200)]
+    _encode_proof(proof, out)
+    _encode_transaction(txn, out)
+    session = session_id.encode()
+    out.append(_U16.pack(len(session)))
+    out.append(session)
+    out[0] = _FRAME.pack(sum(len(part) for part in out))
+    return b"".join(out)
+
+
+def encode_error_record(index: int, status: int, detail: str) -> bytes:
+    body = _HEADER.pack(index, status) + detail.encode()
+    return _FRAME.pack(len(body)) + body
+
+
+class ProofView:
+    """Доказательство поверх буфера ответа: дайджесты - memoryview без копирования"""
+
+    __slots__ = ("epoch_id", "leaf_index", "timestamp", "commitment", "challenge",
+                 "response", "merkle_root", "merkle_proof")
+
+    def to_proof(self) -> ZKProof:
+        return ZKProof(
+            commitment=bytes(self.commitment),
+            challenge=bytes(self.challenge),
+            response=bytes(self.response),
+            merkle_proof=[bytes(node) for node in self.merkle_proof],
+            merkle_root=bytes(self.merkle_root),
+            timestamp=self.timestamp,
+            epoch_id=self.epoch_id,
+            leaf_index=self.leaf_index
+        )
+
+
+class TransactionView:
+    """Транзакция поверх буфера ответа; адреса и data - memoryview"""
+
+    __slots__ = ("to", "sender", "value", "gas", "gas_price", "nonce", "chain_id", "data")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Транзакция в JSON-виде, как в ответе application/json"""
+        txn = {"to": "0x" + self.to.hex()}
+        if self.sender is not None:
+            txn["from"] = "0x" + self.sender.hex()
+        txn.update(value=self.value, gas=self.gas, gasPrice=self.gas_price, nonce=self.nonce)
+        if self.chain_id is not None:
+            txn["chainId"] = self.chain_id
+        txn["data"] = "0x" + self.data.hex()
+        return txn
+
+
+class BetRecord:
+    """Одна запись бинарного ответа"""
+
+    __slots__ = ("index", "status", "detail", "proof", "transaction", "session_id")
+
+    def __init__(self, index: int, status: int):
+        self.index = index
+        self.status = status
+        self.detail: Optional[str] = None
+        self.proof: Optional[ProofView] = None
+        self.transaction: Optional[TransactionView] = None
+        self.session_id: Optional[str] = None
+
+
+def _decode_record(view: memoryview) -> BetRecord:
+    index, status = _HEADER.unpack_from(view)
+    record = BetRecord(index, status)
+    offset = _HEADER.size
+    if status != 200:
+        record.detail = str(view[offset:], "utf-8")
+        return record
+
+    proof = ProofView()
+    proof.epoch_id, proof.leaf_index, proof.timestamp, path_length = _PROOF.unpack_from(view, offset)
+    offset += _PROOF.size
+    proof.commitment = view[offset:offset + 32]
+    proof.challenge = view[offset + 32:offset + 64]
+    proof.response = view[offset + 64:offset + 96]
+    proof.merkle_root = view[offset + 96:offset + 128]
+    offset += 128
+    proof.merkle_proof = [view[start:start + 32] for start in range(offset, offset + 32 * path_length, 32)]
+    offset += 32 * path_length
+    record.proof = proof
+
+    txn = TransactionView()
+    (flags,) = _TX_FLAGS.unpack_from(view, offset)
+    offset += _TX_FLAGS.size
+    txn.to = view[offset:offset + 20]
+    offset += 20
+    txn.sender = None
+    if flags & _HAS_FROM:
+        txn.sender = view[offset:offset + 20]
+        offset += 20
+    txn.value = int.from_bytes(view[offset:offset + 32], "big")
+    offset += 32
+    txn.gas, txn.gas_price, txn.nonce = _TX_NUMBERS.unpack_from(view, offset)
+    offset += _TX_NUMBERS.size
+    txn.chain_id = None
+    if flags & _HAS_CHAIN_ID:
+        (txn.chain_id,) = _U64.unpack_from(view, offset)
+        offset += _U64.size
+    (data_length,) = _U32.unpack_from(view, offset)
+    offset += _U32.size
+    txn.data = view[offset:offset + data_length]
+    offset += data_length
+    record.transaction = txn
+
+    (session_length,) = _U16.unpack_from(view, offset)
+    offset += _U16.size
+    record.session_id = str(view[offset:offset + session_length], "utf-8")
+    return record
+
+
+def iter_records(buffer: Buffer) -> Iterator[BetRecord]:
+    """Разбор потока записей; поля ссылаются на buffer, который должен жить, пока они нужны"""
+    view = memoryview(buffer)
+    offset = 0
+    while offset < len(view):
+        (length,) = _FRAME.unpack_from(view, offset)
+        offset += _FRAME.size
+        if offset + length > len(view):
+            raise ValueError("Truncated record")
+        yield _decode_record(view[offset:offset + length])
+        offset += length
+
+
+def decode_bet_response(buffer: Buffer) -> BetRecord:
+    """Ответ /bet/prepare: ровно одна запись"""
+    records = list(iter_records(buffer))
+    if len(records) != 1:
+        raise ValueError(f"Expected one record, got {len(records)}")
+    return records[0]
@@ -2,94 +2,620 @@
 # Система Zero-Knowledge доказательств для рулетки
 
 import hashlib
+import heapq
+import itertools
 import secrets
+import sys
 import time
-from typing import Dict, List, Tuple, Any
-from dataclasses import dataclass
+from collections import OrderedDict
+from typing import Dict, List, Tuple, Any, Iterable, Iterator, Optional, Callable, Sequence, Set
+from dataclasses import dataclass, field
 
 
-@dataclass
 class ZKProof:
-    commitment: str
-    challenge: str
-    response: str
-    merkle_proof: List[str]
-    merkle_root: str
-    timestamp: float
+    """
+    Доказательство включения; дайджесты хранятся сырыми 32 байтами, hex - только на границе API.
+    Узлы merkle_proof - те же объекты bytes, что и в дереве эпохи.
+    """
+
+    __slots__ = ("commitment", "challenge", "response", "merkle_proof", "merkle_root",
+                 "timestamp", "epoch_id", "leaf_index")
+
+    def __init__(self, commitment: bytes, challenge: bytes, response: bytes, merkle_proof: List[bytes],
+                 merkle_root: bytes, timestamp: float, epoch_id: int = 0, leaf_index: int = 0):
+        self.commitment = commitment
+        self.challenge = challenge
+        self.response = response
+        self.merkle_proof = merkle_proof
+        self.merkle_root = merkle_root
+        self.timestamp = timestamp
+        self.epoch_id = epoch_id
+        self.leaf_index = leaf_index
+
+    def _fields(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ZKProof):
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    def __repr__(self) -> str:
+        return "ZKProof(" + ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__) + ")"
+
+
+@dataclass
+class MerkleMultiproof:
+    """Общее доказательство включения нескольких commitment'ов одной эпохи"""
+    epoch_id: int
+    merkle_root: bytes
+    leaf_count: int
+    leaf_indices: List[int]
+    leaves: List[bytes]
+    nodes: List[bytes]
 
 
 class ZKCommitment:
+    """
+    Commitment ставки. Хранится компактно: адрес игрока интернирован (одна
+    строка на игрока на все его commitment'ы), nonce - 16 байт, хеш - 32 байта,
+    и этот же объект bytes служит листом в дереве эпохи. hex-виды nonce
+    и commitment_hash строятся при обращении.
+    """
+
+    __slots__ = ("player_address", "number", "nonce_bytes", "timestamp", "digest")
+
     def __init__(self, player_address: str, number: int, nonce: str, timestamp: float):
-        self.player_address = player_address
+        self.player_address = sys.intern(player_address)
         self.number = number
-        self.nonce = nonce
+        self.nonce_bytes = bytes.fromhex(nonce)
         self.timestamp = timestamp
-        self.commitment_hash = self._generate_commitment_hash()
+        self.digest = self._generate_commitment_hash(nonce)
     
-    def _generate_commitment_hash(self) -> str:
-        """Генерирует хеш commitment"""
-        data = f"{self.player_address}{self.number}{self.nonce}{self.timestamp}"
-        return hashlib.sha256(data.encode()).hexdigest()
+    @classmethod
+    def restore(cls, player_address: str, number: int, nonce: str, timestamp: float,
+                digest: bytes) -> "ZKCommitment":
+        """Восстанавливает commitment с уже известным хешем (из снапшота или WAL)"""
+        commitment = cls.__new__(cls)
+        commitment.player_address = sys.intern(player_address)
+        commitment.number = number
+        commitment.nonce_bytes = bytes.fromhex(nonce)
+        commitment.timestamp = timestamp
+        commitment.digest = digest
+        return commitment
 
+    @property
+    def nonce(self) -> str:
+        return self.nonce_bytes.hex()
 
-class MerkleTree:
-    def __init__(self, leaves: List[str]):
-        self.leaves = leaves
-        self.tree = self._build_tree()
-        self.root = self.tree[-1][0] if self.tree else ""
+    @property
+    def commitment_hash(self) -> str:
+        return self.digest.hex()
     
-    def _build_tree(self) -> List[List[str]]:
-        """Строит дерево Merkle"""
-        if not self.leaves:
-            return []
-        
-        current_level = self.leaves[:]
-        tree = [current_level[:]]
-        
-        while len(current_level) > 1:
-            next_level = []
-            for i in range(0, len(current_level), 2):
-                left = current_level[i]
-                right = current_level[i + 1] if i + 1 < len(current_level) else left
-                parent = hashlib.sha256((left + right).encode()).hexdigest()
-                next_level.append(parent)
-            current_level = next_level
-            tree.append(current_level[:])
-        
+    def _generate_commitment_hash(self, nonce: str) -> bytes:
+        """Генерирует хеш commitment (над hex-видом nonce, как и прежде)"""
+        data = f"{self.player_address}{self.number}{nonce}{self.timestamp}"
+        return hashlib.sha256(data.encode()).digest()
+
+
+class CommitmentStore:
+    """
+    Хранилище commitment'ов с индексом истечения.
+
+    Рядом со словарём id -> commitment ведётся min-heap (timestamp, id),
+    поэтому очистка стоит O(k log n) для k реально истёкших записей,
+    а самый старый timestamp читается с вершины кучи. Удалённые в обход
+    кучи записи вычищаются из неё лениво. Число записей ограничено
+    max_commitments: при переполнении вытесняется самый старый commitment.
+
+    freeze() отдаёт словарь снапшоту без копирования: до thaw() он не
+    меняется, новые записи копятся в _added, а удалённые id - в _removed.
+    """
+
+    def __init__(self, max_commitments: int = 1_000_000):
+        self.max_commitments = max_commitments
+        self.evicted = 0
+        self._items: Dict[str, ZKCommitment] = {}
+        self._expiry: List[Tuple[float, str]] = []
+        self._added: Optional[Dict[str, ZKCommitment]] = None
+        self._removed: Set[str] = set()
+
+    def __len__(self) -> int:
+        if self._added is None:
+            return len(self._items)
+        return len(self._items) - len(self._removed) + len(self._added)
+
+    def __contains__(self, commitment_id: str) -> bool:
+        return self.get(commitment_id) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return (key for key, _ in self.items())
+
+    def __getitem__(self, commitment_id: str) -> ZKCommitment:
+        commitment = self.get(commitment_id)
+        if commitment is None:
+            raise KeyError(commitment_id)
+        return commitment
+
+    def __setitem__(self, commitment_id: str, commitment: ZKCommitment):
+        if commitment_id not in self and len(self) >= self.max_commitments:
+            self._pop_oldest()
+            self.evicted += 1
+
+        if self._added is None:
+            self._items[commitment_id] = commitment
+        else:
+            if commitment_id in self._items:
+                self._removed.add(commitment_id)
+            self._added[commitment_id] = commitment
+        heapq.heappush(self._expiry, (commitment.timestamp, commitment_id))
+
+        # Не даём куче разрастаться из-за устаревших записей
+        if len(self._expiry) > 2 * len(self) + 1024:
+            self._rebuild_index()
+
+    def __delitem__(self, commitment_id: str):
+        self._pop(commitment_id)
+
+    def _pop(self, commitment_id: str) -> ZKCommitment:
+        if self._added is None:
+            return self._items.pop(commitment_id)
+        commitment = self._added.pop(commitment_id, None)
+        if commitment is not None:
+            return commitment
+        if commitment_id in self._removed:
+            raise KeyError(commitment_id)
+        commitment = self._items[commitment_id]
+        self._removed.add(commitment_id)
+        return commitment
+
+    def get(self, commitment_id: str, default: Optional[ZKCommitment] = None) -> Optional[ZKCommitment]:
+        added = self._added
+        if added is not None:
+            if commitment_id in added:
+                return added[commitment_id]
+            if commitment_id in self._removed:
+                return default
+        return self._items.get(commitment_id, default)
+
+    def items(self):
+        if self._added is None:
+            return self._items.items()
+        removed = self._removed
+        return itertools.chain(
+            ((key, c) for key, c in self._items.items() if key not in removed),
+            self._added.items()
+        )
+
+    def values(self):
+        return (c for _, c in self.items())
+
+    def freeze(self) -> Dict[str, ZKCommitment]:
+        """Словарь commitment'ов для снапшота; не меняется до thaw"""
+        if self._added is not None:
+            raise RuntimeError("Хранилище commitment'ов уже заморожено")
+        self._added = {}
+        return self._items
+
+    def thaw(self):
+        """Переносит изменения, накопленные за время заморозки, в основной словарь"""
+        items = self._items
+        for commitment_id in self._removed:
+            del items[commitment_id]
+        items.update(self._added)
+        self._added = None
+        self._removed = set()
+
+    def _is_live(self, entry: Tuple[float, str]) -> bool:
+        commitment = self.get(entry[1])
+        return commitment is not None and commitment.timestamp == entry[0]
+
+    def _prune_top(self):
+        expiry = self._expiry
+        while expiry and not self._is_live(expiry[0]):
+            heapq.heappop(expiry)
+
+    def _pop_oldest(self) -> Optional[ZKCommitment]:
+        self._prune_top()
+        if not self._expiry:
+            return None
+        _, commitment_id = heapq.heappop(self._expiry)
+        return self._pop(commitment_id)
+
+    def _rebuild_index(self):
+        self._expiry = [(c.timestamp, key) for key, c in self.items()]
+        heapq.heapify(self._expiry)
+
+    def load(self, items: Iterable[Tuple[str, ZKCommitment]]):
+        """Массовая загрузка: индекс истечения строится одним heapify"""
+        self._items.update(items)
+        overflow = len(self._items) - self.max_commitments
+        if overflow > 0:
+            for key in sorted(self._items, key=lambda key: self._items[key].timestamp)[:overflow]:
+                del self._items[key]
+            self.evicted += overflow
+        self._rebuild_index()
+
+    def oldest_timestamp(self) -> Optional[float]:
+        """Timestamp самого старого commitment'а"""
+        self._prune_top()
+        return self._expiry[0][0] if self._expiry else None
+
+    def pop_expired(self, cutoff: float, limit: Optional[int] = None) -> int:
+        """Удаляет commitment'ы старше cutoff (не больше limit за вызов)"""
+        removed = 0
+        while limit is None or removed < limit:
+            oldest = self.oldest_timestamp()
+            if oldest is None or oldest >= cutoff:
+                break
+            self._pop_oldest()
+            removed += 1
+        return removed
+
+
+def _hash_pair(left: bytes, right: bytes) -> bytes:
+    """Хеш родительского узла из двух 32-байтовых дайджестов"""
+    return hashlib.sha256(left + right).digest()
+
+
+def _to_bytes32(value: str) -> bytes:
+    """Переводит hex-дайджест (с префиксом 0x или без) в 32 байта"""
+    if value.startswith('0x'):
+        value = value[2:]
+    digest = bytes.fromhex(value)
+    if len(digest) != 32:
+        raise ValueError("Digest must be 32 bytes")
+    return digest
+
+
+def merkle_root_from_path(leaf: bytes, leaf_index: int, path: Sequence[bytes]) -> bytes:
+    """Корень, к которому приводит путь: бит индекса на уровне задаёт сторону соседа"""
+    sha256 = hashlib.sha256
+    node = leaf
+    index = leaf_index
+    for sibling in path:
+        node = sha256(sibling + node if index & 1 else node + sibling).digest()
+        index >>= 1
+    return node
+
+
+def verify_merkle_path(leaf: bytes, leaf_index: int, path: Sequence[bytes], root: bytes) -> bool:
+    """Проверка включения листа: путь пересчитывается до корня"""
+    if leaf_index < 0 or leaf_index >> len(path):
+        return False
+    return merkle_root_from_path(leaf, leaf_index, path) == root
+
+
+def verify_merkle_paths(items: Iterable[Tuple[bytes, int, Sequence[bytes], bytes]]) -> List[bool]:
+    """
+    Проверка многих путей (leaf, leaf_index, path, root) за один вызов.
+    Родитель кешируется по паре детей, поэтому общие для путей внутренние
+    узлы хешируются один раз: проверка всей эпохи против её корня стоит
+    столько хешей, сколько в дереве узлов, а не n * log n.
+    """
+    sha256 = hashlib.sha256
+    parents: Dict[Tuple[bytes, bytes], bytes] = {}
+    results = []
+    for leaf, leaf_index, path, root in items:
+        if leaf_index < 0 or leaf_index >> len(path):
+            results.append(False)
+            continue
+        node = leaf
+        index = leaf_index
+        for sibling in path:
+            # Ключ - пара объектов: хеш bytes кешируется в самом объекте
+            pair = (sibling, node) if index & 1 else (node, sibling)
+            parent = parents.get(pair)
+            if parent is None:
+                parent = parents[pair] = sha256(pair[0] + pair[1]).digest()
+            node = parent
+            index >>= 1
+        results.append(node == root)
+    return results
+
+
+def verify_merkle_multiproof(
+    leaf_indices: Sequence[int],
+    leaves: Sequence[bytes],
+    nodes: Sequence[bytes],
+    leaf_count: int,
+    root: bytes
+) -> bool:
+    """
+    Проверка мультидоказательства (см. IncrementalMerkleTree.get_multiproof_bytes):
+    уровни поднимаются от листьев, каждый внутренний узел считается один раз,
+    недостающие соседи берутся из nodes по порядку. Все nodes должны быть
+    использованы.
+    """
+    if not leaf_indices or len(leaf_indices) != len(leaves):
+        return False
+    current: Dict[int, bytes] = {}
+    for index, leaf in sorted(zip(leaf_indices, leaves)):
+        if not 0 <= index < leaf_count or current.setdefault(index, leaf) != leaf:
+            return False
+
+    sha256 = hashlib.sha256
+    supplied = iter(nodes)
+    size = leaf_count
+    while size > 1:
+        # Позиции идут по возрастанию, поэтому и родители добавляются по возрастанию
+        parents: Dict[int, bytes] = {}
+        for position, node in current.items():
+            parent_position = position >> 1
+            if parent_position in parents:
+                continue
+            sibling_position = position ^ 1
+            sibling = current.get(sibling_position)
+            if sibling is None:
+                sibling = node if sibling_position >= size else next(supplied, None)
+                if sibling is None:
+                    return False
+            parents[parent_position] = sha256(sibling + node if position & 1 else node + sibling).digest()
+        current = parents
+        size = (size + 1) >> 1
+
+    return next(supplied, None) is None and current.get(0) == root
+
+
+class IncrementalMerkleTree:
+    """
+    Append-only дерево Merkle для commitment'ов целой эпохи.
+
+    Узлы хранятся как сырые 32-байтовые дайджесты, hex используется только
+    на границе API. Добавление листа не трогает верхние уровни: правая
+    граница дерева пересчитывается при первом обращении к корню или
+    доказательству, поэтому одиночное добавление обходится в O(log n),
+    а пакет из k листьев - в O(k + log n). Уровни кешируются, и
+    доказательство строится за O(log n). Непарный правый узел уровня
+    хешируется сам с собой.
+    """
+
+    def __init__(self, leaves: Optional[Iterable[str]] = None):
+        self.levels: List[List[bytes]] = [[]]
+        self._leaf_index: Dict[bytes, int] = {}
+        self._dirty_from = 0  # первый лист, чьи предки ещё не пересчитаны
+        if leaves:
+            self.extend(leaves)
+
+    @classmethod
+    def from_leaf_bytes(cls, leaves: List[bytes]) -> "IncrementalMerkleTree":
+        """Дерево из готовых 32-байтовых листьев; хеширование отложено до первого корня"""
+        tree = cls()
+        tree.levels[0] = leaves
+        for index, leaf in enumerate(leaves):
+            tree._leaf_index.setdefault(leaf, index)
         return tree
-    
-    def get_proof(self, leaf_index: int) -> List[str]:
-        """Получает доказательство для листа"""
-        if leaf_index >= len(self.leaves):
+
+    def __len__(self) -> int:
+        return len(self.levels[0])
+
+    def __contains__(self, leaf: str) -> bool:
+        return _to_bytes32(leaf) in self._leaf_index
+
+    @property
+    def root_bytes(self) -> bytes:
+        if not self.levels[0]:
+            return b""
+        self._rehash()
+        return self.levels[-1][0]
+
+    @property
+    def root(self) -> str:
+        return self.root_bytes.hex()
+
+    @property
+    def depth(self) -> int:
+        self._rehash()
+        return len(self.levels) - 1
+
+    def _rehash(self):
+        """Пересчитывает правую границу дерева начиная с первого грязного листа"""
+        levels = self.levels
+        if self._dirty_from >= len(levels[0]):
+            return
+
+        start = self._dirty_from
+        level = 0
+        while len(levels[level]) > 1:
+            nodes = levels[level]
+            start &= ~1
+            parents = []
+            for i in range(start, len(nodes), 2):
+                left = nodes[i]
+                right = nodes[i + 1] if i + 1 < len(nodes) else left
+                parents.append(_hash_pair(left, right))
+
+            start >>= 1
+            level += 1
+            if level == len(levels):
+                levels.append(parents)
+            else:
+                levels[level][start:] = parents
+
+        del levels[level + 1:]
+        self._dirty_from = len(levels[0])
+
+    def append_bytes(self, leaf: bytes) -> int:
+        """Добавляет лист (32 байта) и возвращает его индекс"""
+        if len(leaf) != 32:
+            raise ValueError("Leaf must be 32 bytes")
+
+        index = len(self.levels[0])
+        self.levels[0].append(leaf)
+        self._leaf_index.setdefault(leaf, index)
+        return index
+
+    def append(self, leaf: str) -> int:
+        """Добавляет hex-лист и возвращает его индекс"""
+        return self.append_bytes(_to_bytes32(leaf))
+
+    def extend(self, leaves: Iterable[str]) -> List[int]:
+        return [self.append(leaf) for leaf in leaves]
+
+    def index_of(self, leaf: str) -> int:
+        """Индекс листа или -1, если его нет в дереве"""
+        return self._leaf_index.get(_to_bytes32(leaf), -1)
+
+    def get_proof_bytes(self, leaf_index: int) -> List[bytes]:
+        """
+        Доказательство включения из кешированных уровней.
+        Длина всегда равна глубине дерева: для непарного узла соседом
+        выступает он сам, направление определяется битами индекса.
+        """
+        if not 0 <= leaf_index < len(self.levels[0]):
             return []
-        
+
+        self._rehash()
         proof = []
         index = leaf_index
-        
-        for level in range(len(self.tree) - 1):
-            sibling_index = index ^ 1  # XOR с 1 для получения соседа
-            if sibling_index < len(self.tree[level]):
-                proof.append(self.tree[level][sibling_index])
-            index //= 2
-        
+        for nodes in self.levels[:-1]:
+            sibling_index = index ^ 1
+            proof.append(nodes[sibling_index] if sibling_index < len(nodes) else nodes[index])
+            index >>= 1
+
         return proof
 
+    def get_proof(self, leaf_index: int) -> List[str]:
+        """Получает доказательство для листа в hex"""
+        return [node.hex() for node in self.get_proof_bytes(leaf_index)]
+
+    def get_multiproof_bytes(self, leaf_indices: Iterable[int]) -> List[bytes]:
+        """
+        Мультидоказательство для набора листьев: уровень за уровнем, по
+        возрастанию позиции, только соседи, которые нельзя вычислить из
+        самих листьев. Общие соседи разных путей не повторяются, а узлы,
+        которые проверяющий посчитает сам, не передаются.
+        """
+        positions = sorted(set(leaf_indices))
+        if not positions or positions[0] < 0 or positions[-1] >= len(self.levels[0]):
+            raise ValueError("Leaf index out of range")
+
+        self._rehash()
+        nodes = []
+        for level in self.levels[:-1]:
+            known = set(positions)
+            parents = []
+            for position in positions:
+                sibling_position = position ^ 1
+                if sibling_position not in known and sibling_position < len(level):
+                    nodes.append(level[sibling_position])
+                parent_position = position >> 1
+                if not parents or parents[-1] != parent_position:
+                    parents.append(parent_position)
+            positions = parents
+        return nodes
+
+
+@dataclass
+class CommitmentEpoch:
+    """Эпоха commitment'ов: одно живое дерево на временное окно"""
+    epoch_id: int
+    started_at: float
+    tree: IncrementalMerkleTree = field(default_factory=IncrementalMerkleTree)
+    sealed_at: Optional[float] = None
+    root: str = ""
+    # Корни живой эпохи, под которые уже выданы доказательства (в порядке выдачи) -> глубина дерева
+    issued_roots: "OrderedDict[bytes, int]" = field(default_factory=OrderedDict)
+
+    @property
+    def is_sealed(self) -> bool:
+        return self.sealed_at is not None
+
 
 class ZKSystem:
-    def __init__(self, merkle_tree_depth: int = 10):
+    def __init__(
+        self,
+        merkle_tree_depth: int = 20,
+        epoch_duration: float = 60.0,
+        max_sealed_epochs: int = 1024,
+        max_commitments: int = 1_000_000,
+        max_issued_roots: int = 65536
+    ):
         self.merkle_tree_depth = merkle_tree_depth
-        self.commitment_storage: Dict[str, ZKCommitment] = {}
-        self.merkle_trees: Dict[str, MerkleTree] = {}
-    
-    def generate_player_commitment(
-        self, 
-        player_address: str, 
-        bet_number: int
-    ) -> Tuple[str, str, str]:
+        self.epoch_duration = epoch_duration
+        self.max_sealed_epochs = max_sealed_epochs
+        self.max_issued_roots = max_issued_roots
+        self.commitment_storage = CommitmentStore(max_commitments)
+
+        # Реестр запечатанных корней: root -> дерево эпохи (в порядке запечатывания)
+        self.merkle_trees: "OrderedDict[str, IncrementalMerkleTree]" = OrderedDict()
+        self.sealed_epochs: "OrderedDict[int, CommitmentEpoch]" = OrderedDict()
+        self.current_epoch = CommitmentEpoch(epoch_id=0, started_at=time.time())
+        self._commitment_epochs: Dict[bytes, int] = {}
+
+        # Подписчики на запечатывание эпохи (публикация корня в контракт и т.п.)
+        self.epoch_listeners: List[Callable[[CommitmentEpoch], None]] = []
+        
+        # Журнал изменений (WAL), подключается модулем persistence
+        self.journal = None
+
+    def _epoch_is_due(self, now: float) -> bool:
+        epoch = self.current_epoch
+        return len(epoch.tree) > 0 and (
+            now - epoch.started_at >= self.epoch_duration
+            or len(epoch.tree) >= 2 ** self.merkle_tree_depth
+        )
+
+    def seal_epoch(self) -> Optional[CommitmentEpoch]:
         """
-        Генерирует commitment для игрока
-        Возвращает: (nonce, commitment_hash, secret_key)
+        Запечатывает текущую эпоху, публикует её корень подписчикам
+        и открывает новую. Пустая эпоха не запечатывается.
         """
+        now = time.time()
+        epoch = self.current_epoch
+        if len(epoch.tree) == 0:
+            epoch.started_at = now
+            return None
+
+        self._seal(now)
+        for listener in self.epoch_listeners:
+            listener(epoch)
+
+        return epoch
+
+    def _seal(self, now: float) -> CommitmentEpoch:
+        epoch = self.current_epoch
+        epoch.root = epoch.tree.root
+        epoch.sealed_at = now
+        epoch.issued_roots = OrderedDict()
+        self.sealed_epochs[epoch.epoch_id] = epoch
+        self.merkle_trees[epoch.root] = epoch.tree
+        self.current_epoch = CommitmentEpoch(epoch_id=epoch.epoch_id + 1, started_at=now)
+
+        # Реестр ограничен: вытесняем самые старые эпохи вместе с их листьями
+        while len(self.sealed_epochs) > self.max_sealed_epochs:
+            _, evicted = self.sealed_epochs.popitem(last=False)
+            self.merkle_trees.pop(evicted.root, None)
+            for leaf in evicted.tree.levels[0]:
+                if self._commitment_epochs.get(leaf) == evicted.epoch_id:
+                    del self._commitment_epochs[leaf]
+
+        return epoch
+
+    def seal_epoch_if_due(self) -> Optional[CommitmentEpoch]:
+        """Запечатывает эпоху, если истекло её окно или дерево заполнено"""
+        if self._epoch_is_due(time.time()):
+            return self.seal_epoch()
+        return None
+
+    def _add_to_epoch(self, commitment_hash: str, rotate: bool = True) -> CommitmentEpoch:
+        """Добавляет commitment в живое дерево текущей эпохи"""
+        return self._add_leaf(_to_bytes32(commitment_hash), rotate)
+
+    def _add_leaf(self, leaf: bytes, rotate: bool = True) -> CommitmentEpoch:
+        """Добавляет 32-байтовый лист; объект leaf разделяется деревом, индексом и commitment'ом"""
+        if rotate:
+            self.seal_epoch_if_due()
+        epoch = self.current_epoch
+        epoch.tree.append_bytes(leaf)
+        self._commitment_epochs[leaf] = epoch.epoch_id
+        return epoch
+
+    def _find_epoch(self, commitment_hash: str) -> Optional[CommitmentEpoch]:
+        epoch_id = self._commitment_epochs.get(_to_bytes32(commitment_hash))
+        return self._epoch(epoch_id) if epoch_id is not None else None
+
+    def _store_commitment(self, player_address: str, bet_number: int, rotate: bool = True) -> Tuple[str, str, str]:
         nonce = secrets.token_hex(16)
         timestamp = time.time()
         secret_key = secrets.token_hex(32)
@@ -98,92 +624,324 @@ class ZKSystem:
         commitment_id = f"{player_address}_{timestamp}"
         
         self.commitment_storage[commitment_id] = commitment
+        epoch = self._add_leaf(commitment.digest, rotate)
+        if self.journal is not None:
+            self.journal.commitment(commitment_id, commitment, epoch.epoch_id)
         
         return nonce, commitment.commitment_hash, secret_key
+
+    def generate_player_commitment(
+        self, 
+        player_address: str, 
+        bet_number: int
+    ) -> Tuple[str, str, str]:
+        """
+        Генерирует commitment для игрока и добавляет его в дерево эпохи
+        Возвращает: (nonce, commitment_hash, secret_key)
+        """
+        return self._store_commitment(player_address, bet_number)
+
+    def generate_player_commitments_batch(
+        self,
+        bets: Sequence[Tuple[str, int]]
+    ) -> List[Tuple[str, str, str]]:
+        """
+        Пакетная генерация commitment'ов для пар (player_address, bet_number).
+        Весь пакет попадает в одну эпоху, так что его доказательства
+        строятся против одного корня.
+        """
+        self.seal_epoch_if_due()
+        if len(self.current_epoch.tree) + len(bets) > 2 ** self.merkle_tree_depth:
+            self.seal_epoch()
+        
+        return [
+            self._store_commitment(player_address, bet_number, rotate=False)
+            for player_address, bet_number in bets
+        ]
+
+    # =============== ВОССТАНОВЛЕНИЕ СОСТОЯНИЯ ===============
+
+    def restore_commitment(self, commitment_id: str, commitment: ZKCommitment, epoch_id: int):
+        """Повторяет запись WAL: commitment и его лист в дереве эпохи"""
+        self.commitment_storage[commitment_id] = commitment
+        if epoch_id != self.current_epoch.epoch_id:
+            if epoch_id < self.current_epoch.epoch_id:
+                return
+            # Эпоха без записи о запечатывании предыдущей: продолжаем с её номера
+            self.current_epoch = CommitmentEpoch(epoch_id=epoch_id, started_at=commitment.timestamp)
+        self._add_leaf(commitment.digest, rotate=False)
+
+    def restore_seal(self, epoch_id: int, sealed_at: float):
+        """Повторяет запечатывание эпохи без вызова подписчиков"""
+        if self.current_epoch.epoch_id == epoch_id and len(self.current_epoch.tree):
+            self._seal(sealed_at)
+
+    def restore_epoch(self, epoch_id: int, started_at: float, sealed_at: Optional[float],
+                      root: str, leaves: List[bytes]):
+        """Загружает эпоху из снапшота; живая эпоха (sealed_at=None) становится текущей"""
+        tree = IncrementalMerkleTree.from_leaf_bytes(leaves)
+        epoch = CommitmentEpoch(epoch_id=epoch_id, started_at=started_at, tree=tree,
+                                sealed_at=sealed_at, root=root)
+        if sealed_at is None:
+            self.current_epoch = epoch
+        else:
+            self.sealed_epochs[epoch_id] = epoch
+            self.merkle_trees[root] = tree
+        epochs = self._commitment_epochs
+        for leaf in leaves:
+            epochs[leaf] = epoch_id
     
-    def generate_zk_proof(
+    def _build_proof(
         self,
+        epoch: CommitmentEpoch,
         player_address: str,
         commitment_hash: str,
-        secret_key: str
+        secret_key: str,
+        merkle_root: bytes,
+        timestamp: float
     ) -> ZKProof:
-        """Генерирует ZK доказательство"""
-        
-        # Создаем фиктивные листья для Merkle Tree
-        leaves = [
-            hashlib.sha256(f"leaf_{i}_{commitment_hash}".encode()).hexdigest()
-            for i in range(8)
-        ]
-        leaves.append(commitment_hash)
-        
-        # Строим Merkle Tree
-        merkle_tree = MerkleTree(leaves)
-        proof = merkle_tree.get_proof(len(leaves) - 1)
+        tree = epoch.tree
+        leaf_index = tree.index_of(commitment_hash)
+        # Узлы пути - те же объекты bytes, что и в дереве, без копирования
+        proof = tree.get_proof_bytes(leaf_index)
         
         # Генерируем challenge и response
-        challenge = hashlib.sha256(
-            f"{commitment_hash}{merkle_tree.root}{time.time()}".encode()
-        ).hexdigest()
+        challenge = self._challenge(player_address, commitment_hash, merkle_root, timestamp)
         
         response = hashlib.sha256(
-            f"{challenge}{secret_key}".encode()
-        ).hexdigest()
+            f"{challenge.hex()}{secret_key}".encode()
+        ).digest()
         
         return ZKProof(
-            commitment=commitment_hash,
+            commitment=tree.levels[0][leaf_index],
             challenge=challenge,
             response=response,
             merkle_proof=proof,
-            merkle_root=merkle_tree.root,
-            timestamp=time.time()
+            merkle_root=merkle_root,
+            timestamp=timestamp,
+            epoch_id=epoch.epoch_id,
+            leaf_index=leaf_index
         )
+
+    def _epoch_root(self, epoch: CommitmentEpoch) -> bytes:
+        """Корень для нового доказательства; корень живой эпохи запоминается как выданный"""
+        if epoch.is_sealed:
+            return bytes.fromhex(epoch.root)
+        root = epoch.tree.root_bytes
+        issued = epoch.issued_roots
+        if root not in issued:
+            issued[root] = epoch.tree.depth
+            if len(issued) > self.max_issued_roots:
+                issued.popitem(last=False)
+        return root
     
-    def verify_zk_proof(self, proof: ZKProof, player_address: str) -> bool:
-        """Верифицирует ZK доказательство"""
-        try:
-            # Проверяем базовую структуру
-            if not all([
-                proof.commitment,
-                proof.challenge,
-                proof.response,
-                proof.merkle_root
-            ]):
-                return False
-            
-            # Проверяем временные ограничения (доказательство действительно 10 минут)
-            if time.time() - proof.timestamp > 600:
-                return False
-            
-            # В реальной реализации здесь была бы полная верификация ZK доказательства
-            # Для демо-версии просто проверяем базовые условия
-            return True
-            
-        except Exception:
-            return False
+    def generate_zk_proof(
+        self,
+        player_address: str,
+        commitment_hash: str,
+        secret_key: str
+    ) -> ZKProof:
+        """
+        Генерирует ZK доказательство включения commitment'а в дерево эпохи.
+        Для запечатанной эпохи доказательство строится против опубликованного
+        корня, для живой - против её текущего корня.
+        """
+        epoch = self._find_epoch(commitment_hash)
+        if epoch is None:
+            epoch = self._add_to_epoch(commitment_hash)
+        
+        return self._build_proof(
+            epoch, player_address, commitment_hash, secret_key, self._epoch_root(epoch), time.time()
+        )
+
+    def generate_zk_proofs_batch(
+        self,
+        entries: Sequence[Tuple[str, str, str]]
+    ) -> List[ZKProof]:
+        """
+        Пакетная генерация доказательств для (player_address, commitment_hash,
+        secret_key). Корень каждой эпохи вычисляется один раз на пакет.
+        """
+        epochs = []
+        for _, commitment_hash, _ in entries:
+            epoch = self._find_epoch(commitment_hash)
+            if epoch is None:
+                epoch = self._add_to_epoch(commitment_hash)
+            epochs.append(epoch)
+        
+        timestamp = time.time()
+        roots: Dict[int, bytes] = {}
+        proofs = []
+        for epoch, (player_address, commitment_hash, secret_key) in zip(epochs, entries):
+            if epoch.epoch_id not in roots:
+                roots[epoch.epoch_id] = self._epoch_root(epoch)
+            proofs.append(self._build_proof(
+                epoch, player_address, commitment_hash, secret_key, roots[epoch.epoch_id], timestamp
+            ))
+        return proofs
     
-    def cleanup_expired_commitments(self, max_age_seconds: int = 600) -> int:
-        """Очистка устаревших commitment'ов"""
-        current_time = time.time()
-        expired_keys = [
-            key for key, commitment in self.commitment_storage.items()
-            if current_time - commitment.timestamp > max_age_seconds
-        ]
+    @staticmethod
+    def _challenge(player_address: str, commitment_hash: str, merkle_root: bytes, timestamp: float) -> bytes:
+        """
+        Challenge определён над hex-представлениями и привязан к адресу игрока:
+        доказательство, выданное одному игроку, не проходит для другого
+        """
+        return hashlib.sha256(
+            f"{player_address.lower()}{commitment_hash}{merkle_root.hex()}{timestamp}".encode()
+        ).digest()
+    
+    def _epoch(self, epoch_id: int) -> Optional[CommitmentEpoch]:
+        if epoch_id == self.current_epoch.epoch_id:
+            return self.current_epoch
+        return self.sealed_epochs.get(epoch_id)
+    
+    def _leaf_count(self, epoch_id: int) -> int:
+        """Число листьев известной эпохи или -1"""
+        epoch = self._epoch(epoch_id)
+        return len(epoch.tree) if epoch is not None else -1
+    
+    @staticmethod
+    def _root_depth(epoch: CommitmentEpoch, root: bytes) -> int:
+        """
+        Глубина дерева, которому принадлежит корень доказательства, или -1.
+        Для запечатанной эпохи корень совпадает с опубликованным. Корень живой
+        эпохи меняется с каждым листом, поэтому для неё принимается текущий
+        корень или один из последних max_issued_roots корней, под которые
+        система выдавала доказательства. Произвольный корень, посчитанный из
+        подобранных соседей, не принимается.
+        """
+        if epoch.is_sealed:
+            return epoch.tree.depth if bytes.fromhex(epoch.root) == root else -1
+        if root == epoch.tree.root_bytes:
+            return epoch.tree.depth
+        return epoch.issued_roots.get(root, -1)
+    
+    def verify_zk_proof(self, proof: ZKProof, player_address: str,
+                        max_age: Optional[float] = 600) -> bool:
+        """
+        Верифицирует ZK доказательство игрока: структуру, срок действия
+        (max_age секунд, None - без ограничения), challenge и путь Merkle
+        от листа эпохи до её корня
+        """
+        return self.verify_zk_proofs_batch([proof], [player_address], max_age)[0]
+    
+    def verify_zk_proofs_batch(self, proofs: Sequence[ZKProof], player_addresses: Sequence[str],
+                               max_age: Optional[float] = 600) -> List[bool]:
+        """
+        Пакетная верификация, например аудит всей эпохи после расчёта ставок.
+        Проверки те же, что в verify_zk_proof; пути пересчитываются вместе,
+        и общие внутренние узлы хешируются один раз.
         
-        for key in expired_keys:
-            del self.commitment_storage[key]
+        Путь должен иметь полную глубину дерева, а commitment - стоять листом
+        на leaf_index: иначе внутренний узел с укороченным путём сошёлся бы
+        к тому же корню.
+        """
+        now = time.time()
+        results = [False] * len(proofs)
+        positions: List[int] = []
+        paths: List[Tuple[bytes, int, List[bytes], bytes]] = []
+        root_depths: Dict[Tuple[int, bytes], int] = {}
+        
+        for position, (proof, player_address) in enumerate(zip(proofs, player_addresses)):
+            try:
+                leaf = bytes(proof.commitment)
+                root = bytes(proof.merkle_root)
+                path = proof.merkle_proof
+                if len(leaf) != 32 or len(root) != 32 or any(len(node) != 32 for node in path):
+                    continue
+                if not proof.challenge or not proof.response:
+                    continue
+                if max_age is not None and now - proof.timestamp > max_age:
+                    continue
+                if proof.challenge != self._challenge(player_address, leaf.hex(), root, proof.timestamp):
+                    continue
+                epoch = self._epoch(proof.epoch_id)
+                if epoch is None:
+                    continue
+                stored = epoch.tree.levels[0]
+                if not 0 <= proof.leaf_index < len(stored) or stored[proof.leaf_index] != leaf:
+                    continue
+            except (ValueError, TypeError, AttributeError):
+                continue
+            
+            key = (proof.epoch_id, root)
+            if key not in root_depths:
+                root_depths[key] = self._root_depth(epoch, root)
+            if len(path) == root_depths[key]:
+                positions.append(position)
+                paths.append((leaf, proof.leaf_index, path, root))
         
-        return len(expired_keys)
+        for position, valid in zip(positions, verify_merkle_paths(paths)):
+            results[position] = valid
+        return results
+    
+    def generate_multiproof(self, commitment_hashes: Sequence[str]) -> MerkleMultiproof:
+        """
+        Мультидоказательство для commitment'ов одной эпохи: вместо отдельного
+        пути на каждый лист - один набор узлов без повторов
+        """
+        epochs = [self._find_epoch(commitment_hash) for commitment_hash in commitment_hashes]
+        epoch = epochs[0] if epochs else None
+        if epoch is None or any(other is not epoch for other in epochs):
+            raise ValueError("Commitment'ы должны принадлежать одной известной эпохе")
+        tree = epoch.tree
+        indices = [tree.index_of(commitment_hash) for commitment_hash in commitment_hashes]
+        nodes = tree.get_multiproof_bytes(indices)
+        return MerkleMultiproof(
+            epoch_id=epoch.epoch_id,
+            merkle_root=self._epoch_root(epoch),
+            leaf_count=len(tree),
+            leaf_indices=indices,
+            leaves=[tree.levels[0][index] for index in indices],
+            nodes=nodes
+        )
+    
+    def verify_multiproof(self, multiproof: MerkleMultiproof) -> bool:
+        """Верифицирует мультидоказательство против корня известной эпохи"""
+        root = bytes(multiproof.merkle_root)
+        leaves = [bytes(leaf) for leaf in multiproof.leaves]
+        nodes = [bytes(node) for node in multiproof.nodes]
+        if any(len(digest) != 32 for digest in [root, *leaves, *nodes]):
+            return False
+        epoch = self._epoch(multiproof.epoch_id)
+        if epoch is None:
+            return False
+        stored = epoch.tree.levels[0]
+        if not 0 < multiproof.leaf_count <= len(stored) or len(multiproof.leaf_indices) != len(leaves):
+            return False
+        # Листья - на своих местах в дереве эпохи, глубина - как у дерева корня
+        if any(not 0 <= index < len(stored) or stored[index] != leaf
+               for index, leaf in zip(multiproof.leaf_indices, leaves)):
+            return False
+        if (multiproof.leaf_count - 1).bit_length() != self._root_depth(epoch, root):
+            return False
+        return verify_merkle_multiproof(multiproof.leaf_indices, leaves, nodes, multiproof.leaf_count, root)
+    
+    def cleanup_expired_commitments(
+        self,
+        max_age_seconds: int = 600,
+        max_batch: Optional[int] = None
+    ) -> int:
+        """
+        Очистка устаревших commitment'ов.
+        max_batch ограничивает работу одного вызова, чтобы вызывающий
+        мог отдавать управление между порциями.
+        """
+        return self.commitment_storage.pop_expired(
+            time.time() - max_age_seconds, max_batch
+        )
     
     def get_stats(self) -> Dict[str, Any]:
         """Получение статистики системы"""
+        oldest = self.commitment_storage.oldest_timestamp()
         return {
             "total_commitments": len(self.commitment_storage),
+            "evicted_commitments": self.commitment_storage.evicted,
             "active_merkle_trees": len(self.merkle_trees),
             "merkle_tree_depth": self.merkle_tree_depth,
-            "oldest_commitment": min(
-                (c.timestamp for c in self.commitment_storage.values()),
-                default=time.time()
-            )
+            "current_epoch": self.current_epoch.epoch_id,
+            "current_epoch_size": len(self.current_epoch.tree),
+            "oldest_commitment": oldest if oldest is not None else time.time()
         }
 
 